@@ -0,0 +1,241 @@
+"""Afluencia en tiempo real por estación: anillos NumPy de lecturas y semáforo de saturación.
+
+Las lecturas llegan como líneas JSON {"estacion": "Zócalo", "ocupacion": 82.5, "ts": 1718118000.0}
+(ocupación en % de la capacidad; "ts" opcional) desde un archivo que crece o un flujo
+HTTP de líneas (p. ej. AfluenciaSimulada). `MonitorAfluencia` las ingiere en segundo
+plano y recalcula de una vez los agregados de todas las estaciones; el kiosco solo
+consulta el último resumen, sin tocar la red ni calcular nada en su turno.
+"""
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+import requests
+
+from clasificador import normalizar
+from red_metro import ALIAS, LINEAS
+
+logger = logging.getLogger(__name__)
+
+# Promedio de la ventana (en %) a partir del cual cambia el semáforo
+UMBRAL_MEDIA, UMBRAL_ALTA = 40.0, 75.0
+SIN_DATOS, AGIL, MEDIA, ALTA = -1, 0, 1, 2
+SEMAFOROS = {SIN_DATOS: "⚪ Sin datos", AGIL: "🟢 Ágil", MEDIA: "🟡 Media", ALTA: "🔴 Alta"}
+
+
+def parsear_lectura(linea):
+    """(estación, ocupación, ts) de una línea JSON, o None si está mal formada."""
+    try:
+        datos = json.loads(linea)
+        return datos["estacion"], float(datos["ocupacion"]), float(datos.get("ts") or time.time())
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class AlmacenAfluencia:
+    """Últimas `capacidad` lecturas de cada estación en matrices (estaciones × capacidad).
+
+    Escribir es O(1) por lectura y `consultar` es O(1): un diccionario al índice de la
+    estación y una lectura del resumen que `recalcular` deja listo para todas a la vez.
+    """
+
+    def __init__(self, estaciones=None, capacidad: int = 256, ventana: float = 5 * 60):
+        self.estaciones = sorted(set(estaciones or (e for paradas in LINEAS.values() for e in paradas)))
+        self._indice = {normalizar(e): i for i, e in enumerate(self.estaciones)}
+        for alias, nombre in ALIAS.items():
+            if normalizar(nombre) in self._indice:
+                self._indice[normalizar(alias)] = self._indice[normalizar(nombre)]
+        self.capacidad = capacidad
+        self.ventana = ventana
+        self._valores = np.zeros((len(self.estaciones), capacidad), dtype=np.float32)
+        self._tiempos = np.full((len(self.estaciones), capacidad), -np.inf)
+        self._siguiente = np.zeros(len(self.estaciones), dtype=np.int64)
+        self._lock = threading.Lock()
+        self._resumen = None
+        self.lecturas = self.descartadas = self.recalculos = 0
+
+    def id_estacion(self, nombre: str):
+        return self._indice.get(normalizar(nombre))
+
+    def registrar(self, lecturas):
+        """Ingiere (estación, ocupación, ts). Las estaciones desconocidas se descartan y se cuentan."""
+        ids, valores, tiempos, descartadas = [], [], [], 0
+        for estacion, ocupacion, ts in lecturas:
+            id_estacion = self.id_estacion(estacion)
+            if id_estacion is None:
+                descartadas += 1
+                continue
+            ids.append(id_estacion)
+            valores.append(ocupacion)
+            tiempos.append(ts)
+        if not ids:
+            with self._lock:
+                self.descartadas += descartadas
+            return
+        ids = np.asarray(ids)
+        # Posición de cada lectura dentro de su estación, conservando el orden de llegada
+        orden = np.argsort(ids, kind="stable")
+        ids_ordenados = ids[orden]
+        cuantas = np.bincount(ids_ordenados, minlength=len(self.estaciones))
+        inicio_grupo = np.cumsum(cuantas) - cuantas
+        rango = np.arange(len(ids)) - inicio_grupo[ids_ordenados]
+        # De un lote más grande que el anillo solo cuentan las últimas `capacidad` lecturas
+        vigentes = rango >= cuantas[ids_ordenados] - self.capacidad
+        orden, ids_ordenados, rango = orden[vigentes], ids_ordenados[vigentes], rango[vigentes]
+        with self._lock:
+            columnas = (self._siguiente[ids_ordenados] + rango) % self.capacidad
+            self._valores[ids_ordenados, columnas] = np.clip(np.asarray(valores, dtype=np.float32)[orden], 0.0, 100.0)
+            self._tiempos[ids_ordenados, columnas] = np.asarray(tiempos)[orden]
+            self._siguiente += cuantas
+            self.lecturas += len(ids)
+            self.descartadas += descartadas
+
+    def recalcular(self, ahora: float = None):
+        """Promedio, máximo y última lectura de la ventana, y nivel del semáforo, para todas las estaciones."""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            valores, tiempos = self._valores.copy(), self._tiempos.copy()
+            ultima_columna = (self._siguiente - 1) % self.capacidad
+        en_ventana = tiempos >= ahora - self.ventana
+        n = en_ventana.sum(axis=1)
+        con_datos = n > 0
+        promedio = np.where(en_ventana, valores, 0.0).sum(axis=1) / np.maximum(n, 1)
+        maximo = np.where(en_ventana, valores, 0.0).max(axis=1)
+        filas = np.arange(len(self.estaciones))
+        ultima = valores[filas, ultima_columna]
+        nivel = np.select([~con_datos, promedio >= UMBRAL_ALTA, promedio >= UMBRAL_MEDIA], [SIN_DATOS, ALTA, MEDIA], AGIL)
+        # Se reemplaza el resumen completo de una vez: las consultas nunca ven uno a medias
+        self._resumen = {
+            "promedio": promedio, "maximo": maximo, "ultima": np.where(con_datos, ultima, np.nan),
+            "lecturas": n, "nivel": nivel, "edad": np.where(con_datos, ahora - tiempos[filas, ultima_columna], np.inf),
+            "calculado": ahora,
+        }
+        self.recalculos += 1
+
+    def consultar(self, estacion: str):
+        """Resumen de la estación en el último recálculo, o None si no la conoce o no hay resumen."""
+        id_estacion, resumen = self.id_estacion(estacion), self._resumen
+        if id_estacion is None or resumen is None:
+            return None
+        nivel = int(resumen["nivel"][id_estacion])
+        return {
+            "estacion": self.estaciones[id_estacion], "nivel": nivel, "semaforo": SEMAFOROS[nivel],
+            "ocupacion": round(float(resumen["promedio"][id_estacion]), 1), "maximo": round(float(resumen["maximo"][id_estacion]), 1),
+            "ultima": round(float(resumen["ultima"][id_estacion]), 1), "lecturas": int(resumen["lecturas"][id_estacion]),
+            "edad": float(resumen["edad"][id_estacion]), "calculado": resumen["calculado"],
+        }
+
+    def estadisticas(self) -> dict:
+        resumen = self._resumen
+        con_datos = int(np.sum(resumen["nivel"] != SIN_DATOS)) if resumen else 0
+        return {
+            "lecturas": self.lecturas, "descartadas": self.descartadas, "recalculos": self.recalculos,
+            "estaciones_con_datos": con_datos,
+            "estaciones_alta": int(np.sum(resumen["nivel"] == ALTA)) if resumen else 0,
+            "edad_resumen": time.time() - resumen["calculado"] if resumen else -1.0,
+        }
+
+
+class FuenteArchivo:
+    """Sigue un archivo de líneas JSON que otro proceso va llenando (como `tail -f`)."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._posicion = 0
+        self._resto = b""
+
+    def leer(self):
+        try:
+            with open(self.ruta, "rb") as archivo:
+                archivo.seek(0, 2)
+                if archivo.tell() < self._posicion:
+                    # El archivo se rotó o truncó: se empieza de nuevo
+                    self._posicion, self._resto = 0, b""
+                archivo.seek(self._posicion)
+                nuevo = archivo.read()
+                self._posicion = archivo.tell()
+        except FileNotFoundError:
+            return []
+        *lineas, self._resto = (self._resto + nuevo).split(b"\n")
+        return [l for l in map(parsear_lectura, lineas) if l]
+
+
+class FuenteFlujo:
+    """Flujo HTTP de líneas JSON; un hilo lo lee y se reconecta si se corta. `leer` entrega lo acumulado."""
+
+    def __init__(self, url: str, reconectar_tras: float = 5.0, max_pendientes: int = 100_000):
+        self.url = url
+        self.reconectar_tras = reconectar_tras
+        self._pendientes = deque(maxlen=max_pendientes)
+        self._detener = threading.Event()
+        threading.Thread(target=self._ciclo, name="afluencia-flujo", daemon=True).start()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            try:
+                with requests.get(self.url, stream=True, timeout=(5, 60)) as respuesta:
+                    respuesta.raise_for_status()
+                    for linea in respuesta.iter_lines():
+                        if self._detener.is_set():
+                            return
+                        lectura = parsear_lectura(linea) if linea else None
+                        if lectura:
+                            self._pendientes.append(lectura)
+            except Exception as e:
+                logger.warning(f"Flujo de afluencia {self.url} interrumpido: {e}")
+            self._detener.wait(self.reconectar_tras)
+
+    def leer(self):
+        lecturas = []
+        while self._pendientes:
+            lecturas.append(self._pendientes.popleft())
+        return lecturas
+
+    def detener(self):
+        self._detener.set()
+
+
+def crear_fuente(origen: str):
+    """FuenteFlujo para una URL http(s), FuenteArchivo para una ruta; None sin origen."""
+    if not origen:
+        return None
+    if origen.startswith(("http://", "https://")):
+        return FuenteFlujo(origen)
+    return FuenteArchivo(origen)
+
+
+class MonitorAfluencia:
+    """Cada `intervalo` segundos ingiere lo nuevo de la fuente y recalcula el resumen, en su propio hilo."""
+
+    def __init__(self, almacen: AlmacenAfluencia, fuente, intervalo: float = 5.0):
+        self.almacen = almacen
+        self.fuente = fuente
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+
+    def actualizar(self):
+        if self.fuente is not None:
+            self.almacen.registrar(self.fuente.leer())
+        self.almacen.recalcular()
+
+    def iniciar(self):
+        def ciclo():
+            while not self._detener.wait(self.intervalo):
+                try:
+                    self.actualizar()
+                except Exception as e:
+                    logger.warning(f"No se pudo actualizar la afluencia: {e}")
+        self.actualizar()
+        threading.Thread(target=ciclo, name="afluencia", daemon=True).start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        if hasattr(self.fuente, "detener"):
+            self.fuente.detener()
+
+    def consultar(self, estacion: str):
+        return self.almacen.consultar(estacion)
@@ -0,0 +1,330 @@
+"""Motor "Mago de Oz" del kiosco: clasificación de intenciones, respuestas y traducción.
+
+Vive fuera de app.py para poder usarlo sin Streamlit (scripts de precalentamiento, benchmarks).
+"""
+import time
+import logging
+import itertools
+import threading
+from typing import Literal
+
+import httpx
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from audio import preparar_audio
+from clasificador import ClasificadorLocal
+from metricas import METRICAS
+from reconocimiento import crear_motores
+from resiliencia import CircuitoAbierto, Interruptor, PlazoVencido, siguiente_con_plazo
+from direcciones import texto_indicaciones
+from traducciones import IDIOMAS, detectar_idioma
+
+logger = logging.getLogger(__name__)
+
+VIDEOS_DIR = "videos"
+
+# `{ruta}` se llena con las indicaciones de red_metro desde la estación del kiosco hacia
+# `estacion`; si no hay red disponible se usa el texto fijo de "ruta".
+RESPUESTAS = {
+    "azteca": {"video": f"{VIDEOS_DIR}/resp_azteca.mp4", "destino": "Estadio Azteca", "estacion": "Estadio Azteca", "texto": "Ruta al Estadio Azteca confirmada. {ruta} Ten en cuenta que hay saturación alta en esta estación, toma precauciones. Tu mapa está en pantalla.", "ruta": "Desde Zócalo, toma la Línea 2 hasta Tasqueña y ahí transborda al Tren Ligero hasta la estación Estadio Azteca."},
+    "sudafrica": {"video": f"{VIDEOS_DIR}/resp_sudafrica.mp4", "destino": "Estadio Azteca", "estacion": "Estadio Azteca", "texto": "¡El histórico partido inaugural! México contra Sudáfrica, juego uno del Grupo A. La cita es el jueves 11 de junio a las 15:00 horas en el imponente Estadio Azteca. Te dejo la ruta exacta aquí abajo. {ruta}", "ruta": ""},
+    "restaurante": {"video": f"{VIDEOS_DIR}/resp_restaurante.mp4", "destino": "Restaurante Balcón del Zócalo, Centro Histórico, CDMX", "estacion": "Zócalo", "texto": "¡Qué rico! El Centro Histórico tiene opciones increíbles como el Balcón del Zócalo. Te muestro en el mapa cómo llegar paso a paso para que disfrutes tu comida. {ruta}", "ruta": ""},
+    "perdido": {"video": f"{VIDEOS_DIR}/resp_perdido.mp4", "destino": None, "texto": "Lamento escuchar eso, entiendo la frustración. He registrado el reporte. Por favor, para contactar a la oficina de objetos extraviados dirígete a la jefatura y estación, ahí te apoyarán. Estamos para apoyarte."},
+    "otro": {"video": f"{VIDEOS_DIR}/idle.mp4", "destino": None, "texto": "No entendí bien, ¿puedes repetirlo?"},
+}
+
+class AnalisisConsulta(BaseModel):
+    intencion: Literal["azteca", "sudafrica", "restaurante", "perdido", "otro"]
+    idioma: str = Field(description="Código ISO 639-1 del idioma en que está escrita la pregunta")
+    texto: str = Field(description="La respuesta de la intención elegida, traducida al idioma de la pregunta")
+
+class SalidaInvalida(ValueError):
+    """Gemini respondió, pero sin el formato pedido: no es una falla del servicio."""
+
+
+class DemoAgent:
+    def __init__(self, google_api_key: str, umbral_clasificador: float = 0.7, traducciones=None, red=None, estacion_origen: str = "Zócalo", direcciones=None, max_concurrencia: int = 8, base_url_llm: str = None, endpoint_voz: str = None, motores_voz=None, plazo_llm: float = 6.0, cobertura_llm: float = 2.0, circuito=None):
+        # Pensado para vivir una sola vez por proceso: el cliente HTTP mantiene conexiones
+        # keep-alive con Gemini y el semáforo acota las llamadas simultáneas de todas las sesiones
+        limites = httpx.Limits(max_connections=max_concurrencia, max_keepalive_connections=max_concurrencia, keepalive_expiry=300)
+        # Sin reintentos del cliente (esperan hasta 16 s): los reintentos los decide `circuito.llamar`
+        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=google_api_key, temperature=0, client_args={"limits": limites}, base_url=base_url_llm, timeout=plazo_llm, max_retries=0)
+        self._cupo_llm = threading.BoundedSemaphore(max_concurrencia)
+        # Plazo por llamada y segundos tras los que se lanza un segundo intento en paralelo
+        self.plazo_llm = plazo_llm
+        self.cobertura_llm = cobertura_llm
+        # Interruptor compartido: con Gemini caído se responde al instante con el respaldo local
+        self.circuito = circuito or Interruptor("llm")
+        # CadenaMotores (reconocimiento.py); por defecto solo Google, con `endpoint_voz` alterno si se da
+        self.voz = motores_voz or crear_motores("google", endpoint_google=endpoint_voz)
+        # Vía rápida: las consultas con palabras clave claras no pasan por Gemini
+        self.clasificador = ClasificadorLocal(umbral=umbral_clasificador)
+        # CacheTraducciones opcional; sin ella cada traducción va al LLM
+        self.traducciones = traducciones
+        # RedMetro opcional para responder rutas sin red desde la estación del kiosco
+        self.red = red
+        self.estacion_origen = estacion_origen
+        # CacheDirecciones opcional: si ya tiene la ruta de Google, se muestra en español (`texto_vivo`)
+        self.direcciones = direcciones
+
+    @property
+    def origen_mapas(self) -> str:
+        return f"Metro {self.estacion_origen}, CDMX"
+
+    def _tomar_cupo(self, espera: float):
+        """Ocupa un lugar del semáforo del LLM esperando a lo más `espera` segundos. Lanza PlazoVencido."""
+        if not self._cupo_llm.acquire(timeout=max(0.0, espera)):
+            METRICAS.contar("llm_sin_cupo")
+            raise PlazoVencido(f"Sin cupo para el LLM en {espera:.1f}s")
+
+    def _invocar(self, cadena, entrada: dict):
+        """Llamada al LLM con plazo, segundo intento cubierto e interruptor. Lanza CircuitoAbierto o PlazoVencido."""
+        limite = time.monotonic() + self.plazo_llm
+        numero = itertools.count()
+
+        def intento():
+            # El primer intento espera cupo hasta el plazo; la cobertura solo sale si hay uno libre,
+            # así ninguno se queda en el pool esperando un lugar que no llegará a tiempo
+            self._tomar_cupo(limite - time.monotonic() if next(numero) == 0 else 0.0)
+            try:
+                return cadena.invoke(entrada)
+            finally:
+                self._cupo_llm.release()
+        return self.circuito.llamar(intento, self.plazo_llm, self.cobertura_llm)
+
+    def _invocar_flujo(self, cadena, entrada: dict, etapa: str):
+        """Fragmentos de texto conforme los emite el modelo; registra el tiempo al primero (`ttft_<etapa>`).
+
+        El primer fragmento debe llegar en `plazo_llm` segundos o se lanza PlazoVencido.
+        """
+        if not self.circuito.permitir():
+            raise CircuitoAbierto(f"Circuito '{self.circuito.nombre}' abierto")
+        inicio = time.perf_counter()
+        limite = time.monotonic() + self.plazo_llm
+        primero, con_cupo = True, False
+        try:
+            self._tomar_cupo(self.plazo_llm)
+            con_cupo = True
+            flujo = iter(cadena.stream(entrada))
+            while True:
+                if primero:
+                    # Un flujo atascado no retiene el turno hasta el timeout HTTP; el intento
+                    # abandonado conserva su cupo hasta que termine
+                    fragmento = siguiente_con_plazo(flujo, limite - time.monotonic(), al_abandonar=self._cupo_llm.release)
+                else:
+                    fragmento = next(flujo, None)
+                if fragmento is None:
+                    break
+                if not fragmento.content:
+                    continue
+                if primero:
+                    METRICAS.observar(f"ttft_{etapa}", time.perf_counter() - inicio)
+                    primero = False
+                yield fragmento.content
+        except GeneratorExit:
+            # El consumidor dejó de leer (p. ej. venció el plazo del turno): Gemini respondía si ya hubo texto
+            if primero:
+                self.circuito.fallo()
+            else:
+                self.circuito.exito()
+            raise
+        except PlazoVencido:
+            if con_cupo and primero:
+                con_cupo = False  # lo suelta `al_abandonar`
+            self.circuito.fallo()
+            raise
+        except Exception as e:
+            self.circuito.registrar_error(e)
+            raise
+        finally:
+            if con_cupo:
+                self._cupo_llm.release()
+        self.circuito.exito()
+
+    @METRICAS.cronometrar("transcribe_audio")
+    def transcribe_audio(self, audio_bytes: bytes) -> str:
+        try:
+            # Recortado a la voz, 16 kHz mono y ya en FLAC; None = solo silencio o ruido
+            audio = preparar_audio(audio_bytes)
+            if audio is None:
+                return ""
+            return self.voz.transcribir(audio)
+        except Exception:
+            METRICAS.error("transcribe_audio")
+            return ""
+
+    def respuesta(self, intencion: str) -> dict:
+        """Copia de la respuesta fija de `intencion` con la ruta ya calculada.
+
+        `texto` lleva la ruta de red_metro, estable para una estación: es la fuente de las
+        traducciones (y lo que precalienta precalentar_traducciones.py). Si la caché de Google
+        ya tiene la ruta, `texto_vivo` la usa en su lugar; cambia cada franja y solo se muestra en español.
+        """
+        resp = dict(RESPUESTAS[intencion], intencion=intencion)
+        ruta = resp.pop("ruta", "")
+        plantilla = resp["texto"]
+        if self.red is not None and resp.get("estacion"):
+            resp["ruta_metro"] = self.red.ruta(self.estacion_origen, resp["estacion"])
+            ruta = self.red.instrucciones(self.estacion_origen, resp["estacion"]) or ruta
+        resp["texto"] = plantilla.format(ruta=ruta).strip()
+        if self.direcciones is not None and resp["destino"]:
+            # Solo lectura de caché: nunca una llamada a la API dentro de la petición
+            resumen = self.direcciones.obtener(self.origen_mapas, resp["destino"])
+            if resumen is not None:
+                resp["direcciones"] = resumen
+                resp["texto_vivo"] = plantilla.format(ruta=texto_indicaciones(resumen)).strip()
+        return resp
+
+    def _clasificar_llm(self, query: str) -> dict:
+        prompt = ChatPromptTemplate.from_template(
+            "Clasifica esta pregunta del usuario: '{query}'. "
+            "Responde ÚNICAMENTE con una de estas 4 claves: "
+            "1. 'azteca' (Si menciona estadio azteca o banorte). "
+            "2. 'sudafrica' (Si menciona México, Sudáfrica o partido inaugural). "
+            "3. 'restaurante' (Si busca comer, comida o restaurante). "
+            "4. 'perdido' (Si menciona reporte, objeto perdido o robo). "
+            "Si no es ninguna, responde 'otro'."
+        )
+        try:
+            intencion = self._invocar(prompt | self.llm, {"query": query}).content.strip().lower()
+            
+            for clave in ("azteca", "sudafrica", "restaurante", "perdido"):
+                if clave in intencion:
+                    return self.respuesta(clave)
+            return self.respuesta("otro")
+        except Exception as e:
+            METRICAS.error("clasificar_intencion")
+            logger.warning(f"Clasificación con LLM falló, usando el clasificador local: {e}")
+            return self._respaldo_local(query)
+
+    def _respaldo_local(self, query: str) -> dict:
+        """Mejor intención por palabras clave aunque no llegue al umbral; 'otro' si no hay ninguna.
+
+        La respuesta lleva `degradada=True`: es una suposición y no debe guardarse en cachés compartidas.
+        """
+        METRICAS.contar("respaldo_local")
+        puntajes = self.clasificador.puntuar(query)
+        resp = self.respuesta(max(puntajes, key=puntajes.get) if puntajes else "otro")
+        resp["degradada"] = True
+        return resp
+
+    @METRICAS.cronometrar("clasificar_intencion")
+    def resolver_intencion(self, query: str, prefijo: str = ""):
+        """Regresa (respuesta, localizada). Si `localizada` es False falta traducir `texto_con_prefijo(respuesta)`
+        (con `vivo=True` si la pregunta está en español).
+
+        `respuesta["degradada"]` es True si la intención salió del respaldo local porque el LLM no respondió.
+        """
+        intencion, _ = self.clasificador.clasificar(query)
+        if intencion is not None:
+            resp = self.respuesta(intencion)
+            resp["idioma"] = detectar_idioma(query)
+            return resp, False
+
+        # Una sola llamada estructurada en lugar de clasificar + traducir
+        try:
+            analisis = self._analisis_estructurado(query, prefijo)
+            resp = self.respuesta(analisis.intencion)
+            idioma = analisis.idioma.lower()[:2]
+            texto = self.texto_con_prefijo(resp, prefijo)
+            resp["idioma"] = idioma
+            # En español el texto canónico es exacto; no dependemos de que el modelo lo copie igual
+            if idioma == "es":
+                resp["texto"] = self.texto_con_prefijo(resp, prefijo, vivo=True)
+            else:
+                resp["texto"] = analisis.texto
+                if self.traducciones is not None and idioma in IDIOMAS:
+                    self.traducciones.guardar(texto, idioma, analisis.texto)
+            return resp, True
+        except SalidaInvalida as e:
+            # Gemini contestó pero mal formado: una llamada más sencilla sí puede salir bien
+            METRICAS.contar("analisis_estructurado_fallido")
+            logger.warning(f"Análisis estructurado falló, usando clasificar + traducir: {e}")
+        except Exception as e:
+            # Gemini caído, lento o rechazando la petición (4xx): otra llamada solo alargaría la espera
+            logger.warning(f"Análisis estructurado sin respuesta, usando el clasificador local: {e}")
+            resp = self._respaldo_local(query)
+            resp["idioma"] = detectar_idioma(query)
+            return resp, False
+
+        return self._clasificar_llm(query), False
+
+    def _analisis_estructurado(self, query: str, prefijo: str) -> AnalisisConsulta:
+        respuestas = "\n".join(f"- {clave}: {self.texto_con_prefijo(self.respuesta(clave), prefijo)}" for clave in RESPUESTAS)
+        prompt = ChatPromptTemplate.from_template(
+            "Pregunta del usuario: '{query}'.\n"
+            "1. Clasifícala en una de estas claves: 'azteca' (si menciona estadio azteca o banorte), "
+            "'sudafrica' (si menciona México, Sudáfrica o partido inaugural), 'restaurante' (si busca comer, comida o restaurante), "
+            "'perdido' (si menciona reporte, objeto perdido o robo) u 'otro'.\n"
+            "2. Detecta el idioma de la pregunta.\n"
+            "3. Toma la respuesta de la clave elegida y tradúcela sin explicaciones extras al idioma de la pregunta:\n{respuestas}"
+        )
+        # include_raw: un error de formato vuelve como dato y se revisa aquí, fuera de la llamada
+        # (no se reintenta ni cuenta como fallo del circuito)
+        salida = self._invocar(prompt | self.llm.with_structured_output(AnalisisConsulta, include_raw=True), {"query": query, "respuestas": respuestas})
+        analisis = salida.get("parsed")
+        if salida.get("parsing_error") is not None or not isinstance(analisis, AnalisisConsulta):
+            raise SalidaInvalida(f"Salida estructurada inválida: {salida.get('parsing_error') or salida.get('raw')!r}")
+        return analisis
+
+    @staticmethod
+    def texto_con_prefijo(resp: dict, prefijo: str, vivo: bool = False) -> str:
+        """`vivo` usa las indicaciones de Google si las hay: solo para mostrar en español, nunca para traducir."""
+        texto = resp.get("texto_vivo", resp["texto"]) if vivo else resp["texto"]
+        return (prefijo if resp["destino"] else "") + texto
+
+    @METRICAS.cronometrar("traduccion_inteligente")
+    def traduccion_completa(self, texto: str, query: str):
+        """(traducción, degradada): `degradada` es True si quedó sin traducir o a medias."""
+        flujo, fragmentos = self.traduccion_en_flujo(texto, query), []
+        while True:
+            try:
+                fragmentos.append(next(flujo))
+            except StopIteration as fin:
+                return "".join(fragmentos).strip(), bool(fin.value)
+
+    def traduccion_en_flujo(self, texto: str, query: str):
+        """Genera la traducción por fragmentos. Español o caché: el texto completo de una vez.
+
+        Si el LLM falla antes del primer fragmento se emite `texto` sin traducir. El valor de
+        retorno del generador es True si la traducción quedó degradada (sin traducir o cortada).
+        """
+        # La clave de caché es el idioma detectado, no la redacción exacta de la pregunta
+        idioma = detectar_idioma(query)
+        if idioma == "es":
+            yield texto
+            return
+        if idioma is None or self.traducciones is None:
+            prompt = ChatPromptTemplate.from_template("Traduce sin explicaciones extras: '{texto}' al idioma de '{query}'.")
+            entrada = {"texto": texto, "query": query}
+        else:
+            traduccion = self.traducciones.obtener(texto, idioma)
+            if traduccion is not None:
+                yield traduccion
+                return
+            prompt = ChatPromptTemplate.from_template("Traduce sin explicaciones extras: '{texto}' al {idioma}.")
+            entrada = {"texto": texto, "idioma": IDIOMAS[idioma]}
+
+        fragmentos = []
+        try:
+            for fragmento in self._invocar_flujo(prompt | self.llm, entrada, "traduccion"):
+                fragmentos.append(fragmento)
+                yield fragmento
+        except Exception as e:
+            if isinstance(e, CircuitoAbierto):
+                METRICAS.contar("respaldo_sin_traducir")
+            else:
+                METRICAS.error("traduccion_inteligente")
+                logger.warning(f"Traducción en flujo falló: {e}")
+            if not fragmentos:
+                yield texto
+            return True
+        if idioma is not None and self.traducciones is not None and fragmentos:
+            self.traducciones.guardar(texto, idioma, "".join(fragmentos).strip())
+
+    def traducir(self, texto: str, idioma: str) -> str:
+        """Traduce `texto` al idioma con código ISO `idioma`. Propaga los errores del LLM."""
+        prompt = ChatPromptTemplate.from_template("Traduce sin explicaciones extras: '{texto}' al {idioma}.")
+        return self._invocar(prompt | self.llm, {"texto": texto, "idioma": IDIOMAS[idioma]}).content.strip()
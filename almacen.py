@@ -0,0 +1,66 @@
+"""Almacén clave-valor en SQLite compartido entre los workers del mismo host.
+
+SQLite en modo WAL permite varios lectores y un escritor a la vez entre procesos,
+así que todos los workers de Streamlit ven lo que cualquiera de ellos guardó.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class AlmacenSQLite:
+    """`ttl` (segundos) vence las entradas por edad y `max_filas` limita la tabla; ambos se aplican en `purgar`."""
+
+    def __init__(self, ruta: str, tabla: str, ttl: float = None, max_filas: int = None):
+        if not tabla.isidentifier():
+            raise ValueError(f"Nombre de tabla inválido: {tabla!r}")
+        self.ruta, self.tabla, self.ttl, self.max_filas = ruta, tabla, ttl, max_filas
+        self._local = threading.local()
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with self._conexion() as con:
+            con.execute(f"CREATE TABLE IF NOT EXISTS {tabla} (clave TEXT PRIMARY KEY, valor TEXT NOT NULL, creado REAL NOT NULL)")
+            con.execute(f"CREATE INDEX IF NOT EXISTS {tabla}_creado ON {tabla} (creado)")
+
+    def _conexion(self):
+        # sqlite3 no permite compartir conexiones entre hilos: una por hilo
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=5.0)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def obtener(self, clave: str):
+        fila = self._conexion().execute(f"SELECT valor, creado FROM {self.tabla} WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        if self.ttl is not None and time.time() - fila[1] > self.ttl:
+            return None
+        return json.loads(fila[0])
+
+    def guardar(self, clave: str, valor):
+        with self._conexion() as con:
+            con.execute(
+                f"INSERT OR REPLACE INTO {self.tabla} (clave, valor, creado) VALUES (?, ?, ?)",
+                (clave, json.dumps(valor, ensure_ascii=False), time.time()),
+            )
+
+    def purgar(self) -> int:
+        """Elimina las entradas vencidas y, pasando de `max_filas`, las más viejas; regresa cuántas se borraron."""
+        borradas = 0
+        with self._conexion() as con:
+            if self.ttl is not None:
+                borradas += con.execute(f"DELETE FROM {self.tabla} WHERE creado < ?", (time.time() - self.ttl,)).rowcount
+            if self.max_filas is not None:
+                borradas += con.execute(
+                    f"DELETE FROM {self.tabla} WHERE clave IN (SELECT clave FROM {self.tabla} ORDER BY creado DESC LIMIT -1 OFFSET ?)",
+                    (self.max_filas,),
+                ).rowcount
+        return borradas
+
+    def __len__(self):
+        return self._conexion().execute(f"SELECT COUNT(*) FROM {self.tabla}").fetchone()[0]
@@ -2,33 +2,60 @@ import streamlit as st
 import os
 import requests
 import logging
-import base64
-import random
 import googlemaps
-import urllib.parse
 import streamlit.components.v1 as components
-import speech_recognition as sr
-import io
+from streamlit.errors import StreamlitAPIException
+import glob
 from datetime import datetime 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
 from streamlit_mic_recorder import mic_recorder
+from media import MediaCache, MediaServer
+from agente import DemoAgent, RESPUESTAS, VIDEOS_DIR
+from traducciones import CacheTraducciones
+from red_metro import RedMetro
+from direcciones import CacheDirecciones
+from codigos_qr import GeneradorQR, url_movil
+from pipeline import PipelineTurno
+from reconocimiento import crear_motores
+from cache_semantica import CacheSemantica
+from historial import HistorialChat
+from afluencia import ALTA, SEMAFOROS, SIN_DATOS, AlmacenAfluencia, MonitorAfluencia, crear_fuente
+from metricas import METRICAS
 
 # --- 1. CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Metro CDMX - Módulo Virtual", layout="wide", page_icon=None)
 
 # --- 2. CONFIGURACIÓN DE ARCHIVOS Y RUTAS ---
 LOGO_PATH = "Logo_STC_METRO.svg" 
-VIDEOS_DIR = "videos"
 PLACEHOLDER_PATH = "espera.jpeg"
 
+# Los videos se cargan una vez por proceso y se sirven por URL si MEDIA_PUBLIC_URL dice
+# cómo llega el navegador al servidor de medios; si no, van en línea (ver media.py).
+# El servidor HTTP solo se abre si hace falta (URL pública o METRICAS_HTTP para /metrics)
+# y por defecto solo en 127.0.0.1: MEDIA_HOST=0.0.0.0 lo expone a la red del kiosco
+@st.cache_resource
+def iniciar_servidor_medios():
+    servidor = MediaServer(
+        MediaCache(max_bytes=int(st.secrets.get("MEDIA_CACHE_MB", 64)) * 1024 * 1024),
+        raices=(VIDEOS_DIR,),
+        host=st.secrets.get("MEDIA_HOST", "127.0.0.1"),
+        puerto=int(st.secrets.get("MEDIA_PORT", 8502)),
+        url_publica=st.secrets.get("MEDIA_PUBLIC_URL"),
+    )
+    # Los clips localizados (videos/<idioma>/, renderizar_clips.py) se leen al pedirse por primera vez
+    for ruta in sorted(glob.glob(f"{VIDEOS_DIR}/*.mp4")):
+        servidor.precargar(ruta)
+    if servidor.url_publica or st.secrets.get("METRICAS_HTTP", False):
+        servidor.iniciar()
+    return servidor
+
+medios = iniciar_servidor_medios()
+
+def url_medio(ruta):
+    # Bajo HTTPS una URL http del servidor de medios sería contenido mixto bloqueado
+    return medios.url(ruta, pagina_https=(st.context.url or "").startswith("https://"))
+
 def get_image_src(image_path):
-    if os.path.exists(image_path):
-        with open(image_path, "rb") as img_file:
-            b64_data = base64.b64encode(img_file.read()).decode()
-            mime = "image/svg+xml" if image_path.endswith(".svg") else "image/png"
-            return f"data:{mime};base64,{b64_data}"
-    return ""
+    return medios.cache.data_uri(image_path)
 
 logo_src = get_image_src(LOGO_PATH) or "https://upload.wikimedia.org/wikipedia/commons/thumb/1/13/Metro_de_la_Ciudad_de_M%C3%A9xico_logo.svg/1200px-Metro_de_la_Ciudad_de_M%C3%A9xico_logo.svg.png"
 
@@ -63,6 +90,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 GOOGLE_API_KEY = st.secrets.get("GOOGLE_API_KEY")
+ESTACION_KIOSCO = st.secrets.get("ESTACION_KIOSCO", "Zócalo")
 try:
     gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
 except Exception:
@@ -75,255 +103,340 @@ MODOS = {
     "seguridad": {"icon": "🛡️", "video": f"{VIDEOS_DIR}/bienvenida_seguridad.mp4"}
 }
 
-# --- 5. GPS Y SIMULADOR DE CÁMARAS ---
-def obtener_info_gps_silent():
-    lat, lon, estacion = 19.4326018, -99.1328416, "Metro Zócalo"
-    nivel = random.randint(10, 95) 
-    semaforo = "🔴 Alta" if nivel >= 75 else ("🟡 Media" if nivel >= 40 else "🟢 Ágil")
-    return f"{lat},{lon} (Cerca de {estacion} | Semáforo: {semaforo})"
-
-location_context = obtener_info_gps_silent()
-
-# --- 6. MOTOR "MAGO DE OZ" ---
-class DemoAgent:
-    def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GOOGLE_API_KEY, temperature=0)
-
-    def transcribe_audio(self, audio_bytes: bytes) -> str:
-        r = sr.Recognizer()
-        try:
-            audio_file = io.BytesIO(audio_bytes)
-            with sr.AudioFile(audio_file) as source:
-                return r.recognize_google(r.record(source), language="es-MX")
-        except: return ""
-
-    def clasificar_intencion(self, query: str) -> dict:
-        prompt = ChatPromptTemplate.from_template(
-            "Clasifica esta pregunta del usuario: '{query}'. "
-            "Responde ÚNICAMENTE con una de estas 4 claves: "
-            "1. 'azteca' (Si menciona estadio azteca o banorte). "
-            "2. 'sudafrica' (Si menciona México, Sudáfrica o partido inaugural). "
-            "3. 'restaurante' (Si busca comer, comida o restaurante). "
-            "4. 'perdido' (Si menciona reporte, objeto perdido o robo). "
-            "Si no es ninguna, responde 'otro'."
-        )
-        try:
-            intencion = (prompt | self.llm).invoke({"query": query}).content.strip().lower()
-            
-            if "azteca" in intencion:
-                return {"video": f"{VIDEOS_DIR}/resp_azteca.mp4", "destino": "Estadio Azteca", "texto": "Ruta al Estadio Azteca confirmada. Desde Zócalo, toma la Línea 2 hasta Tasqueña y ahí transborda al Tren Ligero hasta la estación Estadio Azteca. Ten en cuenta que hay saturación alta en esta estación, toma precauciones. Tu mapa está en pantalla."}
-            elif "sudafrica" in intencion:
-                return {"video": f"{VIDEOS_DIR}/resp_sudafrica.mp4", "destino": "Estadio Azteca", "texto": "¡El histórico partido inaugural! México contra Sudáfrica, juego uno del Grupo A. La cita es el jueves 11 de junio a las 15:00 horas en el imponente Estadio Azteca. Te dejo la ruta exacta aquí abajo."}
-            elif "restaurante" in intencion:
-                return {"video": f"{VIDEOS_DIR}/resp_restaurante.mp4", "destino": "Restaurante Balcón del Zócalo, Centro Histórico, CDMX", "texto": "¡Qué rico! El Centro Histórico tiene opciones increíbles como el Balcón del Zócalo. Te muestro en el mapa cómo llegar paso a paso para que disfrutes tu comida."}
-            elif "perdido" in intencion:
-                return {"video": f"{VIDEOS_DIR}/resp_perdido.mp4", "destino": None, "texto": "Lamento escuchar eso, entiendo la frustración. He registrado el reporte. Por favor, para contactar a la oficina de objetos extraviados dirígete a la jefatura y estación, ahí te apoyarán. Estamos para apoyarte."}
-            else:
-                return {"video": f"{VIDEOS_DIR}/idle.mp4", "destino": None, "texto": "No entendí bien, ¿puedes repetirlo?"}
-        except:
-            return {"video": f"{VIDEOS_DIR}/idle.mp4", "destino": None, "texto": "Error de conexión."}
-
-    def traduccion_inteligente(self, texto: str, query: str) -> str:
-        prompt = ChatPromptTemplate.from_template("Traduce sin explicaciones extras: '{texto}' al idioma de '{query}'.")
-        try: return (prompt | self.llm).invoke({"texto": texto, "query": query}).content.strip()
-        except: return texto
+# --- 5. AFLUENCIA DE LA ESTACIÓN ---
+# Afluencia por estación desde AFLUENCIA_FUENTE (archivo de líneas JSON o URL de flujo);
+# el monitor la refresca en segundo plano y aquí solo se lee el último resumen
+@st.cache_resource
+def obtener_afluencia():
+    almacen = AlmacenAfluencia(ventana=float(st.secrets.get("AFLUENCIA_VENTANA_MIN", 5)) * 60)
+    monitor = MonitorAfluencia(almacen, crear_fuente(st.secrets.get("AFLUENCIA_FUENTE")), intervalo=float(st.secrets.get("AFLUENCIA_INTERVALO", 5)))
+    return monitor.iniciar()
+
+def saturacion_kiosco():
+    afluencia = obtener_afluencia().consultar(ESTACION_KIOSCO)
+    return afluencia["semaforo"] if afluencia else SEMAFOROS[SIN_DATOS]
+
+# --- 6. MOTOR "MAGO DE OZ" (ver agente.py) ---
+# Caché de traducciones compartida por todas las sesiones (y por los workers vía SQLite)
+@st.cache_resource
+def obtener_cache_traducciones():
+    return CacheTraducciones(
+        ruta_db=st.secrets.get("CACHE_DB", ".cache/kiosco.sqlite3"), max_entradas=int(st.secrets.get("CACHE_TRADUCCIONES_MAX", 512)),
+        ttl=float(st.secrets.get("CACHE_TRADUCCIONES_DIAS", 30)) * 86400, max_disco=int(st.secrets.get("CACHE_TRADUCCIONES_MAX_DISCO", 5000)),
+    )
+
+# Grafo del Metro con todas las rutas precalculadas: se construye una vez por proceso
+@st.cache_resource
+def obtener_red_metro():
+    return RedMetro()
+
+# Rutas de Google Directions por franja horaria; se precalientan todos los destinos al arrancar
+@st.cache_resource
+def obtener_direcciones():
+    if gmaps is None:
+        return None
+    direcciones = CacheDirecciones(gmaps, ruta_db=st.secrets.get("CACHE_DB", ".cache/kiosco.sqlite3"), ttl=float(st.secrets.get("DIRECCIONES_TTL_HORAS", 6)) * 3600)
+    # Refresco en segundo plano: cada franja de 30 min se consulta antes de que la pida un turno
+    direcciones.mantener_caliente(f"Metro {ESTACION_KIOSCO}, CDMX", [r["destino"] for r in RESPUESTAS.values() if r["destino"]])
+    return direcciones
+
+@st.cache_resource
+def obtener_generador_qr():
+    return GeneradorQR()
+
+# Un solo DemoAgent por proceso (cliente LLM, pool HTTP y motores de voz compartidos);
+# el estado de cada kiosco (historial, modo, video) sigue en session_state
+@st.cache_resource
+def obtener_agente():
+    return DemoAgent(
+        GOOGLE_API_KEY,
+        umbral_clasificador=float(st.secrets.get("UMBRAL_CLASIFICADOR", 0.7)),
+        traducciones=obtener_cache_traducciones(),
+        red=obtener_red_metro(),
+        estacion_origen=ESTACION_KIOSCO,
+        direcciones=obtener_direcciones(),
+        max_concurrencia=int(st.secrets.get("LLM_MAX_CONCURRENCIA", 8)),
+        plazo_llm=float(st.secrets.get("LLM_PLAZO", 6)),
+        cobertura_llm=float(st.secrets.get("LLM_COBERTURA", 2)),
+        # p. ej. MOTORES_VOZ = "vosk,google": Vosk local primero, Google si falla
+        motores_voz=crear_motores(st.secrets.get("MOTORES_VOZ", "google"), ruta_vosk=st.secrets.get("VOSK_MODELO"), plazo_google=float(st.secrets.get("VOZ_PLAZO", 5))),
+    )
+
+# Turnos completos compartidos entre sesiones para las preguntas casi repetidas
+@st.cache_resource
+def obtener_cache_respuestas():
+    return CacheSemantica(
+        umbral=float(st.secrets.get("CACHE_SEMANTICA_UMBRAL", 0.85)),
+        max_entradas=int(st.secrets.get("CACHE_SEMANTICA_MAX", 512)),
+        ttl=float(st.secrets.get("CACHE_SEMANTICA_TTL_MIN", 30)) * 60,
+    )
+
+@st.cache_resource
+def obtener_pipeline():
+    return PipelineTurno(obtener_agente(), generador_qr=obtener_generador_qr(), clave_mapas=GOOGLE_API_KEY, cache_respuestas=obtener_cache_respuestas())
+
+# Fuentes de tasas de caché + exportación periódica (archivo Prometheus, línea JSON en el log y /metrics)
+@st.cache_resource
+def iniciar_metricas():
+    agente = obtener_agente()
+    METRICAS.registrar_fuente("clasificador", agente.clasificador.estadisticas)
+    METRICAS.registrar_fuente("circuito_llm", agente.circuito.estadisticas)
+    METRICAS.registrar_fuente("traducciones", obtener_cache_traducciones().estadisticas)
+    METRICAS.registrar_fuente("qr", obtener_generador_qr().estadisticas)
+    METRICAS.registrar_fuente("medios", medios.cache.estadisticas)
+    METRICAS.registrar_fuente("respuestas", obtener_cache_respuestas().estadisticas)
+    METRICAS.registrar_fuente("afluencia", obtener_afluencia().almacen.estadisticas)
+    if obtener_direcciones() is not None:
+        METRICAS.registrar_fuente("direcciones", obtener_direcciones().estadisticas)
+    # /metrics (con METRICAS_HTTP) solo lo sirve el worker dueño del puerto de medios; el resto se lee de su archivo (uno por pid)
+    medios.agregar_ruta("/metrics", lambda: ("text/plain; version=0.0.4", METRICAS.prometheus().encode()))
+    METRICAS.iniciar_exportacion(st.secrets.get("METRICAS_ARCHIVO", ".cache/metricas.{pid}.prom"), intervalo=float(st.secrets.get("METRICAS_INTERVALO", 60)))
+    return METRICAS
 
 # --- INICIALIZACIÓN ---
-if "demo_agent" not in st.session_state: st.session_state.demo_agent = DemoAgent()
+iniciar_metricas()
+if "demo_agent" not in st.session_state: st.session_state.demo_agent = obtener_agente()
 if "active_mode" not in st.session_state: st.session_state.active_mode = None
-if "chat_history" not in st.session_state: st.session_state.chat_history = []
+if "chat_history" not in st.session_state: st.session_state.chat_history = HistorialChat(int(st.secrets.get("HISTORIAL_MAX", 20)))
 if "current_video" not in st.session_state: st.session_state.current_video = f"{VIDEOS_DIR}/idle.mp4"
 if "map_fullscreen" not in st.session_state: st.session_state.map_fullscreen = False
 if "active_map_url" not in st.session_state: st.session_state.active_map_url = None
 
 # --- LAYOUT PRINCIPAL (Menú Izquierda [2], Avatar Derecha [1]) ---
-col1, col2 = st.columns([2, 1], gap="large")
+# Cada región es un fragmento con nombre: una interacción solo vuelve a ejecutar las
+# regiones que cambia, no la página entera (CSS, barra, inicialización). Los botones
+# lo piden desde su callback con st.rerun([...]); a media respuesta el panel le avisa
+# al reproductor del nuevo video por un BroadcastChannel del navegador.
 
-with col1:
-    st.markdown("")
-
-    # --- VISTA A: MODO MAPA (POPUP DENTRO DE COL1) ---
-    if st.session_state.active_mode is not None and st.session_state.map_fullscreen:
-        c_map_title, c_close = st.columns([9, 1])
-        with c_map_title:
-            st.markdown(f"### 🗺️ Ruta sugerida hacia: {st.session_state.active_mode.capitalize()}")
-        with c_close:
-            # EL BOTÓN "X" PARA CERRAR
-            if st.button("❌", help="Cerrar mapa y volver al chat"):
-                st.session_state.map_fullscreen = False
-                st.rerun()
-        
-        # Mapa masivo que ocupa todo el alto disponible (600px)
-        st.components.v1.iframe(st.session_state.active_map_url, height=600, scrolling=True)
-        st.info("💡 Toca la 'X' arriba a la derecha para volver a hablar con el asistente.")
-
-    # --- VISTA B: MENÚ PRINCIPAL ---
-    if st.session_state.active_mode is None:
-        # MENÚ PRINCIPAL MASIVO
+def cambiar_modo(modo, video_path):
+    st.session_state.active_mode = modo
+    st.session_state.current_video = video_path
+    st.session_state.chat_history.tocar()
+    if modo is None:
+        st.session_state.chat_history.limpiar()
+    st.rerun(["panel", "avatar"])
+
+def cerrar_mapa():
+    st.session_state.map_fullscreen = False
+    st.session_state.chat_history.tocar()
+    st.rerun("panel")
+
+def repetir_panel():
+    # scope="fragment" solo vale en pasadas del fragmento; en una pasada completa se repite todo
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def avisar_avatar(video_path):
+    """Cambia el video del reproductor sin volver a dibujarlo (ni esperar a que termine el turno)."""
+    st.session_state.current_video = video_path
+    if not os.path.exists(video_path):
+        return
+    st.session_state.avisos_avatar = st.session_state.get("avisos_avatar", 0) + 1
+    idle = "idle" in video_path
+    # El número de aviso hace único el HTML para que el navegador lo ejecute cada vez
+    components.html(f"""
+    <script>
+        new BroadcastChannel("avatar-kiosco").postMessage({{src: "{url_medio(video_path)}", idle: {str(idle).lower()}, aviso: {st.session_state.avisos_avatar}}});
+    </script>
+    """, height=0)
+
+def popup_mapa():
+    c_map_title, c_close = st.columns([9, 1])
+    with c_map_title:
+        st.markdown(f"### 🗺️ Ruta sugerida hacia: {st.session_state.active_mode.capitalize()}")
+    with c_close:
+        # EL BOTÓN "X" PARA CERRAR
+        st.button("❌", help="Cerrar mapa y volver al chat", on_click=cerrar_mapa)
+
+    # Mapa masivo que ocupa todo el alto disponible (600px)
+    st.components.v1.iframe(st.session_state.active_map_url, height=600, scrolling=True)
+    st.info("💡 Toca la 'X' arriba a la derecha para volver a hablar con el asistente.")
+
+def menu_modos():
+    # MENÚ PRINCIPAL MASIVO
+    st.markdown("""
+    <style>
+        div[data-testid="stButton"] button { width: 100% !important; aspect-ratio: 1 / 1 !important; height: auto !important; border-radius: 30px !important; border: 4px solid #F7931E !important; background-color: #ffffff !important; transition: transform 0.2s !important; }
+        div[data-testid="stButton"] button:hover { transform: scale(1.05) !important; border: 4px solid #000000 !important; box-shadow: 0 15px 30px rgba(0,0,0,0.15) !important; }
+        div[data-testid="stButton"] button p, div[data-testid="stButton"] button div { font-size: 102px !important; margin: 0 !important; line-height: 1 !important; display: flex !important; align-items: center !important; justify-content: center !important; }
+    </style>
+    """, unsafe_allow_html=True)
+
+    st.markdown("<h2 style='text-align: center; color: #333; margin-bottom: 30px;'>👆 Toca una opción para comenzar:</h2>", unsafe_allow_html=True)
+
+    etiquetas = {"rutas": "Mapas y rutas", "turismo": "Puntos de interés", "mundial": "Horarios y sedes", "seguridad": "Seguridad"}
+    for columna, (modo, etiqueta) in zip(st.columns(4, gap="medium"), etiquetas.items()):
+        with columna:
+            st.button(MODOS[modo]["icon"], use_container_width=True, on_click=cambiar_modo, args=(modo, MODOS[modo]["video"]))
+            st.markdown(f"<h3 style='text-align: center; margin-top: 10px; color: #555;'>{etiqueta}</h3>", unsafe_allow_html=True)
+
+def panel_chat(popup):
+    modo_actual = MODOS[st.session_state.active_mode]
+    c_back, c_icon, c_void = st.columns([1, 1, 3])
+    with c_back:
+        # CSS para hacer grande el botón de regresar
         st.markdown("""
         <style>
-            div[data-testid="stButton"] button { width: 100% !important; aspect-ratio: 1 / 1 !important; height: auto !important; border-radius: 30px !important; border: 4px solid #F7931E !important; background-color: #ffffff !important; transition: transform 0.2s !important; }
-            div[data-testid="stButton"] button:hover { transform: scale(1.05) !important; border: 4px solid #000000 !important; box-shadow: 0 15px 30px rgba(0,0,0,0.15) !important; }
-            div[data-testid="stButton"] button p, div[data-testid="stButton"] button div { font-size: 102px !important; margin: 0 !important; line-height: 1 !important; display: flex !important; align-items: center !important; justify-content: center !important; }
+        div[data-testid="column"]:first-child button { height: 70px !important; border-radius: 15px !important; font-size: 24px !important; font-weight: bold !important; border: 2px solid #ccc !important; }
         </style>
         """, unsafe_allow_html=True)
 
-        st.markdown("<h2 style='text-align: center; color: #333; margin-bottom: 30px;'>👆 Toca una opción para comenzar:</h2>", unsafe_allow_html=True)
-        
-        col_rutas, col_turismo, col_mundial, col_seguridad = st.columns(4, gap="medium")
-        
-        with col_rutas:
-            if st.button(MODOS["rutas"]["icon"], use_container_width=True): 
-                st.session_state.active_mode = "rutas"
-                st.session_state.current_video = MODOS["rutas"]["video"]
-                st.rerun()
-            st.markdown("<h3 style='text-align: center; margin-top: 10px; color: #555;'>Mapas y rutas</h3>", unsafe_allow_html=True)
-                
-        with col_turismo:
-            if st.button(MODOS["turismo"]["icon"], use_container_width=True): 
-                st.session_state.active_mode = "turismo"
-                st.session_state.current_video = MODOS["turismo"]["video"]
-                st.rerun()
-            st.markdown("<h3 style='text-align: center; margin-top: 10px; color: #555;'>Puntos de interés</h3>", unsafe_allow_html=True)
-                
-        with col_mundial:
-            if st.button(MODOS["mundial"]["icon"], use_container_width=True): 
-                st.session_state.active_mode = "mundial"
-                st.session_state.current_video = MODOS["mundial"]["video"]
-                st.rerun()
-            st.markdown("<h3 style='text-align: center; margin-top: 10px; color: #555;'>Horarios y sedes</h3>", unsafe_allow_html=True)
-                
-        with col_seguridad:
-            if st.button(MODOS["seguridad"]["icon"], use_container_width=True): 
-                st.session_state.active_mode = "seguridad"
-                st.session_state.current_video = MODOS["seguridad"]["video"]
-                st.rerun()
-            st.markdown("<h3 style='text-align: center; margin-top: 10px; color: #555;'>Seguridad</h3>", unsafe_allow_html=True)
-
-    else:
-        modo_actual = MODOS[st.session_state.active_mode]
-        c_back, c_icon, c_void = st.columns([1, 1, 3])
-        with c_back:
-            # CSS para hacer grande el botón de regresar
-            st.markdown("""
-            <style>
-            div[data-testid="column"]:first-child button { height: 70px !important; border-radius: 15px !important; font-size: 24px !important; font-weight: bold !important; border: 2px solid #ccc !important; }
-            </style>
-            """, unsafe_allow_html=True)
-            
-            if st.button("🔙 Regresar", key="btn_back", use_container_width=True):
-                st.session_state.active_mode = None
-                st.session_state.chat_history = []
-                st.session_state.current_video = f"{VIDEOS_DIR}/idle.mp4"
-                st.rerun()
-        with c_icon:
-            st.markdown(f"<h1 style='margin-top: -10px; font-size: 60px;'>{modo_actual['icon']}</h1>", unsafe_allow_html=True)
-            
-        st.divider()
-
-        with st.container(height=300, border=False):
-            for msg in st.session_state.chat_history:
-                with st.chat_message(msg["role"]):
-                    st.write(msg["content"])
-                    if msg.get("map_url"):
-                        st.components.v1.iframe(msg["map_url"], height=450, scrolling=True)
-                        if msg.get("qr_url"):
-                            c_qr, c_texto = st.columns([1, 3])
-                            with c_qr: st.image(msg["qr_url"], width=120)
-                            with c_texto: st.info("📱 **Escanea este código** para llevarte la ruta a tu celular.")
-
-        with st.container(border=True):
-            c_mic, c_txt = st.columns([1, 4])
-            with c_mic: audio_data = mic_recorder(start_prompt="🎤 Hablar", stop_prompt="⏹️ Detener", key='recorder', format="wav", use_container_width=True)
-            with c_txt: text_input = st.chat_input("Escribe tu duda aquí...")
-
-        final_query = None
-        if audio_data and ("last_audio_id" not in st.session_state or st.session_state.last_audio_id != audio_data['id']):
-            st.session_state.last_audio_id = audio_data['id']
-            with st.spinner("⏳"):
-                texto = st.session_state.demo_agent.transcribe_audio(audio_data['bytes'])
-                if texto: final_query = texto
-        elif text_input:
-            final_query = text_input
-        
-        final_query = None
-        if audio_data and ("last_audio_id" not in st.session_state or st.session_state.last_audio_id != audio_data['id']):
-            st.session_state.last_audio_id = audio_data['id']
-            with st.spinner("⏳"):
-                texto = st.session_state.demo_agent.transcribe_audio(audio_data['bytes'])
-                if texto: final_query = texto
-        elif text_input:
-            final_query = text_input
-
-        if final_query:
-            st.session_state.chat_history.append({"role": "user", "content": final_query})
-            with st.spinner("⏳"):
-                analisis = st.session_state.demo_agent.clasificar_intencion(final_query)
-                st.session_state.current_video = analisis["video"]
-                
-                texto_resp = analisis["texto"]
-                map_url = None
-                qr_url = None
-
-                if analisis["destino"]:
-                    origen_raw = "Zócalo, CDMX" 
-                    origen, destino = urllib.parse.quote(origen_raw), urllib.parse.quote(analisis["destino"])
-                    # URL para el iframe
-                    map_url = f"https://www.google.com/maps/embed/v1/directions?key={GOOGLE_API_KEY}&origin={origen}&destination={destino}&mode=transit"
-                    # URL para el QR
-                    mobile_url = f"https://www.google.com/maps/dir/?api=1&origin={origen}&destination={destino}&travelmode=transit"
-                    qr_url = f"https://api.qrserver.com/v1/create-qr-code/?size=150x150&data={urllib.parse.quote(mobile_url)}"
-                    
-                    texto_preparado = ("Precaución, saturación alta. " if "🔴 Alta" in location_context else "") + texto_resp
-                    texto_resp = st.session_state.demo_agent.traduccion_inteligente(texto_preparado, final_query)
-
-                    # 🚀 TRUCO: Guardamos en session_state ANTES del rerun
-                    st.session_state.active_map_url = map_url
-                    st.session_state.map_fullscreen = True
-
-                st.session_state.chat_history.append({"role": "assistant", "content": texto_resp, "map_url": map_url, "qr_url": qr_url})
-            
-            # El rerun va al final de todo el procesamiento del query
-            st.rerun()
+        st.button("🔙 Regresar", key="btn_back", use_container_width=True, on_click=cambiar_modo, args=(None, f"{VIDEOS_DIR}/idle.mp4"))
+    with c_icon:
+        st.markdown(f"<h1 style='margin-top: -10px; font-size: 60px;'>{modo_actual['icon']}</h1>", unsafe_allow_html=True)
 
-with col2:
-    st.markdown("")
-    video_path = st.session_state.current_video
-    idle_path = f"{VIDEOS_DIR}/idle.mp4"
-    
-    if os.path.exists(video_path) and os.path.exists(idle_path):
-        with open(video_path, "rb") as f:
-            b64_current = base64.b64encode(f.read()).decode()
-        with open(idle_path, "rb") as f:
-            b64_idle = base64.b64encode(f.read()).decode()
+    st.divider()
 
-        is_idle = "idle" in video_path
+    chat = st.container(height=300, border=False)
+    with chat:
+        historial = st.session_state.chat_history
+        ultimo_mapa = historial.ultimo_mapa()
+        for i, msg in enumerate(historial):
+            with st.chat_message(msg["role"]):
+                st.write(msg["content"])
+                if i == ultimo_mapa:
+                    st.components.v1.iframe(msg["map_url"], height=450, scrolling=True)
+                    if msg.get("qr_url"):
+                        c_qr, c_texto = st.columns([1, 3])
+                        with c_qr: st.image(msg["qr_url"], width=120)
+                        with c_texto: st.info("📱 **Escanea este código** para llevarte la ruta a tu celular.")
+                elif msg.get("destino"):
+                    # Solo el mapa más reciente es un iframe vivo; los anteriores quedan como liga
+                    st.markdown(f"[🗺️ Ver ruta a {msg['destino']}]({url_movil(obtener_agente().origen_mapas, msg['destino'])})")
 
-        if is_idle:
-            html_code = f"""
-            <style>body {{ margin: 0; background: transparent; display: flex; justify-content: center; }}</style>
-            <video autoplay loop muted playsinline style="width: 100%; max-width: 450px; aspect-ratio: 1/1; border-radius: 30px; border: 4px solid #F7931E; box-shadow: 0 10px 25px rgba(0,0,0,0.3); background-color: #000; object-fit: cover; pointer-events: none;">
-                <source src="data:video/mp4;base64,{b64_idle}" type="video/mp4">
-            </video>
-            """
+    with st.container(border=True):
+        c_mic, c_txt = st.columns([1, 4])
+        with c_mic: audio_data = mic_recorder(start_prompt="🎤 Hablar", stop_prompt="⏹️ Detener", key='recorder', format="wav", use_container_width=True)
+        with c_txt: text_input = st.chat_input("Escribe tu duda aquí...")
+
+    final_query = None
+    if audio_data and ("last_audio_id" not in st.session_state or st.session_state.last_audio_id != audio_data['id']):
+        st.session_state.last_audio_id = audio_data['id']
+        with st.spinner("⏳"):
+            texto = st.session_state.demo_agent.transcribe_audio(audio_data['bytes'])
+            if texto: final_query = texto
+    elif text_input:
+        final_query = text_input
+
+    if final_query:
+        st.session_state.chat_history.agregar("user", final_query)
+        with chat:
+            with st.chat_message("user"):
+                st.write(final_query)
+            with st.chat_message("assistant"):
+                with st.spinner("⏳"):
+                    # Semáforo al momento de la pregunta, no el de la última ejecución completa
+                    prefijo = "Precaución, saturación alta. " if saturacion_kiosco() == SEMAFOROS[ALTA] else ""
+                    # Direcciones, QR y clip corren en paralelo; la traducción llega en flujo
+                    turno = obtener_pipeline().procesar(final_query, prefijo, en_flujo=True)
+                # El avatar empieza a hablar mientras llega el texto
+                avisar_avatar(turno["video"])
+                if turno.get("texto_flujo"):
+                    # Las primeras palabras aparecen en cuanto el modelo las emite
+                    texto = st.write_stream(turno["texto_flujo"])
+                    texto = texto if isinstance(texto, str) else turno["texto"]
+                else:
+                    # Sin traducción pendiente el texto fijo sale de inmediato
+                    texto = turno["texto"]
+                    st.write(texto)
+        st.session_state.chat_history.agregar("assistant", texto, map_url=turno["map_url"], qr_url=turno["qr_url"], destino=turno["destino"])
+
+        if turno["map_url"]:
+            ya_abierto = st.session_state.map_fullscreen
+            st.session_state.active_map_url = turno["map_url"]
+            st.session_state.map_fullscreen = True
+            if ya_abierto:
+                # El popup de esta pasada muestra el mapa anterior: se repite solo este fragmento
+                repetir_panel()
+            # El popup tiene su lugar reservado arriba del chat: se llena sin otra pasada
+            with popup:
+                popup_mapa()
+
+@st.fragment(key="panel")
+def panel_principal():
+    with METRICAS.medir("render_panel"):
+        st.markdown("")
+
+        # --- VISTA A: MODO MAPA (POPUP DENTRO DE COL1) ---
+        popup = st.container()
+        if st.session_state.active_mode is not None and st.session_state.map_fullscreen:
+            with popup:
+                popup_mapa()
+
+        # --- VISTA B: MENÚ PRINCIPAL / CHAT ---
+        if st.session_state.active_mode is None:
+            menu_modos()
         else:
+            panel_chat(popup)
+
+@st.fragment(key="avatar")
+def reproductor_avatar():
+    with METRICAS.medir("render_video"):
+        st.markdown("")
+        video_path = st.session_state.current_video
+        idle_path = f"{VIDEOS_DIR}/idle.mp4"
+
+        if os.path.exists(video_path) and os.path.exists(idle_path):
+            # Solo viajan URLs: el navegador reutiliza los videos de su caché HTTP
+            url_current = url_medio(video_path)
+            url_idle = url_medio(idle_path)
+            is_idle = "idle" in video_path
+
+            # El video de respuesta va encima del idle; al terminar se desvanece. Los avisos del
+            # panel (avisar_avatar) cambian el video aquí mismo, sin volver a dibujar el iframe.
             html_code = f"""
             <style>body {{ margin: 0; background: transparent; display: flex; justify-content: center; }}</style>
             <div style="position: relative; width: 100%; max-width: 450px; aspect-ratio: 1/1; border-radius: 30px; border: 4px solid #F7931E; box-shadow: 0 10px 25px rgba(0,0,0,0.3); overflow: hidden; background-color: #000; pointer-events: none;">
                 <video autoplay loop muted playsinline style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; z-index: 1;">
-                    <source src="data:video/mp4;base64,{b64_idle}" type="video/mp4">
+                    <source src="{url_idle}" type="video/mp4">
                 </video>
-                <video id="talk-vid" autoplay playsinline style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; z-index: 2; transition: opacity 0.4s ease-out;">
-                    <source src="data:video/mp4;base64,{b64_current}" type="video/mp4">
+                <video id="talk-vid" {"" if is_idle else "autoplay"} playsinline style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; z-index: 2; transition: opacity 0.4s ease-out; opacity: {0 if is_idle else 1};" {"" if is_idle else f'src="{url_current}"'}>
                 </video>
             </div>
             <script>
-                document.getElementById('talk-vid').onended = function() {{
+                const talk = document.getElementById('talk-vid');
+                talk.onended = function() {{
                     this.style.opacity = '0';
                 }};
+                new BroadcastChannel("avatar-kiosco").onmessage = function(evento) {{
+                    if (evento.data.idle) {{
+                        talk.pause();
+                        talk.style.opacity = '0';
+                        return;
+                    }}
+                    talk.src = evento.data.src;
+                    talk.style.opacity = '1';
+                    talk.play();
+                }};
             </script>
             """
-        components.html(html_code, height=480)
-    else:
-        if os.path.exists(PLACEHOLDER_PATH):
-            st.image(PLACEHOLDER_PATH, use_container_width=True)
+            components.html(html_code, height=480)
+        else:
+            if os.path.exists(PLACEHOLDER_PATH):
+                st.image(PLACEHOLDER_PATH, use_container_width=True)
+
+col1, col2 = st.columns([2, 1], gap="large")
+with col1:
+    panel_principal()
+with col2:
+    reproductor_avatar()
+
+# --- INACTIVIDAD ---
+# Un kiosco abandonado a media conversación regresa solo al menú y suelta su historial
+INACTIVIDAD_SEGUNDOS = float(st.secrets.get("INACTIVIDAD_SEGUNDOS", 120))
+
+@st.fragment(run_every=min(30.0, INACTIVIDAD_SEGUNDOS / 4))
+def vigilar_inactividad():
+    if st.session_state.active_mode is None or not st.session_state.chat_history.inactivo(INACTIVIDAD_SEGUNDOS):
+        return
+    st.session_state.active_mode = None
+    st.session_state.chat_history.limpiar()
+    st.session_state.current_video = f"{VIDEOS_DIR}/idle.mp4"
+    st.session_state.map_fullscreen = False
+    st.session_state.active_map_url = None
+    METRICAS.contar("sesiones_reiniciadas")
+    st.rerun()
+
+vigilar_inactividad()
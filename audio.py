@@ -0,0 +1,113 @@
+"""Preprocesamiento del audio del micrófono antes del reconocimiento de voz.
+
+El WAV de `mic_recorder` llega con silencios al inicio y al final y con la tasa de
+muestreo que eligió el navegador (44.1/48 kHz, a veces estéreo). Aquí se baja a mono,
+se recorta al tramo con voz (energía por cuadro de 20 ms), se remuestrea a 16 kHz y
+se codifica a FLAC una sola vez; los clips sin voz se descartan sin llamar a la API.
+"""
+import io
+import wave
+import logging
+
+import numpy as np
+import speech_recognition as sr
+
+from metricas import METRICAS
+
+logger = logging.getLogger(__name__)
+
+TASA_OBJETIVO = 16000
+MS_CUADRO = 20
+# Energía RMS mínima (escala -1..1) para considerar un cuadro como voz: ~ -45 dBFS
+PISO_ENERGIA = 0.0056
+# Un cuadro es voz si supera `FACTOR_RUIDO` veces el ruido de fondo estimado del clip
+FACTOR_RUIDO = 2.5
+# Margen que se conserva antes y después de la voz para no cortar consonantes
+MARGEN_SEGUNDOS = 0.25
+MIN_VOZ_SEGUNDOS = 0.2
+
+
+class AudioFLAC(sr.AudioData):
+    """AudioData que guarda su FLAC: `recognize_google` lo reutiliza en vez de volver a codificar."""
+
+    def __init__(self, frame_data, sample_rate, sample_width):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self._flac = {}
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        clave = (convert_rate, convert_width)
+        if clave not in self._flac:
+            self._flac[clave] = super().get_flac_data(convert_rate, convert_width)
+        return self._flac[clave]
+
+
+def leer_wav(datos: bytes):
+    """(muestras float32 mono en -1..1, tasa). Otros formatos (AIFF, FLAC) pasan por `sr.AudioFile`."""
+    try:
+        with wave.open(io.BytesIO(datos)) as wav:
+            canales, ancho, tasa = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            crudo = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        with sr.AudioFile(io.BytesIO(datos)) as fuente:
+            audio = sr.Recognizer().record(fuente)
+        canales, ancho, tasa, crudo = 1, audio.sample_width, audio.sample_rate, audio.get_raw_data()
+
+    if ancho == 1:
+        muestras = (np.frombuffer(crudo, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif ancho == 3:
+        bytes_ = np.frombuffer(crudo, dtype=np.uint8).reshape(-1, 3)
+        enteros = (bytes_[:, 0].astype(np.int32) | (bytes_[:, 1].astype(np.int32) << 8) | (bytes_[:, 2].astype(np.int32) << 16))
+        muestras = np.where(enteros >= 1 << 23, enteros - (1 << 24), enteros).astype(np.float32) / (1 << 23)
+    else:
+        tipo = {2: "<i2", 4: "<i4"}[ancho]
+        muestras = np.frombuffer(crudo, dtype=tipo).astype(np.float32) / float(1 << (8 * ancho - 1))
+    if canales > 1:
+        muestras = muestras[: len(muestras) - len(muestras) % canales].reshape(-1, canales).mean(axis=1)
+    return muestras, tasa
+
+
+def remuestrear(muestras: np.ndarray, tasa: int, tasa_objetivo: int = TASA_OBJETIVO) -> np.ndarray:
+    """Remuestreo limitado en banda por FFT (descarta lo que está sobre el nuevo Nyquist). No sube la tasa."""
+    if tasa <= tasa_objetivo or len(muestras) == 0:
+        return muestras
+    n_salida = int(round(len(muestras) * tasa_objetivo / tasa))
+    espectro = np.fft.rfft(muestras)[: n_salida // 2 + 1]
+    return (np.fft.irfft(espectro, n_salida) * (n_salida / len(muestras))).astype(np.float32)
+
+
+def tramo_con_voz(muestras: np.ndarray, tasa: int):
+    """(inicio, fin) en muestras del tramo con voz más el margen, o None si no hay voz suficiente."""
+    largo_cuadro = max(1, tasa * MS_CUADRO // 1000)
+    n_cuadros = len(muestras) // largo_cuadro
+    if n_cuadros == 0:
+        return None
+    cuadros = muestras[: n_cuadros * largo_cuadro].reshape(n_cuadros, largo_cuadro)
+    energia = np.sqrt(np.mean(cuadros * cuadros, axis=1))
+    # El ruido de fondo es el percentil 10: en una estación nunca hay silencio real
+    umbral = max(PISO_ENERGIA, FACTOR_RUIDO * float(np.percentile(energia, 10)))
+    voz = np.flatnonzero(energia > umbral)
+    if len(voz) * MS_CUADRO / 1000 < MIN_VOZ_SEGUNDOS:
+        return None
+    margen = int(MARGEN_SEGUNDOS * tasa)
+    return max(0, voz[0] * largo_cuadro - margen), min(len(muestras), (voz[-1] + 1) * largo_cuadro + margen)
+
+
+@METRICAS.cronometrar("preprocesar_audio")
+def preparar_audio(datos: bytes):
+    """AudioFLAC mono de 16 bits a 16 kHz recortado a la voz, o None si el clip no tiene voz."""
+    muestras, tasa = leer_wav(datos)
+    tramo = tramo_con_voz(muestras, tasa)
+    if tramo is None:
+        METRICAS.contar("audio_sin_voz")
+        return None
+
+    muestras = remuestrear(muestras[tramo[0]:tramo[1]], tasa)
+    pcm = (np.clip(muestras, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    audio = AudioFLAC(pcm, min(tasa, TASA_OBJETIVO), 2)
+    # Mismos parámetros con los que lo pide recognize_google, para que use esta codificación
+    flac = audio.get_flac_data(convert_rate=None, convert_width=2)
+    METRICAS.contar("audio_bytes_recibidos", len(datos))
+    METRICAS.contar("audio_bytes_enviados", len(flac))
+    METRICAS.contar("audio_bytes_ahorrados", max(0, len(datos) - len(flac)))
+    logger.info(f"Audio: {len(datos)} B a {tasa} Hz -> {len(flac)} B FLAC ({len(muestras) / audio.sample_rate:.1f}s con voz)")
+    return audio
@@ -0,0 +1,189 @@
+"""Benchmark determinista del camino caliente del kiosco, sin red.
+
+Uso: python benchmark.py [--sesiones 1,4,16] [--turnos 20] [--latencia-llm 0.3] [--json salida.json]
+
+Levanta los simuladores de Gemini, reconocimiento de voz y Directions (simuladores.py)
+con la latencia indicada y corre N kioscos simultáneos, cada uno haciendo
+transcribir -> pipeline del turno (clasificar, traducir, QR, clip; direcciones desde la caché).
+Reporta p50/p95/p99 por turno, hasta las primeras palabras en pantalla y por etapa,
+y el rendimiento en turnos/s.
+Con --max-p95 termina con código 1 si algún escenario lo rebasa (para CI).
+"""
+import io
+import sys
+import json
+import time
+import wave
+import random
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+import googlemaps
+
+from agente import DemoAgent
+from cache_semantica import CacheSemantica
+from codigos_qr import GeneradorQR
+from direcciones import CacheDirecciones
+from metricas import METRICAS
+from pipeline import PipelineTurno
+from red_metro import RedMetro
+from simuladores import DireccionesSimuladas, GeminiSimulado, VozSimulada
+from traducciones import CacheTraducciones
+
+# Mezcla de consultas: vía local en español, vía local + traducción y vía LLM estructurada
+FRASES = (
+    "¿Cómo llego al Estadio Azteca?", "¿Cuándo es el partido de México contra Sudáfrica?",
+    "Tengo hambre, ¿dónde puedo comer?", "Me robaron la cartera",
+    "How do I get to the Azteca stadium?", "Where can I eat something?",
+    "Onde fica o banheiro?", "Wo ist die nächste Apotheke?",
+)
+PREFIJO_SATURACION = "Precaución, saturación alta. "
+ESTACION_KIOSCO = "Zócalo"
+
+
+def audio_wav(frecuencia: float, segundos: float = 1.0, tasa: int = 48000, canales: int = 2) -> bytes:
+    """WAV de 16 bits como el del navegador: silencio, un tono con envolvente "silábica" y silencio.
+
+    Basta para que VozSimulada elija una frase y para ejercitar el recorte y el remuestreo.
+    """
+    t = np.arange(int(segundos * tasa)) / tasa
+    envolvente = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    tono = 0.3 * envolvente * np.sin(2 * np.pi * frecuencia * t)
+    silencio = np.zeros(int(0.4 * tasa))
+    muestras = (np.concatenate([silencio, tono, silencio]) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(canales)
+        wav.setsampwidth(2)
+        wav.setframerate(tasa)
+        wav.writeframes(np.repeat(muestras, canales).tobytes())
+    return buffer.getvalue()
+
+
+def percentiles(valores) -> dict:
+    if not valores:
+        return {}
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {"n": len(valores), "p50": round(p50, 4), "p95": round(p95, 4), "p99": round(p99, 4), "max": round(max(valores), 4)}
+
+
+def construir_pipeline(directorio: str, gemini, voz, mapas) -> PipelineTurno:
+    """Mismo armado que app.py, con caches nuevas (frías) y clientes apuntando a los simuladores."""
+    ruta_db = f"{directorio}/kiosco.sqlite3"
+    red = RedMetro()
+    gmaps = googlemaps.Client(key="AIzaSimulado", base_url=mapas.url)
+    agente = DemoAgent(
+        "clave-simulada",
+        traducciones=CacheTraducciones(ruta_db=ruta_db),
+        red=red,
+        estacion_origen=ESTACION_KIOSCO,
+        direcciones=CacheDirecciones(gmaps, ruta_db=ruta_db),
+        base_url_llm=gemini.url,
+        endpoint_voz=f"{voz.url}/speech-api/v2/recognize",
+    )
+    return PipelineTurno(agente, generador_qr=GeneradorQR(), clave_mapas="clave-simulada", cache_respuestas=CacheSemantica())
+
+
+def kiosco(pipeline, audios, latencias, primeras_palabras, errores):
+    for audio in audios:
+        inicio = time.perf_counter()
+        try:
+            query = pipeline.agente.transcribe_audio(audio)
+            # Igual que app.py: la traducción se consume en flujo
+            turno = pipeline.procesar(query or "hola", PREFIJO_SATURACION, en_flujo=True)
+            primera = None
+            for _ in turno.get("texto_flujo") or ():
+                primera = primera or time.perf_counter()
+            primeras_palabras.append((primera or time.perf_counter()) - inicio)
+        except Exception:
+            errores.append(1)
+        latencias.append(time.perf_counter() - inicio)
+
+
+def escenario(sesiones: int, turnos: int, semilla: int, simuladores) -> dict:
+    gemini, voz, mapas = simuladores
+    for simulador in simuladores:
+        simulador.peticiones = 0
+    METRICAS.reiniciar()
+    aleatorio = random.Random(semilla)
+    # Un tono distinto por turno: el hash del audio decide la frase que "se escucha"
+    guiones = [[audio_wav(aleatorio.uniform(200, 2000)) for _ in range(turnos)] for _ in range(sesiones)]
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-kiosco-") as directorio:
+        pipeline = construir_pipeline(directorio, gemini, voz, mapas)
+        latencias, primeras_palabras, errores = [], [], []
+        hilos = [threading.Thread(target=kiosco, args=(pipeline, guion, latencias, primeras_palabras, errores)) for guion in guiones]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+    resumen = METRICAS.resumen()
+    return {
+        "sesiones": sesiones,
+        "turnos": len(latencias),
+        "errores": len(errores),
+        "segundos": round(duracion, 3),
+        "turnos_por_segundo": round(len(latencias) / duracion, 2),
+        "turno": percentiles(latencias),
+        "primeras_palabras": percentiles(primeras_palabras),
+        "etapas": {etapa: {k: v for k, v in datos.items() if k != "suma"} for etapa, datos in sorted(resumen["latencias"].items())},
+        "eventos": resumen["eventos"],
+        "peticiones": {"gemini": gemini.peticiones, "voz": voz.peticiones, "mapas": mapas.peticiones},
+        "cache_semantica": pipeline.cache_respuestas.estadisticas(),
+    }
+
+
+def imprimir(resultado: dict):
+    turno = resultado["turno"]
+    print(f"\n🚇 {resultado['sesiones']} kiosco(s) | {resultado['turnos']} turnos en {resultado['segundos']}s "
+          f"| {resultado['turnos_por_segundo']} turnos/s | errores: {resultado['errores']}")
+    print(f"   {'etapa':<24}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for nombre, datos in (("(turno completo)", turno), ("(primeras palabras)", resultado["primeras_palabras"])):
+        print(f"   {nombre:<24}{datos['n']:>6}{datos['p50']:>10.4f}{datos['p95']:>10.4f}{datos['p99']:>10.4f}")
+    for etapa, datos in resultado["etapas"].items():
+        print(f"   {etapa:<24}{datos['n']:>6}{datos.get('p50', 0):>10.4f}{datos.get('p95', 0):>10.4f}{datos.get('p99', 0):>10.4f}")
+    print(f"   peticiones: {resultado['peticiones']} | caché semántica: {resultado['cache_semantica']}")
+    print(f"   eventos: {resultado['eventos']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", default="1,4,16", help="Kioscos simultáneos por escenario, separados por comas")
+    parser.add_argument("--turnos", type=int, default=20, help="Turnos por kiosco")
+    parser.add_argument("--latencia-llm", type=float, default=0.3)
+    parser.add_argument("--latencia-voz", type=float, default=0.2)
+    parser.add_argument("--latencia-mapas", type=float, default=0.1)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", help="Guarda los resultados en este archivo")
+    parser.add_argument("--max-p95", type=float, help="Segundos; falla si el p95 del turno lo rebasa")
+    args = parser.parse_args()
+
+    simuladores = (
+        GeminiSimulado(args.latencia_llm).iniciar(),
+        VozSimulada(args.latencia_voz, frases=FRASES).iniciar(),
+        DireccionesSimuladas(args.latencia_mapas).iniciar(),
+    )
+    try:
+        resultados = []
+        for sesiones in (int(n) for n in args.sesiones.split(",")):
+            resultados.append(escenario(sesiones, args.turnos, args.semilla, simuladores))
+            imprimir(resultados[-1])
+    finally:
+        for simulador in simuladores:
+            simulador.detener()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados en {args.json}")
+
+    if args.max_p95 is not None:
+        lentos = [r for r in resultados if r["turno"]["p95"] > args.max_p95]
+        if lentos:
+            print(f"\n❌ p95 por encima de {args.max_p95}s con {', '.join(str(r['sesiones']) for r in lentos)} kiosco(s)")
+            sys.exit(1)
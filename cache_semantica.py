@@ -0,0 +1,85 @@
+"""Caché semántica de turnos completos: preguntas casi iguales comparten respuesta.
+
+En día de partido la mayoría de las consultas son variaciones de la misma pregunta
+("¿cómo llego al Estadio Azteca?", "como llego al estadio azteca", "¿Cómo llego
+al Azteca?"). Cada consulta normalizada se vectoriza con n-gramas de caracteres
+dispersados en `dimension` cubetas (sin modelo ni red) y se busca el vecino más
+cercano por coseno entre las respuestas recientes de todas las sesiones.
+"""
+import time
+import zlib
+import threading
+
+import numpy as np
+
+from clasificador import normalizar
+
+
+def vectorizar(texto: str, dimension: int, n_min: int = 3, n_max: int = 4) -> np.ndarray:
+    """Vector unitario de n-gramas de caracteres (hashing trick, tf sublineal)."""
+    normal = f" {normalizar(texto)} "
+    vector = np.zeros(dimension, dtype=np.float32)
+    for n in range(n_min, n_max + 1):
+        for i in range(len(normal) - n + 1):
+            vector[zlib.crc32(normal[i:i + n].encode()) % dimension] += 1.0
+    np.log1p(vector, out=vector)
+    norma = np.linalg.norm(vector)
+    return vector / norma if norma else vector
+
+
+class CacheSemantica:
+    """Anillo de `max_entradas` vectores en una matriz NumPy; la búsqueda es un solo producto matriz-vector.
+
+    `contexto` separa respuestas que no son intercambiables aunque la pregunta coincida
+    (p. ej. el aviso de saturación). Al llenarse se reemplaza la entrada más antigua.
+    """
+
+    def __init__(self, umbral: float = 0.85, max_entradas: int = 512, ttl: float = 30 * 60, dimension: int = 2048):
+        self.umbral = umbral
+        self.ttl = ttl
+        self.dimension = dimension
+        self._vectores = np.zeros((max_entradas, dimension), dtype=np.float32)
+        self._creadas = np.full(max_entradas, -np.inf)
+        self._contextos = np.zeros(max_entradas, dtype=np.int64)
+        self._valores = [None] * max_entradas
+        self._siguiente = 0
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = 0
+
+    @staticmethod
+    def _contexto(contexto: str) -> int:
+        return zlib.crc32(contexto.encode())
+
+    def obtener(self, query: str, contexto: str = ""):
+        """(valor, similitud) del vecino más cercano vigente sobre el umbral, o (None, similitud)."""
+        vector = vectorizar(query, self.dimension)
+        with self._lock:
+            similitudes = self._vectores @ vector
+            vigentes = (time.time() - self._creadas < self.ttl) & (self._contextos == self._contexto(contexto))
+            similitudes[~vigentes] = -1.0
+            mejor = int(np.argmax(similitudes))
+            similitud = float(similitudes[mejor])
+            if similitud >= self.umbral:
+                self.aciertos += 1
+                return self._valores[mejor], similitud
+            self.fallos += 1
+            return None, max(similitud, 0.0)
+
+    def guardar(self, query: str, valor, contexto: str = ""):
+        vector = vectorizar(query, self.dimension)
+        with self._lock:
+            posicion = self._siguiente
+            self._siguiente = (self._siguiente + 1) % len(self._valores)
+            self._vectores[posicion] = vector
+            self._creadas[posicion] = time.time()
+            self._contextos[posicion] = self._contexto(contexto)
+            self._valores[posicion] = valor
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos, "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "entradas": int(np.sum(time.time() - self._creadas < self.ttl)),
+            }
@@ -0,0 +1,99 @@
+"""Clasificador local de intenciones: resuelve en microsegundos las consultas obvias
+y deja al LLM solamente las de baja confianza."""
+import re
+import threading
+import unicodedata
+
+INTENCIONES = ("azteca", "sudafrica", "restaurante", "perdido", "otro")
+
+# Palabras clave por intención (ya normalizadas) con su peso. Las frases de varias
+# palabras se indexan como n-gramas, así "estadio azteca" pesa más que "azteca" sola.
+PALABRAS_CLAVE = {
+    "azteca": {
+        "estadio azteca": 4, "estadio banorte": 4, "azteca": 3, "banorte": 3, "estadio": 2,
+        "stadium": 2, "aztec stadium": 4, "azteca stadium": 4, "estadio de futbol": 2, "estadio mundialista": 3,
+    },
+    "sudafrica": {
+        "sudafrica": 4, "south africa": 4, "africa do sul": 4, "afrique du sud": 4, "partido inaugural": 4,
+        "inaugural": 3, "opening match": 4, "juego inaugural": 4, "inauguracion": 3, "mexico": 1,
+        "partido de mexico": 3, "grupo a": 2,
+    },
+    "restaurante": {
+        "restaurante": 3, "restaurant": 3, "restaurantes": 3, "comer": 3, "comida": 3, "food": 3,
+        "eat": 3, "hambre": 3, "hungry": 3, "desayunar": 3, "cenar": 3, "tacos": 2, "almorzar": 3,
+        "donde comer": 4, "comida tipica": 4, "lunch": 3, "dinner": 3,
+    },
+    "perdido": {
+        "perdido": 3, "perdida": 3, "perdi": 3, "objeto perdido": 4, "objetos perdidos": 4, "extravie": 3,
+        "extraviado": 3, "robo": 3, "robaron": 3, "asalto": 3, "reporte": 2, "reportar": 2, "denuncia": 2,
+        "lost": 3, "stolen": 3, "robbed": 3, "lost and found": 4, "olvide": 2,
+    },
+    # Lugares que contienen una palabra clave pero no son esa intención (Ciudad Azteca es la
+    # terminal de la Línea B): su peso hunde la confianza y la consulta pasa al LLM
+    "otro": {
+        "ciudad azteca": 4,
+    },
+}
+
+_NO_ALFANUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos y sin signos: '¿Cómo llego al Estadio?' -> 'como llego al estadio'."""
+    sin_acentos = unicodedata.normalize("NFKD", texto.lower())
+    sin_acentos = "".join(c for c in sin_acentos if not unicodedata.combining(c))
+    return _NO_ALFANUM.sub(" ", sin_acentos).strip()
+
+
+def ngramas(tokens, n_max: int = 3):
+    for n in range(1, n_max + 1):
+        for i in range(len(tokens) - n + 1):
+            yield " ".join(tokens[i:i + n])
+
+
+class ClasificadorLocal:
+    """Índice de n-gramas -> (intención, peso). La confianza es la fracción del puntaje
+    total que se lleva la mejor intención, con un término fijo que representa 'otro'."""
+
+    def __init__(self, umbral: float = 0.7, palabras_clave: dict = None):
+        self.umbral = umbral
+        self._indice = {}
+        for intencion, claves in (palabras_clave or PALABRAS_CLAVE).items():
+            for frase, peso in claves.items():
+                self._indice.setdefault(normalizar(frase), []).append((intencion, peso))
+        self._n_max = max(len(frase.split()) for frase in self._indice)
+        self._lock = threading.Lock()
+        self.resueltas_local = 0
+        self.derivadas_llm = 0
+
+    def puntuar(self, query: str) -> dict:
+        puntajes = {}
+        for gramo in ngramas(normalizar(query).split(), self._n_max):
+            for intencion, peso in self._indice.get(gramo, ()):
+                puntajes[intencion] = puntajes.get(intencion, 0) + peso
+        return puntajes
+
+    def clasificar(self, query: str):
+        """Regresa (intención, confianza). La intención es None si no supera el umbral."""
+        puntajes = self.puntuar(query)
+        if puntajes:
+            mejor = max(puntajes, key=puntajes.get)
+            confianza = puntajes[mejor] / (sum(puntajes.values()) + 1.0)
+        else:
+            mejor, confianza = None, 0.0
+        resuelta = mejor is not None and confianza >= self.umbral
+        with self._lock:
+            if resuelta:
+                self.resueltas_local += 1
+            else:
+                self.derivadas_llm += 1
+        return (mejor if resuelta else None), confianza
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.resueltas_local + self.derivadas_llm
+            return {
+                "resueltas_local": self.resueltas_local,
+                "derivadas_llm": self.derivadas_llm,
+                "tasa_local": self.resueltas_local / total if total else 0.0,
+            }
@@ -0,0 +1,64 @@
+"""Códigos QR generados en el proceso (segno), sin depender de api.qrserver.com."""
+import io
+import base64
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+import segno
+
+
+def url_movil(origen: str, destino: str) -> str:
+    """Liga de Google Maps con la ruta en transporte público, para abrir en el celular."""
+    origen, destino = urllib.parse.quote(origen), urllib.parse.quote(destino)
+    return f"https://www.google.com/maps/dir/?api=1&origin={origen}&destination={destino}&travelmode=transit"
+
+
+class GeneradorQR:
+    """Memoiza por (origen, destino) los PNG/SVG ya renderizados, con tope de bytes (LRU)."""
+
+    def __init__(self, max_bytes: int = 2 * 1024 * 1024, escala: int = 4):
+        self.max_bytes = max_bytes
+        self.escala = escala
+        self.total_bytes = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = 0
+
+    def png(self, origen: str, destino: str) -> bytes:
+        return self._generar(origen, destino, "png")
+
+    def svg(self, origen: str, destino: str) -> bytes:
+        return self._generar(origen, destino, "svg")
+
+    def data_uri(self, origen: str, destino: str) -> str:
+        """PNG en línea (~1 KB): viaja con el mensaje y no depende de ningún servidor ni caché."""
+        return "data:image/png;base64," + base64.b64encode(self.png(origen, destino)).decode()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos, "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0, "bytes": self.total_bytes,
+            }
+
+    def _generar(self, origen, destino, formato):
+        clave = (origen, destino, formato)
+        with self._lock:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                self.aciertos += 1
+                return self._cache[clave]
+            self.fallos += 1
+        buffer = io.BytesIO()
+        segno.make(url_movil(origen, destino), error="m").save(buffer, kind=formato, scale=self.escala, border=2)
+        datos = buffer.getvalue()
+        with self._lock:
+            if clave not in self._cache:
+                self._cache[clave] = datos
+                self.total_bytes += len(datos)
+            while self.total_bytes > self.max_bytes and len(self._cache) > 1:
+                _, viejo = self._cache.popitem(last=False)
+                self.total_bytes -= len(viejo)
+        return datos
@@ -1,9 +1,10 @@
 import requests
 import json
-import base64
 import os
 import toml
 
+from did import URL_API, encabezado_auth, encabezados
+
 # --- 1. CONFIGURACIÓN ---
 # Intentamos leer tus secretos automáticamente
 try:
@@ -20,20 +21,12 @@ if not DID_API_KEY:
     print("❌ Error: No se encontró la DID_API_KEY.")
     exit()
 
-if not DID_API_KEY.startswith("Basic"):
-    auth = "Basic " + base64.b64encode(DID_API_KEY.encode("utf-8")).decode("utf-8")
-else:
-    auth = DID_API_KEY
-
-headers = {
-    "Authorization": auth,
-    "Content-Type": "application/json",
-    "accept": "application/json"
-}
+auth = encabezado_auth(DID_API_KEY)
+headers = encabezados(DID_API_KEY)
 
 def upload_image():
     print(f"📤 Subiendo {IMAGE_PATH} a D-ID...")
-    url = "https://api.d-id.com/images"
+    url = f"{URL_API}/images"
     
     if not os.path.exists(IMAGE_PATH):
         print(f"❌ Error: No encuentro el archivo {IMAGE_PATH}")
@@ -54,7 +47,7 @@ def upload_image():
 
 def create_agent(img_url):
     print("🤖 Creando el Agente (Configuración Actualizada)...")
-    url = "https://api.d-id.com/agents"
+    url = f"{URL_API}/agents"
     
     payload = {
         "presenter": {
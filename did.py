@@ -0,0 +1,148 @@
+"""Cliente mínimo de la API de D-ID: autenticación, imágenes y clips hablados (/talks).
+
+Lo comparten `crear_agente.py` y `renderizar_clips.py`. Todas las llamadas a la API
+pasan por un limitador de tasa común a los hilos. Los 429 se reintentan respetando
+`Retry-After` (D-ID rechazó la petición sin procesarla); los 5xx solo en GET, porque
+repetir un POST /talks que sí se aceptó pagaría dos veces el mismo clip.
+"""
+import os
+import time
+import base64
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+URL_API = "https://api.d-id.com"
+
+# Voz de Microsoft para cada idioma de traducciones.IDIOMAS (la del agente es es-MX-JorgeNeural)
+VOCES = {
+    "es": "es-MX-JorgeNeural", "en": "en-US-GuyNeural", "pt": "pt-BR-AntonioNeural", "fr": "fr-FR-HenriNeural",
+    "de": "de-DE-ConradNeural", "it": "it-IT-DiegoNeural", "nl": "nl-NL-MaartenNeural", "ja": "ja-JP-KeitaNeural",
+    "ko": "ko-KR-InJoonNeural", "zh": "zh-CN-YunxiNeural", "ar": "ar-SA-HamedNeural", "ru": "ru-RU-DmitryNeural",
+    "el": "el-GR-NestorasNeural", "he": "he-IL-AvriNeural", "hi": "hi-IN-MadhurNeural", "th": "th-TH-NiwatNeural",
+}
+
+# Estados finales de un clip en D-ID
+_FALLIDOS = ("error", "rejected")
+
+
+class ErrorDID(Exception):
+    def __init__(self, mensaje: str, codigo: int = None):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+class ClipFallido(ErrorDID):
+    """D-ID rechazó el clip o ya no existe: hay que crearlo de nuevo (a diferencia de un plazo vencido)."""
+
+
+def encabezado_auth(clave: str) -> str:
+    """D-ID usa Basic con la clave en base64; se respeta si ya viene como "Basic ..."."""
+    if clave.startswith("Basic"):
+        return clave
+    return "Basic " + base64.b64encode(clave.encode("utf-8")).decode("utf-8")
+
+
+def encabezados(clave: str) -> dict:
+    return {"Authorization": encabezado_auth(clave), "Content-Type": "application/json", "accept": "application/json"}
+
+
+class LimitadorTasa:
+    """A lo más `por_segundo` llamadas por segundo entre todos los hilos, con ráfagas de hasta `rafaga`."""
+
+    def __init__(self, por_segundo: float, rafaga: int = 1):
+        self._intervalo = 1.0 / por_segundo
+        self._holgura = (rafaga - 1) * self._intervalo
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(self._proximo, ahora - self._holgura)
+            self._proximo = turno + self._intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+class ClienteDID:
+    def __init__(self, clave: str, url_api: str = URL_API, por_segundo: float = 2.0, intentos: int = 4, timeout: float = 30.0):
+        self.url_api = url_api.rstrip("/")
+        self.encabezados = encabezados(clave)
+        self.limitador = LimitadorTasa(por_segundo)
+        self.intentos = intentos
+        self.timeout = timeout
+        # requests.Session no garantiza ser segura entre hilos: una por hilo
+        self._local = threading.local()
+
+    def _sesion(self) -> requests.Session:
+        sesion = getattr(self._local, "sesion", None)
+        if sesion is None:
+            sesion = self._local.sesion = requests.Session()
+            sesion.headers.update(self.encabezados)
+        return sesion
+
+    def _peticion(self, metodo: str, ruta: str, **opciones) -> dict:
+        for intento in range(self.intentos):
+            self.limitador.esperar()
+            respuesta = self._sesion().request(metodo, self.url_api + ruta, timeout=self.timeout, **opciones)
+            if respuesta.status_code == 429 or (respuesta.status_code >= 500 and metodo == "GET"):
+                espera = float(respuesta.headers.get("Retry-After") or 2 ** intento)
+                logger.warning(f"D-ID {metodo} {ruta}: {respuesta.status_code}, reintento en {espera:.0f}s")
+                time.sleep(espera)
+                continue
+            if respuesta.status_code >= 400:
+                raise ErrorDID(f"{metodo} {ruta}: {respuesta.status_code} {respuesta.text[:200]}", respuesta.status_code)
+            return respuesta.json()
+        raise ErrorDID(f"{metodo} {ruta}: sin respuesta tras {self.intentos} intentos")
+
+    def subir_imagen(self, ruta: str) -> str:
+        """URL de la imagen del presentador dentro de D-ID."""
+        with open(ruta, "rb") as imagen:
+            # Content-Type None: requests arma el multipart en lugar del JSON de la sesión
+            datos = self._peticion("POST", "/images", files={"image": (os.path.basename(ruta), imagen, "image/png")}, headers={"Content-Type": None})
+        return datos["url"]
+
+    def crear_clip(self, texto: str, voz: str, imagen_url: str) -> str:
+        """Encola un clip hablado y regresa su id (tlk_...)."""
+        cuerpo = {
+            "source_url": imagen_url,
+            "script": {"type": "text", "input": texto, "provider": {"type": "microsoft", "voice_id": voz}},
+            "config": {"fluent": True},
+        }
+        return self._peticion("POST", "/talks", json=cuerpo)["id"]
+
+    def estado_clip(self, id_clip: str) -> dict:
+        return self._peticion("GET", f"/talks/{id_clip}")
+
+    def esperar_clip(self, id_clip: str, cada: float = 2.0, plazo: float = 300.0) -> str:
+        """URL del video terminado. Lanza ClipFallido si D-ID lo rechaza o no lo conoce, ErrorDID si no termina en `plazo` segundos."""
+        limite = time.monotonic() + plazo
+        while time.monotonic() < limite:
+            try:
+                estado = self.estado_clip(id_clip)
+            except ErrorDID as e:
+                if e.codigo == 404:
+                    raise ClipFallido(f"Clip {id_clip}: no existe", 404) from e
+                raise
+            if estado.get("status") == "done":
+                return estado["result_url"]
+            if estado.get("status") in _FALLIDOS:
+                raise ClipFallido(f"Clip {id_clip}: {estado.get('status')} {estado.get('error', '')}")
+            time.sleep(cada)
+        raise ErrorDID(f"Clip {id_clip} sin terminar en {plazo:.0f}s")
+
+    def descargar(self, url: str, destino: str):
+        """Descarga a un archivo temporal y lo renombra: el kiosco nunca ve un mp4 a medias."""
+        os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+        parcial = destino + ".parcial"
+        # El resultado vive en un bucket firmado: sin el encabezado de autenticación de la API
+        with requests.get(url, stream=True, timeout=self.timeout) as respuesta:
+            respuesta.raise_for_status()
+            with open(parcial, "wb") as archivo:
+                for bloque in respuesta.iter_content(1 << 16):
+                    archivo.write(bloque)
+        os.replace(parcial, destino)
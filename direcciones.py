@@ -0,0 +1,162 @@
+"""Indicaciones de transporte público con Google Directions, cacheadas con TTL.
+
+Cada (origen, destino, franja horaria) se consulta una sola vez; los pasos se guardan
+resumidos en el almacén SQLite compartido. La ruta de una petición solo lee la caché:
+las consultas a la API ocurren en segundo plano (`mantener_caliente`, que además
+adelanta la franja siguiente y purga lo vencido) o tras un fallo de caché.
+"""
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from almacen import AlmacenSQLite
+
+logger = logging.getLogger(__name__)
+
+_ETIQUETAS_HTML = re.compile(r"<[^>]+>")
+
+
+def resumir_pasos(respuesta: list) -> dict:
+    """Reduce la respuesta de `gmaps.directions` a lo que necesita el kiosco."""
+    if not respuesta:
+        return None
+    tramo = respuesta[0]["legs"][0]
+    pasos = []
+    for paso in tramo["steps"]:
+        resumen = {
+            "modo": paso["travel_mode"],
+            "instruccion": _ETIQUETAS_HTML.sub("", paso.get("html_instructions", "")),
+            "minutos": round(paso["duration"]["value"] / 60),
+        }
+        detalles = paso.get("transit_details")
+        if detalles:
+            linea = detalles["line"]
+            resumen.update({
+                "linea": linea.get("short_name") or linea.get("name", ""),
+                "vehiculo": linea.get("vehicle", {}).get("name", ""),
+                "desde": detalles["departure_stop"]["name"],
+                "hasta": detalles["arrival_stop"]["name"],
+                "paradas": detalles.get("num_stops", 0),
+                "direccion": detalles.get("headsign", ""),
+            })
+        pasos.append(resumen)
+    return {"pasos": pasos, "minutos": round(tramo["duration"]["value"] / 60)}
+
+
+def texto_indicaciones(resumen: dict) -> str:
+    """Indicaciones en español a partir de los pasos de transporte del resumen."""
+    transporte = [p for p in resumen["pasos"] if p["modo"] == "TRANSIT"]
+    if not transporte:
+        if resumen["minutos"] <= 1:
+            return "Tu destino está a unos pasos."
+        return f"Puedes llegar caminando en unos {resumen['minutos']} minutos."
+    frases = []
+    for k, paso in enumerate(transporte):
+        linea = f"{paso['vehiculo']} {paso['linea']}".strip()
+        direccion = f" dirección {paso['direccion']}" if paso["direccion"] else ""
+        inicio = f"Desde {paso['desde']}, toma" if k == 0 else "luego toma"
+        frases.append(f"{inicio} {linea}{direccion} hasta {paso['hasta']} ({paso['paradas']} paradas)")
+    return "; ".join(frases) + f". Tiempo estimado: {resumen['minutos']} minutos."
+
+
+class CacheDirecciones:
+    def __init__(self, gmaps, ruta_db: str = ".cache/kiosco.sqlite3", ttl: float = 6 * 3600, minutos_franja: int = 30):
+        self.gmaps = gmaps
+        self.minutos_franja = minutos_franja
+        self._almacen = AlmacenSQLite(ruta_db, "direcciones", ttl=ttl)
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="direcciones")
+        self._pendientes = set()
+        self._fallidas = {}  # clave -> momento del último error, para no reintentar en cada petición
+        self.reintento_tras_error = 60.0
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = self.consultas_api = self.errores_api = 0
+
+    def _clave(self, origen: str, destino: str, cuando: float) -> str:
+        franja = int(cuando // (self.minutos_franja * 60))
+        return f"{origen}\x1f{destino}\x1f{franja}"
+
+    def obtener(self, origen: str, destino: str, cuando: float = None):
+        """Resumen cacheado de la ruta, o None. Un fallo agenda la consulta en segundo plano."""
+        clave = self._clave(origen, destino, cuando or time.time())
+        resumen = self._almacen.obtener(clave)
+        with self._lock:
+            if resumen is not None:
+                self.aciertos += 1
+                return resumen
+            self.fallos += 1
+        self._agendar(clave, origen, destino)
+        return None
+
+    def consultar(self, origen: str, destino: str, cuando: float = None):
+        """Consulta la API (si hace falta) y guarda el resultado. Bloquea; para precalentar."""
+        cuando = cuando or time.time()
+        clave = self._clave(origen, destino, cuando)
+        resumen = self._almacen.obtener(clave)
+        if resumen is None and time.time() - self._fallidas.get(clave, 0.0) >= self.reintento_tras_error:
+            resumen = self._consultar_api(clave, origen, destino, cuando)
+        return resumen
+
+    def precalentar(self, origen: str, destinos, cuando: float = None):
+        """Agenda en segundo plano la ruta a cada destino en la franja de `cuando`; regresa de inmediato."""
+        cuando = cuando or time.time()
+        for destino in dict.fromkeys(destinos):
+            self._agendar(self._clave(origen, destino, cuando), origen, destino, cuando)
+
+    def mantener_caliente(self, origen: str, destinos, intervalo: float = 5 * 60):
+        """Hilo que cada `intervalo` precalienta la franja actual y la del siguiente ciclo, y purga el almacén."""
+        destinos = list(destinos)
+
+        def ciclo():
+            while True:
+                try:
+                    ahora = time.time()
+                    self.precalentar(origen, destinos, ahora)
+                    # La franja siguiente queda lista antes de que llegue la primera petición
+                    self.precalentar(origen, destinos, ahora + intervalo)
+                    borradas = self._almacen.purgar()
+                    if borradas:
+                        logger.info(f"CacheDirecciones: {borradas} rutas vencidas purgadas")
+                except Exception as e:
+                    logger.warning(f"No se pudo refrescar la caché de direcciones: {e}")
+                time.sleep(intervalo)
+        threading.Thread(target=ciclo, name="direcciones-refresco", daemon=True).start()
+
+    def _agendar(self, clave, origen, destino, cuando: float = None):
+        with self._lock:
+            if clave in self._pendientes:
+                return
+            if time.time() - self._fallidas.get(clave, 0.0) < self.reintento_tras_error:
+                return
+            self._pendientes.add(clave)
+        self._pool.submit(self._consultar_api, clave, origen, destino, cuando)
+
+    def _consultar_api(self, clave, origen, destino, cuando: float = None):
+        try:
+            with self._lock:
+                self.consultas_api += 1
+            salida = max(cuando or 0.0, time.time())
+            respuesta = self.gmaps.directions(origen, destino, mode="transit", departure_time=salida, language="es")
+            resumen = resumir_pasos(respuesta)
+            if resumen is not None:
+                self._almacen.guardar(clave, resumen)
+            return resumen
+        except Exception as e:
+            with self._lock:
+                self.errores_api += 1
+                self._fallidas[clave] = time.time()
+            logger.warning(f"Directions falló para {origen} -> {destino}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pendientes.discard(clave)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos, "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "consultas_api": self.consultas_api, "errores_api": self.errores_api,
+            }
@@ -0,0 +1,42 @@
+"""Historial de chat acotado por sesión del kiosco."""
+import time
+from collections import deque
+
+
+class HistorialChat:
+    """Los últimos `max_mensajes` mensajes; los más viejos se descartan solos.
+
+    Cada mensaje es un dict con "role" y "content" y, en las respuestas con ruta,
+    "map_url", "qr_url" y "destino".
+    """
+
+    def __init__(self, max_mensajes: int = 20):
+        self._mensajes = deque(maxlen=max_mensajes)
+        self.actividad = time.time()
+
+    def agregar(self, role: str, content: str, **extra):
+        self._mensajes.append({"role": role, "content": content, **{k: v for k, v in extra.items() if v}})
+        self.tocar()
+
+    def tocar(self):
+        self.actividad = time.time()
+
+    def inactivo(self, segundos: float) -> bool:
+        return time.time() - self.actividad > segundos
+
+    def limpiar(self):
+        self._mensajes.clear()
+        self.tocar()
+
+    def ultimo_mapa(self) -> int:
+        """Índice del mensaje más reciente con mapa (el único que se dibuja como iframe), o -1."""
+        for i in range(len(self._mensajes) - 1, -1, -1):
+            if "map_url" in self._mensajes[i]:
+                return i
+        return -1
+
+    def __iter__(self):
+        return iter(self._mensajes)
+
+    def __len__(self):
+        return len(self._mensajes)
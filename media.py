@@ -0,0 +1,266 @@
+"""Capa de medios del kiosco: caché de archivos en memoria y servidor HTTP local.
+
+Los videos del avatar se leen una sola vez por proceso y se sirven por URL
+(con soporte de `Range`, `ETag` y `Cache-Control`) para que el navegador los
+guarde en su caché en lugar de recibirlos en base64 en cada rerun.
+
+El servidor escucha en un puerto propio, así que solo se usa si `MEDIA_PUBLIC_URL`
+dice cómo lo alcanza el navegador del kiosco (p. ej. una ruta del proxy HTTPS que
+también sirve Streamlit). Sin ella, o si la página va por HTTPS y la URL es http,
+los medios viajan como data URI del mismo origen, como antes.
+"""
+import os
+import base64
+import hashlib
+import logging
+import mimetypes
+import threading
+import urllib.parse
+from collections import OrderedDict, namedtuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+RecursoMedia = namedtuple("RecursoMedia", ["datos", "mime", "etag", "mtime"])
+
+
+def _nombre(ruta: str) -> str:
+    return os.path.normpath(ruta).replace(os.sep, "/")
+
+
+def _mime_de(ruta: str) -> str:
+    if ruta.endswith(".svg"):
+        return "image/svg+xml"
+    return mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+
+
+# --- CACHÉ LRU ACOTADA POR BYTES ---
+class MediaCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._recursos = OrderedDict()
+        self._data_uris = {}
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = 0
+
+    def obtener(self, ruta: str):
+        """Regresa el `RecursoMedia` de `ruta`, releyendo el archivo si cambió su mtime."""
+        try:
+            stat = os.stat(ruta)
+        except OSError:
+            return None
+        with self._lock:
+            recurso = self._recursos.get(ruta)
+            if recurso is not None and recurso.mtime == stat.st_mtime_ns:
+                self._recursos.move_to_end(ruta)
+                self.aciertos += 1
+                return recurso
+            self.fallos += 1
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        etag = hashlib.sha1(datos).hexdigest()[:16]
+        return self._guardar(ruta, RecursoMedia(datos, _mime_de(ruta), etag, stat.st_mtime_ns))
+
+    def data_uri(self, ruta: str) -> str:
+        """Codifica `ruta` como data URI una sola vez por versión del archivo."""
+        recurso = self.obtener(ruta)
+        if recurso is None:
+            return ""
+        with self._lock:
+            clave = (ruta, recurso.etag)
+            if clave not in self._data_uris:
+                self._data_uris = {k: v for k, v in self._data_uris.items() if k[0] != ruta}
+                self._data_uris[clave] = f"data:{recurso.mime};base64,{base64.b64encode(recurso.datos).decode()}"
+            return self._data_uris[clave]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos, "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "bytes": self.total_bytes, "recursos": len(self._recursos),
+            }
+
+    def _guardar(self, clave, recurso):
+        with self._lock:
+            anterior = self._recursos.pop(clave, None)
+            if anterior is not None:
+                self.total_bytes -= len(anterior.datos)
+            self._recursos[clave] = recurso
+            self.total_bytes += len(recurso.datos)
+            # Desalojo LRU; el recurso recién guardado nunca se expulsa a sí mismo
+            while self.total_bytes > self.max_bytes and len(self._recursos) > 1:
+                viejo, desalojado = self._recursos.popitem(last=False)
+                self.total_bytes -= len(desalojado.datos)
+                self._data_uris = {k: v for k, v in self._data_uris.items() if k[0] != viejo}
+                logger.info("MediaCache: desalojado %s", viejo)
+        return recurso
+
+
+def validar_url_publica(url: str):
+    """URL base normalizada, o None si no se configuró. Lanza ValueError si no es http(s)://host."""
+    if not url:
+        return None
+    partes = urllib.parse.urlparse(url.strip())
+    if partes.scheme not in ("http", "https") or not partes.netloc:
+        raise ValueError(f"MEDIA_PUBLIC_URL inválida: {url!r} (se espera http(s)://host[:puerto][/ruta])")
+    if partes.hostname in ("localhost", "127.0.0.1", "::1"):
+        logger.warning("MEDIA_PUBLIC_URL apunta a %s: solo un navegador en este mismo equipo verá los videos", partes.hostname)
+    return url.strip().rstrip("/")
+
+
+# --- SERVIDOR HTTP CON SOPORTE DE RANGE ---
+def _parsear_range(encabezado: str, tamano: int):
+    """Interpreta `bytes=a-b`, `bytes=a-` y `bytes=-n`. Regresa (inicio, fin) o None si no es satisfacible."""
+    if not encabezado.startswith("bytes=") or "," in encabezado:
+        return None
+    inicio, _, fin = encabezado[6:].strip().partition("-")
+    try:
+        if inicio == "":
+            n = int(fin)
+            if n <= 0:
+                return None
+            return max(tamano - n, 0), tamano - 1
+        a = int(inicio)
+        b = int(fin) if fin else tamano - 1
+    except ValueError:
+        return None
+    if a >= tamano or b < a:
+        return None
+    return a, min(b, tamano - 1)
+
+
+class _ManejadorMedia(BaseHTTPRequestHandler):
+    server_version = "MetroMedia/1.0"
+
+    def do_HEAD(self):
+        self._responder(con_cuerpo=False)
+
+    def do_GET(self):
+        self._responder(con_cuerpo=True)
+
+    def _responder(self, con_cuerpo: bool):
+        ruta_url = urllib.parse.urlparse(self.path).path
+        dinamica = self.server.servidor_media.rutas.get(ruta_url)
+        if dinamica is not None:
+            mime, cuerpo = dinamica()
+            self.send_response(200)
+            self.send_header("Content-Type", mime)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            if con_cuerpo:
+                self.wfile.write(cuerpo)
+            return
+        recurso = self.server.servidor_media.resolver(ruta_url)
+        if recurso is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{recurso.etag}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        datos, tamano = recurso.datos, len(recurso.datos)
+        rango = self.headers.get("Range")
+        if rango:
+            limites = _parsear_range(rango, tamano)
+            if limites is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{tamano}")
+                self.end_headers()
+                return
+            inicio, fin = limites
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{fin}/{tamano}")
+            cuerpo = datos[inicio:fin + 1]
+        else:
+            self.send_response(200)
+            cuerpo = datos
+
+        self.send_header("Content-Type", recurso.mime)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if con_cuerpo:
+            try:
+                self.wfile.write(cuerpo)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # El navegador cancela rangos al hacer seek; no es un error
+
+    def log_message(self, formato, *args):
+        logger.debug("media %s - %s", self.address_string(), formato % args)
+
+
+class MediaServer:
+    """Sirve en `/media/<ruta>` cualquier archivo bajo las carpetas `raices` (relativas al directorio de la app).
+
+    No hay lista por proceso: el worker que ganó el puerto sirve también lo que otro
+    worker muestra, incluidos los clips que se agreguen después a `videos/<idioma>/`.
+    """
+
+    def __init__(self, cache: MediaCache, raices=("videos",), host: str = "127.0.0.1", puerto: int = 8502, url_publica: str = None):
+        self.cache = cache
+        self.raices = [os.path.realpath(raiz) for raiz in raices]
+        self.host, self.puerto = host, puerto
+        self.url_publica = validar_url_publica(url_publica)
+        self.rutas = {}
+        self._httpd = None
+
+    def agregar_ruta(self, ruta_url: str, generar):
+        """Ruta dinámica sin caché (p. ej. `/metrics`); `generar()` regresa (mime, bytes)."""
+        self.rutas[ruta_url] = generar
+
+    def precargar(self, ruta: str):
+        self.cache.obtener(_nombre(ruta))
+
+    def url(self, ruta: str, pagina_https: bool = False) -> str:
+        """URL versionada por ETag: el navegador la guarda en caché hasta que cambie el archivo.
+
+        Sin URL pública, o con una http bajo una página HTTPS (contenido mixto), regresa un data URI.
+        """
+        nombre = _nombre(ruta)
+        if self.url_publica is None or (pagina_https and self.url_publica.startswith("http://")):
+            return self.cache.data_uri(nombre)
+        recurso = self.resolver(f"/media/{nombre}")
+        version = f"?v={recurso.etag}" if recurso else ""
+        return f"{self.url_publica}/media/{urllib.parse.quote(nombre)}{version}"
+
+    def resolver(self, ruta_url: str):
+        if not ruta_url.startswith("/media/"):
+            return None
+        nombre = _nombre(urllib.parse.unquote(ruta_url[len("/media/"):]))
+        # realpath descarta "../" y enlaces que salgan de las raíces
+        ruta = os.path.realpath(nombre)
+        if not any(ruta.startswith(raiz + os.sep) for raiz in self.raices):
+            return None
+        return self.cache.obtener(nombre)
+
+    def iniciar(self):
+        if self._httpd is not None:
+            return self
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.puerto), _ManejadorMedia)
+        except OSError as e:
+            # Otro worker del mismo host ya sirve los medios en ese puerto
+            logger.warning("MediaServer: no se pudo abrir %s:%s (%s)", self.host, self.puerto, e)
+            return self
+        self._httpd.daemon_threads = True
+        self._httpd.servidor_media = self
+        threading.Thread(target=self._httpd.serve_forever, name="media-server", daemon=True).start()
+        logger.info("MediaServer escuchando en %s:%s", self.host, self.puerto)
+        return self
+
+    def detener(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
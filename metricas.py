@@ -0,0 +1,191 @@
+"""Instrumentación del camino caliente: histogramas de latencia, errores y tasas de caché.
+
+Uso:
+    with METRICAS.medir("traduccion_inteligente"):
+        ...
+
+Se exporta como texto Prometheus (archivo y ruta `/metrics` del servidor de medios)
+y como una línea JSON periódica en el log. Cada worker tiene su propio registro: las
+series llevan la etiqueta `pid` y cada proceso escribe su propio archivo.
+"""
+import os
+import atexit
+import json
+import time
+import bisect
+import functools
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de las cubetas del histograma
+CUBETAS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histograma:
+    """Cubetas acumulables al estilo Prometheus más una muestra de las últimas
+    observaciones para calcular p50/p95/p99 recientes."""
+
+    def __init__(self, muestra: int = 2048):
+        self.cuentas = [0] * (len(CUBETAS) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self.recientes = deque(maxlen=muestra)
+
+    def observar(self, valor: float):
+        self.cuentas[bisect.bisect_left(CUBETAS, valor)] += 1
+        self.suma += valor
+        self.total += 1
+        self.recientes.append(valor)
+
+    def cuantiles(self) -> dict:
+        if not self.recientes:
+            return {}
+        orden = sorted(self.recientes)
+        return {q: orden[min(int(q * len(orden)), len(orden) - 1)] for q in CUANTILES}
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencias = {}
+        self._errores = {}
+        self._eventos = {}
+        self._fuentes = {}
+
+    def observar(self, etapa: str, segundos: float):
+        with self._lock:
+            self._latencias.setdefault(etapa, Histograma()).observar(segundos)
+
+    def contar(self, evento: str, n: int = 1):
+        with self._lock:
+            self._eventos[evento] = self._eventos.get(evento, 0) + n
+
+    def error(self, etapa: str):
+        with self._lock:
+            self._errores[etapa] = self._errores.get(etapa, 0) + 1
+
+    @contextmanager
+    def medir(self, etapa: str):
+        """Registra la duración del bloque; si lanza excepción también cuenta un error."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(etapa)
+            raise
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio)
+
+    def cronometrar(self, etapa: str):
+        """Decorador equivalente a envolver la función en `medir(etapa)`."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.medir(etapa):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def reiniciar(self):
+        """Descarta latencias, errores y eventos (las fuentes siguen registradas). Para benchmarks."""
+        with self._lock:
+            self._latencias, self._errores, self._eventos = {}, {}, {}
+
+    def registrar_fuente(self, nombre: str, estadisticas):
+        """`estadisticas` es un callable que regresa un dict numérico (p. ej. `cache.estadisticas`)."""
+        with self._lock:
+            self._fuentes[nombre] = estadisticas
+
+    def _leer_fuentes(self) -> dict:
+        fuentes = {}
+        for nombre, estadisticas in list(self._fuentes.items()):
+            try:
+                fuentes[nombre] = {k: v for k, v in estadisticas().items() if isinstance(v, (int, float))}
+            except Exception as e:
+                logger.warning(f"Fuente de métricas '{nombre}' falló: {e}")
+        return fuentes
+
+    def resumen(self) -> dict:
+        with self._lock:
+            latencias = {
+                etapa: {"n": h.total, "suma": round(h.suma, 6), **{f"p{int(q * 100)}": round(v, 6) for q, v in h.cuantiles().items()}}
+                for etapa, h in self._latencias.items()
+            }
+            errores, eventos = dict(self._errores), dict(self._eventos)
+        return {"latencias": latencias, "errores": errores, "eventos": eventos, "caches": self._leer_fuentes()}
+
+    def prometheus(self) -> str:
+        """Texto Prometheus de este proceso; todas las series llevan `pid` para distinguir a los workers."""
+        pid = f'pid="{os.getpid()}"'
+        lineas = ["# TYPE kiosco_latencia_segundos histogram"]
+        with self._lock:
+            for etapa, h in sorted(self._latencias.items()):
+                acumulado = 0
+                for limite, cuenta in zip(CUBETAS + (float("inf"),), h.cuentas):
+                    acumulado += cuenta
+                    le = "+Inf" if limite == float("inf") else repr(limite)
+                    lineas.append(f'kiosco_latencia_segundos_bucket{{{pid},etapa="{etapa}",le="{le}"}} {acumulado}')
+                lineas.append(f'kiosco_latencia_segundos_sum{{{pid},etapa="{etapa}"}} {h.suma}')
+                lineas.append(f'kiosco_latencia_segundos_count{{{pid},etapa="{etapa}"}} {h.total}')
+            lineas.append("# TYPE kiosco_latencia_cuantil_segundos gauge")
+            for etapa, h in sorted(self._latencias.items()):
+                for q, valor in h.cuantiles().items():
+                    lineas.append(f'kiosco_latencia_cuantil_segundos{{{pid},etapa="{etapa}",quantile="{q}"}} {valor}')
+            lineas.append("# TYPE kiosco_errores_total counter")
+            lineas += [f'kiosco_errores_total{{{pid},etapa="{e}"}} {n}' for e, n in sorted(self._errores.items())]
+            lineas.append("# TYPE kiosco_eventos_total counter")
+            lineas += [f'kiosco_eventos_total{{{pid},evento="{e}"}} {n}' for e, n in sorted(self._eventos.items())]
+        lineas.append("# TYPE kiosco_cache gauge")
+        for fuente, valores in sorted(self._leer_fuentes().items()):
+            lineas += [f'kiosco_cache{{{pid},fuente="{fuente}",campo="{campo}"}} {valor}' for campo, valor in sorted(valores.items())]
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta_archivo: str = None):
+        """Escribe el texto Prometheus (reemplazo atómico) y deja el resumen como línea JSON en el log."""
+        if ruta_archivo:
+            ruta_archivo = archivo_del_proceso(ruta_archivo)
+            if os.path.dirname(ruta_archivo):
+                os.makedirs(os.path.dirname(ruta_archivo), exist_ok=True)
+            temporal = f"{ruta_archivo}.{os.getpid()}.tmp"
+            with open(temporal, "w") as f:
+                f.write(self.prometheus())
+            os.replace(temporal, ruta_archivo)
+        logger.info(json.dumps({"metricas": self.resumen(), "pid": os.getpid(), "ts": time.time()}, ensure_ascii=False))
+
+    def iniciar_exportacion(self, ruta_archivo: str = None, intervalo: float = 60.0):
+        """Exporta cada `intervalo` segundos; el archivo de este proceso se borra al salir para no dejar series muertas."""
+        if ruta_archivo:
+            atexit.register(_borrar, archivo_del_proceso(ruta_archivo))
+
+        def ciclo():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.exportar(ruta_archivo)
+                except Exception as e:
+                    logger.warning(f"No se pudieron exportar las métricas: {e}")
+        threading.Thread(target=ciclo, name="metricas", daemon=True).start()
+
+
+def archivo_del_proceso(ruta_archivo: str) -> str:
+    """Ruta propia del worker: reemplaza `{pid}` o, si no aparece, lo agrega antes de la extensión."""
+    if "{pid}" in ruta_archivo:
+        return ruta_archivo.replace("{pid}", str(os.getpid()))
+    base, extension = os.path.splitext(ruta_archivo)
+    return f"{base}.{os.getpid()}{extension}"
+
+
+def _borrar(ruta: str):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+# Registro del proceso; lo comparten todos los módulos y sesiones
+METRICAS = Metricas()
@@ -0,0 +1,191 @@
+"""Procesamiento concurrente de un turno del kiosco.
+
+Primero se resuelve la intención (local en microsegundos, o una sola llamada
+estructurada al LLM). Con la intención conocida, las etapas independientes
+—traducción, QR y selección del clip del avatar— corren en paralelo,
+cada una con su propio plazo: la latencia del turno es la de la etapa más lenta,
+no la suma, y una etapa vencida cae a su valor de respaldo sin frenar al resto.
+Las direcciones de Google no son una etapa: `DemoAgent.respuesta` ya las leyó de la
+caché (y agendó su descarga en segundo plano si faltaban).
+"""
+import os
+import time
+import queue
+import logging
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from metricas import METRICAS
+from traducciones import detectar_idioma
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se espera a cada etapa antes de usar su respaldo
+PLAZOS = {"traduccion": 8.0, "qr": 1.0, "clip": 0.5}
+
+
+def seleccionar_clip(video: str, idioma: str = None) -> str:
+    """Clip localizado `videos/<idioma>/<archivo>` si existe; si no, el clip original."""
+    if idioma and idioma != "es":
+        localizado = os.path.join(os.path.dirname(video), idioma, os.path.basename(video))
+        if os.path.exists(localizado):
+            return localizado
+    return video
+
+
+class PipelineTurno:
+    def __init__(self, agente, generador_qr=None, clave_mapas: str = None, plazos: dict = None, max_hilos: int = 16, cache_respuestas=None):
+        self.agente = agente
+        # CacheSemantica opcional: turnos completos reutilizados entre sesiones
+        self.cache_respuestas = cache_respuestas
+        self.generador_qr = generador_qr
+        self.clave_mapas = clave_mapas
+        self.plazos = {**PLAZOS, **(plazos or {})}
+        # Pool del proceso: lo comparten todas las sesiones
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="turno")
+
+    @METRICAS.cronometrar("turno")
+    def procesar(self, query: str, prefijo: str = "", en_flujo: bool = False) -> dict:
+        """Resultado del turno: texto, video, map_url, qr_url, direcciones, idioma, destino e intención.
+
+        Con `en_flujo`, si hace falta traducir el turno regresa sin esperar la traducción:
+        `texto_flujo` genera sus fragmentos conforme llegan y `texto` queda con el texto
+        sin traducir hasta que el generador se agota.
+        """
+        inicio = time.monotonic()
+        turno = self._desde_cache(query, prefijo)
+        if turno is not None:
+            return turno
+
+        resp, localizada = self.agente.resolver_intencion(query, prefijo)
+        origen, destino = self.agente.origen_mapas, resp["destino"]
+        texto_base = resp["texto"] if localizada else self.agente.texto_con_prefijo(resp, prefijo, vivo=resp.get("idioma") == "es")
+
+        etapas = {"clip": (lambda: seleccionar_clip(resp["video"], resp.get("idioma")), resp["video"])}
+        cola = None
+        if not localizada and en_flujo:
+            # Arranca antes que las demás etapas para que los primeros fragmentos ya estén en la cola
+            cola = queue.Queue()
+            self._pool.submit(self._producir_traduccion, texto_base, query, cola)
+        elif not localizada:
+            etapas["traduccion"] = (lambda: self.agente.traduccion_completa(texto_base, query), (texto_base, True))
+        if destino and self.generador_qr is not None:
+            # Data URI: el QR sigue visible en el historial y en los aciertos de caché
+            etapas["qr"] = (lambda: self.generador_qr.data_uri(origen, destino), None)
+
+        resultados, respaldos = self._ejecutar(etapas)
+        texto, traduccion_degradada = resultados.get("traduccion", (texto_base, False))
+        turno = {
+            "texto": texto,
+            "video": resultados["clip"],
+            "destino": destino,
+            "idioma": resp.get("idioma"),
+            "map_url": self._map_url(origen, destino),
+            "qr_url": resultados.get("qr"),
+            "direcciones": resp.get("direcciones"),
+            "intencion": resp.get("intencion"),
+            # Respaldo local o traducción incompleta: se muestra, pero no se comparte por caché
+            "degradada": bool(resp.get("degradada") or traduccion_degradada),
+        }
+        if cola is not None:
+            turno["texto_flujo"] = self._consumir_traduccion(cola, turno, query, prefijo, respaldos, inicio)
+        else:
+            self._guardar_en_cache(query, prefijo, turno, respaldos)
+        return turno
+
+    @staticmethod
+    def _contexto_cache(query: str, prefijo: str) -> str:
+        # El idioma entra en la clave: una pregunta parecida en otro idioma no comparte respuesta
+        return f"{prefijo}\x1f{detectar_idioma(query) or ''}"
+
+    def _guardar_en_cache(self, query: str, prefijo: str, turno: dict, respaldos):
+        # Solo se guardan turnos completos: ni respuestas degradadas ni etapas que cayeron a su respaldo
+        if self.cache_respuestas is not None and turno["intencion"] and not respaldos and not turno["degradada"]:
+            self.cache_respuestas.guardar(query, {k: v for k, v in turno.items() if k != "texto_flujo"}, self._contexto_cache(query, prefijo))
+
+    def _producir_traduccion(self, texto: str, query: str, cola: queue.Queue):
+        """Pone los fragmentos (str) en `cola` y al final un bool: si la traducción quedó degradada."""
+        degradada = True
+        try:
+            with METRICAS.medir("traduccion_inteligente"):
+                flujo = self.agente.traduccion_en_flujo(texto, query)
+                while True:
+                    try:
+                        cola.put(next(flujo))
+                    except StopIteration as fin:
+                        degradada = bool(fin.value)
+                        break
+        finally:
+            cola.put(degradada)
+
+    def _consumir_traduccion(self, cola: queue.Queue, turno: dict, query: str, prefijo: str, respaldos, inicio: float):
+        """Fragmentos de la traducción hasta agotarse o vencer el plazo; al final deja el texto completo en `turno`."""
+        fragmentos = []
+        while True:
+            restante = self.plazos["traduccion"] - (time.monotonic() - inicio)
+            try:
+                fragmento = cola.get(timeout=max(restante, 0.0))
+            except queue.Empty:
+                METRICAS.contar("plazo_vencido_traduccion")
+                logger.warning(f"Etapa 'traduccion' excedió su plazo de {self.plazos['traduccion']}s; usando respaldo")
+                # Cortada a medias o sin traducir: se muestra pero no se guarda en caché
+                turno["degradada"] = True
+                if not fragmentos:
+                    fragmentos.append(turno["texto"])
+                    yield turno["texto"]
+                break
+            if isinstance(fragmento, bool):
+                turno["degradada"] = turno["degradada"] or fragmento
+                break
+            fragmentos.append(fragmento)
+            yield fragmento
+        turno["texto"] = "".join(fragmentos).strip()
+        turno.pop("texto_flujo", None)
+        self._guardar_en_cache(query, prefijo, turno, respaldos)
+
+    @METRICAS.cronometrar("cache_semantica")
+    def _desde_cache(self, query: str, prefijo: str):
+        if self.cache_respuestas is None:
+            return None
+        turno, similitud = self.cache_respuestas.obtener(query, self._contexto_cache(query, prefijo))
+        if turno is None:
+            return None
+        # Si las palabras clave apuntan a otra intención, la vecindad de caracteres engañó
+        puntajes = self.agente.clasificador.puntuar(query)
+        if puntajes and max(puntajes, key=puntajes.get) != turno["intencion"]:
+            METRICAS.contar("cache_semantica_conflicto")
+            return None
+        logger.info(f"Turno desde caché semántica (similitud {similitud:.2f})")
+        return dict(turno)
+
+    def _ejecutar(self, etapas: dict) -> dict:
+        inicio = time.monotonic()
+        # traduccion_inteligente ya se mide dentro de DemoAgent
+        futuros = {
+            nombre: self._pool.submit(funcion if nombre == "traduccion" else METRICAS.cronometrar(nombre)(funcion))
+            for nombre, (funcion, _) in etapas.items()
+        }
+        resultados, respaldos = {}, set()
+        for nombre, futuro in futuros.items():
+            respaldo = etapas[nombre][1]
+            restante = self.plazos[nombre] - (time.monotonic() - inicio)
+            try:
+                resultados[nombre] = futuro.result(timeout=max(restante, 0.0))
+            except FuturesTimeout:
+                # La etapa sigue en el pool (p. ej. llenando una caché) pero el turno no la espera
+                METRICAS.contar(f"plazo_vencido_{nombre}")
+                logger.warning(f"Etapa '{nombre}' excedió su plazo de {self.plazos[nombre]}s; usando respaldo")
+                resultados[nombre] = respaldo
+                respaldos.add(nombre)
+            except Exception as e:
+                logger.warning(f"Etapa '{nombre}' falló: {e}")
+                resultados[nombre] = respaldo
+                respaldos.add(nombre)
+        return resultados, respaldos
+
+    @METRICAS.cronometrar("mapa")
+    def _map_url(self, origen: str, destino: str):
+        if not destino:
+            return None
+        origen, destino = urllib.parse.quote(origen), urllib.parse.quote(destino)
+        return f"https://www.google.com/maps/embed/v1/directions?key={self.clave_mapas}&origin={origen}&destination={destino}&mode=transit"
@@ -0,0 +1,56 @@
+"""Precalienta la caché de traducciones antes de abrir el kiosco.
+
+Uso: python precalentar_traducciones.py [en pt fr ...]
+Traduce cada respuesta fija (con y sin el aviso de saturación) a los idiomas
+indicados y la guarda en el SQLite que comparten los workers de Streamlit.
+"""
+import sys
+import toml
+
+from agente import DemoAgent, RESPUESTAS
+from red_metro import RedMetro
+from traducciones import CacheTraducciones, IDIOMAS
+
+# Idiomas más comunes entre los visitantes del Mundial
+IDIOMAS_POR_DEFECTO = ["en", "pt", "fr", "de", "it", "ja", "ko", "zh", "ar"]
+PREFIJO_SATURACION = "Precaución, saturación alta. "
+
+try:
+    secrets = toml.load(".streamlit/secrets.toml")
+except Exception:
+    secrets = {}
+
+
+def textos_fuente(agente):
+    for intencion in RESPUESTAS:
+        resp = agente.respuesta(intencion)
+        yield resp["texto"]
+        if resp["destino"]:
+            yield PREFIJO_SATURACION + resp["texto"]
+
+
+if __name__ == "__main__":
+    idiomas = sys.argv[1:] or IDIOMAS_POR_DEFECTO
+    desconocidos = [i for i in idiomas if i not in IDIOMAS]
+    if desconocidos:
+        print(f"❌ Idiomas no soportados: {', '.join(desconocidos)}. Opciones: {', '.join(IDIOMAS)}")
+        sys.exit(1)
+
+    cache = CacheTraducciones(ruta_db=secrets.get("CACHE_DB", ".cache/kiosco.sqlite3"))
+    # Misma red y estación que el kiosco para que los textos de ruta coincidan con los de la caché
+    agente = DemoAgent(secrets.get("GOOGLE_API_KEY"), traducciones=cache, red=RedMetro(), estacion_origen=secrets.get("ESTACION_KIOSCO", "Zócalo"))
+
+    nuevas = errores = 0
+    for idioma in idiomas:
+        for texto in textos_fuente(agente):
+            if cache.obtener(texto, idioma) is not None:
+                continue
+            try:
+                cache.guardar(texto, idioma, agente.traducir(texto, idioma))
+                nuevas += 1
+            except Exception as e:
+                errores += 1
+                print(f"⚠️  [{idioma}] {texto[:40]}...: {e}")
+        print(f"✅ {IDIOMAS[idioma]} listo.")
+
+    print(f"\n🔥 Traducciones nuevas: {nuevas} | errores: {errores} | {cache.estadisticas()}")
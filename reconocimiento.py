@@ -0,0 +1,164 @@
+"""Motores de reconocimiento de voz intercambiables, con respaldo automático.
+
+`MotorGoogle` usa la API web de `speech_recognition`; `MotorVosk` decodifica en el
+propio kiosco con un modelo Kaldi cargado una sola vez por proceso (dependencia
+opcional: `pip install vosk` y un modelo, p. ej. vosk-model-small-es-0.42).
+`CadenaMotores` prueba los motores en orden y aparta por un rato al que falla o
+se pasa de su plazo (con la subida degradada, Google tarda en vez de fallar).
+"""
+import abc
+import json
+import time
+import logging
+import threading
+
+import speech_recognition as sr
+
+from metricas import METRICAS
+from resiliencia import PlazoVencido
+
+logger = logging.getLogger(__name__)
+
+SEGUNDOS_BLOQUE = 0.25
+
+
+def bloques_pcm(audio: sr.AudioData, segundos: float = SEGUNDOS_BLOQUE):
+    """Parte el PCM de `audio` en bloques de `segundos`, como llegarían de un micrófono."""
+    crudo = audio.get_raw_data()
+    paso = max(audio.sample_width, int(audio.sample_rate * segundos) * audio.sample_width)
+    for inicio in range(0, len(crudo), paso):
+        yield crudo[inicio:inicio + paso]
+
+
+class MotorVoz(abc.ABC):
+    """Interfaz: `transcribir(audio)` regresa el texto ("" si no se entendió nada) o lanza si el motor falló."""
+
+    nombre = "motor"
+
+    @abc.abstractmethod
+    def transcribir(self, audio: sr.AudioData) -> str:
+        ...
+
+
+class MotorGoogle(MotorVoz):
+    nombre = "google"
+
+    def __init__(self, reconocedor: sr.Recognizer = None, idioma: str = "es-MX", endpoint: str = None, plazo: float = 5.0):
+        self.reconocedor = reconocedor or sr.Recognizer()
+        # Sin esto urlopen espera indefinidamente y el kiosco nunca llega al respaldo
+        self.reconocedor.operation_timeout = plazo
+        self.plazo = plazo
+        self.idioma = idioma
+        # Endpoint alterno (p. ej. VozSimulada); None usa el de Google
+        self._opciones = {"endpoint": endpoint} if endpoint else {}
+
+    def transcribir(self, audio: sr.AudioData) -> str:
+        try:
+            return self.reconocedor.recognize_google(audio, language=self.idioma, **self._opciones)
+        except sr.UnknownValueError:
+            return ""
+        except TimeoutError as e:
+            # Plazo vencido leyendo la respuesta
+            raise PlazoVencido(f"Google sin respuesta en {self.plazo}s") from e
+        except sr.RequestError as e:
+            # Plazo vencido al conectar: urlopen lo reporta como URLError("timed out")
+            if "timed out" in str(e):
+                raise PlazoVencido(f"Google sin respuesta en {self.plazo}s") from e
+            raise
+
+
+# Modelos Vosk del proceso, por ruta: cargar uno tarda segundos y ocupa cientos de MB
+_MODELOS_VOSK = {}
+_LOCK_MODELOS = threading.Lock()
+
+
+def _modelo_vosk(ruta: str):
+    with _LOCK_MODELOS:
+        if ruta not in _MODELOS_VOSK:
+            import vosk
+            vosk.SetLogLevel(-1)
+            inicio = time.perf_counter()
+            _MODELOS_VOSK[ruta] = vosk.Model(ruta)
+            logger.info(f"Modelo Vosk '{ruta}' cargado en {time.perf_counter() - inicio:.1f}s")
+        return _MODELOS_VOSK[ruta]
+
+
+class MotorVosk(MotorVoz):
+    nombre = "vosk"
+
+    def __init__(self, ruta_modelo: str, tasa: int = 16000):
+        import vosk  # Falla aquí (y no a media conversación) si la dependencia no está instalada
+        self._vosk = vosk
+        self.tasa = tasa
+        self.modelo = _modelo_vosk(ruta_modelo)
+
+    def transcribir(self, audio: sr.AudioData) -> str:
+        if audio.sample_rate != self.tasa or audio.sample_width != 2:
+            audio = sr.AudioData(audio.get_raw_data(convert_rate=self.tasa, convert_width=2), self.tasa, 2)
+        return self.transcribir_flujo(bloques_pcm(audio))
+
+    def transcribir_flujo(self, bloques) -> str:
+        """Decodifica PCM de 16 bits a `tasa` conforme llegan los bloques; el texto sale al agotarse el flujo."""
+        # El reconocedor Kaldi no es seguro entre hilos: uno por llamada, el modelo es compartido
+        reconocedor = self._vosk.KaldiRecognizer(self.modelo, self.tasa)
+        frases = []
+        for bloque in bloques:
+            if reconocedor.AcceptWaveform(bloque):
+                frases.append(json.loads(reconocedor.Result()).get("text", ""))
+        frases.append(json.loads(reconocedor.FinalResult()).get("text", ""))
+        return " ".join(f for f in frases if f)
+
+
+class CadenaMotores:
+    """Prueba los motores en orden. Uno que lanza queda apartado `reintento_tras_error` segundos."""
+
+    def __init__(self, motores, reintento_tras_error: float = 30.0):
+        self.motores = list(motores)
+        self.reintento_tras_error = reintento_tras_error
+        self._fallidos = {}  # nombre -> momento del último error
+        self._lock = threading.Lock()
+
+    def _disponibles(self):
+        ahora = time.time()
+        with self._lock:
+            disponibles = [m for m in self.motores if ahora - self._fallidos.get(m.nombre, 0.0) >= self.reintento_tras_error]
+        # Si todos están apartados se intenta de todos modos: peor es no intentar
+        return disponibles or self.motores
+
+    def transcribir(self, audio: sr.AudioData) -> str:
+        for motor in self._disponibles():
+            try:
+                with METRICAS.medir(f"voz_{motor.nombre}"):
+                    texto = motor.transcribir(audio)
+            except Exception as e:
+                if isinstance(e, TimeoutError):
+                    METRICAS.contar(f"voz_{motor.nombre}_plazo_vencido")
+                logger.warning(f"Motor de voz '{motor.nombre}' falló: {e}")
+                with self._lock:
+                    self._fallidos[motor.nombre] = time.time()
+                continue
+            if motor is not self.motores[0]:
+                METRICAS.contar("voz_respaldo")
+            with self._lock:
+                self._fallidos.pop(motor.nombre, None)
+            return texto
+        raise RuntimeError("Ningún motor de voz disponible")
+
+
+def crear_motores(nombres: str = "google", reconocedor: sr.Recognizer = None, idioma: str = "es-MX",
+                  endpoint_google: str = None, ruta_vosk: str = None, plazo_google: float = 5.0) -> CadenaMotores:
+    """Cadena a partir de "vosk,google" (orden = preferencia). Los motores que no cargan se omiten."""
+    motores = []
+    for nombre in (n.strip().lower() for n in nombres.split(",") if n.strip()):
+        try:
+            if nombre == "google":
+                motores.append(MotorGoogle(reconocedor, idioma, endpoint_google, plazo_google))
+            elif nombre == "vosk":
+                motores.append(MotorVosk(ruta_vosk or "modelos/vosk-es"))
+            else:
+                logger.warning(f"Motor de voz desconocido: '{nombre}'")
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el motor de voz '{nombre}': {e}")
+    if not motores:
+        motores.append(MotorGoogle(reconocedor, idioma, endpoint_google, plazo_google))
+    return CadenaMotores(motores)
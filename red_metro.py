@@ -0,0 +1,186 @@
+"""Red del Metro CDMX (y Tren Ligero) empaquetada, con rutas más cortas precalculadas.
+
+Cada nodo es un andén (estación, línea). Los tramos entre estaciones consecutivas
+y los transbordos dentro de una estación se guardan como adyacencia CSR en arreglos
+de NumPy; al construir la red se calculan todas las distancias mínimas (Floyd–Warshall
+vectorizado) y el siguiente salto de cada par, así que una consulta solo reconstruye
+el camino: decenas de microsegundos y sin red.
+"""
+import numpy as np
+
+from clasificador import normalizar
+
+LINEAS = {
+    "1": ["Observatorio", "Tacubaya", "Juanacatlán", "Chapultepec", "Sevilla", "Insurgentes", "Cuauhtémoc",
+          "Balderas", "Salto del Agua", "Isabel la Católica", "Pino Suárez", "Merced", "Candelaria", "San Lázaro",
+          "Moctezuma", "Balbuena", "Boulevard Puerto Aéreo", "Gómez Farías", "Zaragoza", "Pantitlán"],
+    "2": ["Cuatro Caminos", "Panteones", "Tacuba", "Cuitláhuac", "Popotla", "Colegio Militar", "Normal",
+          "San Cosme", "Revolución", "Hidalgo", "Bellas Artes", "Allende", "Zócalo", "Pino Suárez",
+          "San Antonio Abad", "Chabacano", "Viaducto", "Xola", "Villa de Cortés", "Nativitas", "Portales",
+          "Ermita", "General Anaya", "Tasqueña"],
+    "3": ["Indios Verdes", "Deportivo 18 de Marzo", "Potrero", "La Raza", "Tlatelolco", "Guerrero", "Hidalgo",
+          "Juárez", "Balderas", "Niños Héroes", "Hospital General", "Centro Médico", "Etiopía", "Eugenia",
+          "División del Norte", "Zapata", "Coyoacán", "Viveros", "Miguel Ángel de Quevedo", "Copilco", "Universidad"],
+    "4": ["Martín Carrera", "Talismán", "Bondojito", "Consulado", "Canal del Norte", "Morelos", "Candelaria",
+          "Fray Servando", "Jamaica", "Santa Anita"],
+    "5": ["Politécnico", "Instituto del Petróleo", "Autobuses del Norte", "La Raza", "Misterios", "Valle Gómez",
+          "Consulado", "Eduardo Molina", "Aragón", "Oceanía", "Terminal Aérea", "Hangares", "Pantitlán"],
+    "6": ["El Rosario", "Tezozómoc", "Azcapotzalco", "Ferrería", "Norte 45", "Vallejo", "Instituto del Petróleo",
+          "Lindavista", "Deportivo 18 de Marzo", "La Villa-Basílica", "Martín Carrera"],
+    "7": ["El Rosario", "Aquiles Serdán", "Camarones", "Refinería", "Tacuba", "San Joaquín", "Polanco", "Auditorio",
+          "Constituyentes", "Tacubaya", "San Pedro de los Pinos", "San Antonio", "Mixcoac", "Barranca del Muerto"],
+    "8": ["Garibaldi", "Bellas Artes", "San Juan de Letrán", "Salto del Agua", "Doctores", "Obrera", "Chabacano",
+          "La Viga", "Santa Anita", "Coyuya", "Iztacalco", "Apatlaco", "Aculco", "Escuadrón 201", "Atlalilco",
+          "Iztapalapa", "Cerro de la Estrella", "UAM-I", "Constitución de 1917"],
+    "9": ["Tacubaya", "Patriotismo", "Chilpancingo", "Centro Médico", "Lázaro Cárdenas", "Chabacano", "Jamaica",
+          "Mixiuhca", "Velódromo", "Ciudad Deportiva", "Puebla", "Pantitlán"],
+    "A": ["Pantitlán", "Agrícola Oriental", "Canal de San Juan", "Tepalcates", "Guelatao", "Peñón Viejo",
+          "Acatitla", "Santa Marta", "Los Reyes", "La Paz"],
+    "B": ["Buenavista", "Guerrero", "Garibaldi", "Lagunilla", "Tepito", "Morelos", "San Lázaro",
+          "Ricardo Flores Magón", "Romero Rubio", "Oceanía", "Deportivo Oceanía", "Bosque de Aragón",
+          "Villa de Aragón", "Nezahualcóyotl", "Impulsora", "Río de los Remedios", "Múzquiz", "Ecatepec",
+          "Olímpica", "Plaza Aragón", "Ciudad Azteca"],
+    "12": ["Mixcoac", "Insurgentes Sur", "Hospital 20 de Noviembre", "Zapata", "Parque de los Venados",
+           "Eje Central", "Ermita", "Mexicaltzingo", "Atlalilco", "Culhuacán", "San Andrés Tomatlán",
+           "Lomas Estrella", "Calle 11", "Periférico Oriente", "Tezonco", "Olivos", "Nopalera", "Zapotitlán",
+           "Tlaltenco", "Tláhuac"],
+    "TL": ["Tasqueña", "Las Torres", "Ciudad Jardín", "La Virgen", "Xotepingo", "Nezahualpilli",
+           "Registro Federal", "Textitlán", "El Vergel", "Estadio Azteca", "Huipulco", "Xomali", "Periférico",
+           "Tepepan", "La Noria", "Huichapan", "Francisco Goitia", "Xochimilco"],
+}
+
+# Nombres oficiales largos o antiguos -> nombre usado en LINEAS
+ALIAS = {
+    "Zócalo/Tenochtitlan": "Zócalo", "Taxqueña": "Tasqueña", "Garibaldi/Lagunilla": "Garibaldi",
+    "Etiopía/Plaza de la Transparencia": "Etiopía", "Viveros/Derechos Humanos": "Viveros",
+    "Ferrería/Arena Ciudad de México": "Ferrería", "UAM Azcapotzalco": "Azcapotzalco",
+    "Estadio Banorte": "Estadio Azteca", "Metro Zócalo": "Zócalo", "Basílica": "La Villa-Basílica",
+}
+
+MINUTOS_TRAMO = {"TL": 2.5}
+MINUTOS_TRAMO_DEFAULT = 2.0
+MINUTOS_TRANSBORDO = 5.0
+
+
+def nombre_linea(linea: str) -> str:
+    return "Tren Ligero" if linea == "TL" else f"Línea {linea}"
+
+
+class RedMetro:
+    def __init__(self, lineas: dict = None):
+        lineas = lineas or LINEAS
+        self.lineas = lineas
+        self.estaciones = sorted({e for paradas in lineas.values() for e in paradas})
+        self._id_estacion = {normalizar(e): i for i, e in enumerate(self.estaciones)}
+        for alias, nombre in ALIAS.items():
+            if normalizar(nombre) in self._id_estacion:
+                self._id_estacion[normalizar(alias)] = self._id_estacion[normalizar(nombre)]
+
+        # Andenes: un nodo por (estación, línea)
+        self.claves_linea = list(lineas)
+        andenes = [(self._id_estacion[normalizar(e)], l) for l, paradas in enumerate(lineas.values()) for e in paradas]
+        self.anden_estacion = np.array([a[0] for a in andenes], dtype=np.int32)
+        self.anden_linea = np.array([a[1] for a in andenes], dtype=np.int32)
+        self.posicion = np.concatenate([np.arange(len(p), dtype=np.int32) for p in lineas.values()])
+        self._andenes_de = [[] for _ in self.estaciones]
+        for anden, estacion in enumerate(self.anden_estacion):
+            self._andenes_de[estacion].append(anden)
+
+        self.indptr, self.indices, self.pesos = self._construir_csr()
+        self.dist, self.siguiente = self._todos_los_pares()
+
+    def _construir_csr(self):
+        aristas = []
+        inicio = 0
+        for clave, paradas in self.lineas.items():
+            minutos = MINUTOS_TRAMO.get(clave, MINUTOS_TRAMO_DEFAULT)
+            for k in range(len(paradas) - 1):
+                aristas += [(inicio + k, inicio + k + 1, minutos), (inicio + k + 1, inicio + k, minutos)]
+            inicio += len(paradas)
+        for andenes in self._andenes_de:
+            aristas += [(a, b, MINUTOS_TRANSBORDO) for a in andenes for b in andenes if a != b]
+
+        aristas.sort()
+        origenes = np.array([a[0] for a in aristas], dtype=np.int32)
+        indices = np.array([a[1] for a in aristas], dtype=np.int32)
+        pesos = np.array([a[2] for a in aristas], dtype=np.float32)
+        indptr = np.searchsorted(origenes, np.arange(len(self.anden_estacion) + 1)).astype(np.int32)
+        return indptr, indices, pesos
+
+    def _todos_los_pares(self):
+        n = len(self.anden_estacion)
+        dist = np.full((n, n), np.inf, dtype=np.float32)
+        siguiente = np.full((n, n), -1, dtype=np.int32)
+        filas = np.repeat(np.arange(n), np.diff(self.indptr))
+        dist[filas, self.indices] = self.pesos
+        siguiente[filas, self.indices] = self.indices
+        np.fill_diagonal(dist, 0.0)
+        np.fill_diagonal(siguiente, np.arange(n))
+        for k in range(n):
+            via = dist[:, k, None] + dist[None, k, :]
+            mejor = via < dist
+            dist = np.where(mejor, via, dist)
+            siguiente = np.where(mejor, siguiente[:, k, None], siguiente)
+        return dist, siguiente
+
+    def buscar_estacion(self, nombre: str):
+        """Id de la estación (acepta acentos omitidos, alias y el prefijo 'Metro'), o None."""
+        clave = normalizar(nombre)
+        if clave not in self._id_estacion and clave.startswith("metro "):
+            clave = clave[len("metro "):]
+        return self._id_estacion.get(clave)
+
+    def ruta(self, origen: str, destino: str):
+        """Tramos por línea, número de transbordos y minutos estimados; None si alguna estación no existe."""
+        id_origen, id_destino = self.buscar_estacion(origen), self.buscar_estacion(destino)
+        if id_origen is None or id_destino is None:
+            return None
+        desde, hasta = self._andenes_de[id_origen], self._andenes_de[id_destino]
+        sub = self.dist[np.ix_(desde, hasta)]
+        i, j = np.unravel_index(np.argmin(sub), sub.shape)
+        actual, final = desde[i], hasta[j]
+        minutos = float(sub[i, j])
+
+        camino = [actual]
+        while actual != final:
+            actual = int(self.siguiente[actual, final])
+            camino.append(actual)
+
+        tramos = []
+        for a, b in zip(camino, camino[1:]):
+            linea = int(self.anden_linea[a])
+            if linea != self.anden_linea[b]:
+                continue  # transbordo dentro de la misma estación
+            if tramos and tramos[-1]["_linea"] == linea:
+                tramos[-1]["hasta"] = self.estaciones[self.anden_estacion[b]]
+                tramos[-1]["paradas"] += 1
+            else:
+                clave = self.claves_linea[linea]
+                terminal = self.lineas[clave][-1 if self.posicion[b] > self.posicion[a] else 0]
+                tramos.append({
+                    "_linea": linea, "linea": clave, "direccion": terminal, "paradas": 1,
+                    "desde": self.estaciones[self.anden_estacion[a]], "hasta": self.estaciones[self.anden_estacion[b]],
+                })
+        for tramo in tramos:
+            del tramo["_linea"]
+        return {
+            "origen": self.estaciones[id_origen], "destino": self.estaciones[id_destino],
+            "tramos": tramos, "transbordos": max(len(tramos) - 1, 0), "minutos": round(minutos),
+        }
+
+    def instrucciones(self, origen: str, destino: str) -> str:
+        """Indicaciones en español listas para el kiosco; cadena vacía si no hay ruta."""
+        ruta = self.ruta(origen, destino)
+        if ruta is None:
+            return ""
+        if not ruta["tramos"]:
+            return f"Ya estás en {ruta['destino']}."
+        pasos = []
+        for k, tramo in enumerate(ruta["tramos"]):
+            paradas = f"{tramo['paradas']} " + ("estación" if tramo["paradas"] == 1 else "estaciones")
+            if k == 0:
+                pasos.append(f"Desde {tramo['desde']}, toma la {nombre_linea(tramo['linea'])} dirección {tramo['direccion']} hasta {tramo['hasta']} ({paradas})")
+            else:
+                linea = "al Tren Ligero" if tramo["linea"] == "TL" else f"a la {nombre_linea(tramo['linea'])}"
+                pasos.append(f"ahí transborda {linea} dirección {tramo['direccion']} hasta {tramo['hasta']} ({paradas})")
+        return "; ".join(pasos) + f". Tiempo estimado: {ruta['minutos']} minutos."
@@ -0,0 +1,239 @@
+"""Renderiza en D-ID los clips del avatar de cada respuesta fija en cada idioma.
+
+Uso: python renderizar_clips.py [en pt fr ...] [--hilos 4] [--por-segundo 2] [--guiones guiones.json] [--simulado]
+
+Cada clip queda en videos/<idioma>/<archivo>.mp4, donde pipeline.seleccionar_clip lo
+busca: el kiosco solo reproduce clips ya hechos y nunca espera a que D-ID genere uno.
+El manifiesto (videos/manifiesto_clips.json) guarda el hash del contenido de cada clip
+(texto, voz e imagen): al volver a correr se omite lo que no cambió, se retoman los
+clips que D-ID seguía procesando y los textos repetidos se renderizan una sola vez.
+--guiones agrega otros clips (p. ej. las bienvenidas) como {"bienvenida_rutas.mp4": "texto en español"}.
+Con --simulado usa DIDSimulado y GeminiSimulado y escribe en un directorio temporal.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import toml
+
+from agente import DemoAgent, RESPUESTAS, VIDEOS_DIR
+from did import VOCES, ClienteDID, ClipFallido
+from red_metro import RedMetro
+from traducciones import CacheTraducciones, IDIOMAS
+from precalentar_traducciones import IDIOMAS_POR_DEFECTO
+
+try:
+    secrets = toml.load(".streamlit/secrets.toml")
+except Exception:
+    secrets = {}
+
+MANIFIESTO = "manifiesto_clips.json"
+LISTO, EN_PROCESO, ERROR = "listo", "en_proceso", "error"
+
+
+def hash_archivo(ruta: str) -> str:
+    with open(ruta, "rb") as archivo:
+        return hashlib.sha256(archivo.read()).hexdigest()
+
+
+def hash_contenido(texto: str, voz: str, hash_imagen: str) -> str:
+    return hashlib.sha256(json.dumps([texto, voz, hash_imagen], ensure_ascii=False).encode()).hexdigest()
+
+
+class Manifiesto:
+    """JSON con el estado de cada clip, reescrito de forma atómica tras cada cambio."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                self.datos = json.load(archivo)
+        except FileNotFoundError:
+            self.datos = {}
+        self.datos.setdefault("clips", {})
+
+    def clip(self, clave: str) -> dict:
+        with self._lock:
+            return dict(self.datos["clips"].get(clave, {}))
+
+    def listo(self, clave: str, hash_clip: str, carpeta: str) -> bool:
+        entrada = self.clip(clave)
+        return entrada.get("hash") == hash_clip and entrada.get("estado") == LISTO and os.path.exists(os.path.join(carpeta, clave))
+
+    def copia_lista(self, hash_clip: str, carpeta: str):
+        """Clave de un clip ya renderizado con el mismo contenido, o None."""
+        with self._lock:
+            claves = [c for c, e in self.datos["clips"].items() if e.get("hash") == hash_clip and e.get("estado") == LISTO]
+        return next((c for c in claves if os.path.exists(os.path.join(carpeta, c))), None)
+
+    def actualizar(self, clave: str = None, **campos):
+        with self._lock:
+            destino = self.datos["clips"].setdefault(clave, {}) if clave else self.datos
+            destino.update(campos)
+            temporal = self.ruta + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as archivo:
+                json.dump(self.datos, archivo, ensure_ascii=False, indent=2)
+            os.replace(temporal, self.ruta)
+
+
+def clips_fuente(agente, guiones: dict):
+    """(archivo, texto en español) de cada clip hablado. "otro" usa el video en reposo y no se renderiza."""
+    for intencion in RESPUESTAS:
+        resp = agente.respuesta(intencion)
+        if "idle" not in resp["video"]:
+            yield os.path.basename(resp["video"]), resp["texto"]
+    yield from guiones.items()
+
+
+def traducir(agente, cache, texto: str, idioma: str) -> str:
+    traduccion = cache.obtener(texto, idioma)
+    if traduccion is None:
+        traduccion = agente.traducir(texto, idioma)
+        cache.guardar(texto, idioma, traduccion)
+    return traduccion
+
+
+def planear(agente, cache, idiomas, guiones: dict, hash_imagen: str, hilos: int):
+    """Trabajos {clave, idioma, texto, voz, hash}; las traducciones que faltan se piden en paralelo."""
+    pares = [(idioma, archivo, texto) for idioma in idiomas for archivo, texto in clips_fuente(agente, guiones)]
+
+    def trabajo(par):
+        idioma, archivo, texto = par
+        try:
+            texto = texto if idioma == "es" else traducir(agente, cache, texto, idioma)
+        except Exception as e:
+            print(f"⚠️  [{idioma}] {archivo}: sin traducción ({e})")
+            return None
+        voz = VOCES[idioma]
+        return {"clave": f"{idioma}/{archivo}", "idioma": idioma, "texto": texto, "voz": voz, "hash": hash_contenido(texto, voz, hash_imagen)}
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return [t for t in pool.map(trabajo, pares) if t]
+
+
+def renderizar(cliente, manifiesto, carpeta: str, grupo, imagen_url: str) -> str:
+    """Deja listos todos los clips de `grupo` (mismo hash) con a lo más un render. Regresa el resultado."""
+    hash_clip = grupo[0]["hash"]
+    pendientes = [t for t in grupo if not manifiesto.listo(t["clave"], hash_clip, carpeta)]
+    if not pendientes:
+        return "omitido"
+
+    origen, resultado = manifiesto.copia_lista(hash_clip, carpeta), "copiado"
+    if origen is None:
+        primero = pendientes[0]
+        previo = manifiesto.clip(primero["clave"])
+        url = None
+        if previo.get("hash") == hash_clip and previo.get("estado") == EN_PROCESO and previo.get("id"):
+            # Corrida anterior interrumpida: se retoma el clip en lugar de pagar otro.
+            # Si vuelve a vencer el plazo el error sube y el clip sigue en proceso para la próxima corrida
+            try:
+                url = cliente.esperar_clip(previo["id"])
+            except ClipFallido as e:
+                print(f"⚠️  {primero['clave']}: no se pudo retomar {previo['id']} ({e}), se crea de nuevo")
+        if url is None:
+            id_clip = cliente.crear_clip(primero["texto"], primero["voz"], imagen_url)
+            manifiesto.actualizar(primero["clave"], hash=hash_clip, estado=EN_PROCESO, id=id_clip, texto=primero["texto"], voz=primero["voz"])
+            url = cliente.esperar_clip(id_clip)
+        cliente.descargar(url, os.path.join(carpeta, primero["clave"]))
+        manifiesto.actualizar(primero["clave"], estado=LISTO)
+        origen, pendientes, resultado = primero["clave"], pendientes[1:], "renderizado"
+
+    for t in pendientes:
+        destino = os.path.join(carpeta, t["clave"])
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        shutil.copyfile(os.path.join(carpeta, origen), destino + ".parcial")
+        os.replace(destino + ".parcial", destino)
+        manifiesto.actualizar(t["clave"], hash=hash_clip, estado=LISTO, id=manifiesto.clip(origen).get("id"), texto=t["texto"], voz=t["voz"])
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("idiomas", nargs="*", default=IDIOMAS_POR_DEFECTO, help="Códigos ISO de los idiomas destino")
+    parser.add_argument("--hilos", type=int, default=4, help="Clips en proceso a la vez")
+    parser.add_argument("--por-segundo", type=float, default=2.0, help="Llamadas a la API de D-ID por segundo")
+    parser.add_argument("--imagen", default="agente.png", help="Imagen del presentador")
+    parser.add_argument("--guiones", help="JSON {archivo.mp4: texto en español} con clips adicionales")
+    parser.add_argument("--salida", help=f"Carpeta de videos (por defecto {VIDEOS_DIR}/)")
+    parser.add_argument("--simulado", action="store_true", help="Usa los simuladores locales de D-ID y Gemini")
+    args = parser.parse_args()
+
+    desconocidos = [i for i in args.idiomas if i not in VOCES or i not in IDIOMAS]
+    if desconocidos:
+        print(f"❌ Idiomas no soportados: {', '.join(desconocidos)}. Opciones: {', '.join(VOCES)}")
+        sys.exit(1)
+    guiones = {}
+    if args.guiones:
+        with open(args.guiones, encoding="utf-8") as archivo:
+            guiones = json.load(archivo)
+
+    simuladores = ()
+    if args.simulado:
+        from simuladores import DIDSimulado, GeminiSimulado
+        simuladores = (DIDSimulado(max_por_segundo=args.por_segundo * 2).iniciar(), GeminiSimulado().iniciar())
+        # Nada simulado termina en la caché ni en los videos reales del kiosco
+        temporal = tempfile.mkdtemp(prefix="clips_")
+        carpeta = args.salida or temporal
+        cache = CacheTraducciones(ruta_db=os.path.join(temporal, "traducciones.sqlite3"))
+        agente = DemoAgent("AIzaSimulado", traducciones=cache, red=RedMetro(), base_url_llm=simuladores[1].url)
+        cliente = ClienteDID("simulado", url_api=simuladores[0].url, por_segundo=args.por_segundo)
+    else:
+        if not secrets.get("DID_API_KEY"):
+            print("❌ Error: No se encontró la DID_API_KEY en .streamlit/secrets.toml")
+            sys.exit(1)
+        carpeta = args.salida or VIDEOS_DIR
+        cache = CacheTraducciones(ruta_db=secrets.get("CACHE_DB", ".cache/kiosco.sqlite3"))
+        # Misma estación que el kiosco para que los textos de ruta coincidan con los que se muestran
+        agente = DemoAgent(secrets.get("GOOGLE_API_KEY"), traducciones=cache, red=RedMetro(), estacion_origen=secrets.get("ESTACION_KIOSCO", "Zócalo"))
+        cliente = ClienteDID(secrets["DID_API_KEY"], por_segundo=args.por_segundo)
+
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        manifiesto = Manifiesto(os.path.join(carpeta, MANIFIESTO))
+        hash_imagen = hash_archivo(args.imagen)
+        imagen = manifiesto.datos.get("imagen", {})
+        if imagen.get("hash") != hash_imagen:
+            print(f"📤 Subiendo {args.imagen} a D-ID...")
+            imagen = {"hash": hash_imagen, "url": cliente.subir_imagen(args.imagen)}
+            manifiesto.actualizar(imagen=imagen)
+
+        trabajos = planear(agente, cache, args.idiomas, guiones, hash_imagen, args.hilos)
+        grupos = {}
+        for t in trabajos:
+            grupos.setdefault(t["hash"], []).append(t)
+        print(f"🎬 {len(trabajos)} clips, {len(grupos)} distintos, {args.hilos} hilos a {args.por_segundo}/s")
+
+        def tarea(grupo):
+            try:
+                return renderizar(cliente, manifiesto, carpeta, grupo, imagen["url"])
+            except Exception as e:
+                for t in grupo:
+                    entrada = manifiesto.clip(t["clave"])
+                    if not isinstance(e, ClipFallido) and entrada.get("estado") == EN_PROCESO and entrada.get("hash") == t["hash"]:
+                        # Plazo vencido o falla de red con el clip ya encargado: se conserva su id para retomarlo
+                        manifiesto.actualizar(t["clave"], error=str(e)[:200])
+                    else:
+                        manifiesto.actualizar(t["clave"], hash=t["hash"], estado=ERROR, error=str(e)[:200])
+                print(f"❌ {grupo[0]['clave']}: {e}")
+                return "error"
+
+        conteo = {}
+        with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+            for grupo, resultado in zip(grupos.values(), pool.map(tarea, grupos.values())):
+                conteo[resultado] = conteo.get(resultado, 0) + 1
+                print(f"   {resultado:<11} {', '.join(t['clave'] for t in grupo)}")
+    finally:
+        for simulador in simuladores:
+            simulador.detener()
+
+    print(f"\n✅ {conteo} | clips en {carpeta}/<idioma>/")
+    if args.simulado:
+        print(f"   Simulador D-ID: {simuladores[0].creados} clips creados, {simuladores[0].limitados} respuestas 429")
+    sys.exit(1 if conteo.get("error") else 0)
@@ -0,0 +1,189 @@
+"""Plazos, reintentos cubiertos (hedging) e interruptor de circuito para las llamadas a servicios externos.
+
+Uso:
+    circuito = Interruptor("llm")
+    respuesta = circuito.llamar(lambda: cadena.invoke(entrada), plazo=6.0, cobertura=2.0)
+
+Si Gemini empieza a fallar o a tardar, tras `umbral_fallos` errores seguidos el
+circuito se abre y las llamadas fallan al instante con `CircuitoAbierto` (el
+agente responde con el clasificador local y el texto fijo sin traducir). Pasado
+el `enfriamiento` deja pasar una sola llamada de prueba antes de volver a cerrarse.
+Solo los errores transitorios (plazo, transporte, HTTP 429/5xx) se reintentan y cuentan
+como fallo; uno permanente (4xx, clave inválida, salida mal formada) sube de inmediato.
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FuturesTimeout
+
+import httpx
+import requests
+
+from metricas import METRICAS
+
+logger = logging.getLogger(__name__)
+
+CERRADO, ABIERTO, SEMIABIERTO = "cerrado", "abierto", "semiabierto"
+_CODIGO_ESTADO = {CERRADO: 0, SEMIABIERTO: 1, ABIERTO: 2}
+
+# Los intentos abandonados (plazo vencido o ganó la cobertura) siguen aquí hasta que su cliente HTTP los corta
+_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="resiliencia")
+
+
+class CircuitoAbierto(Exception):
+    pass
+
+
+class PlazoVencido(TimeoutError):
+    pass
+
+
+def _codigo_http(error):
+    for codigo in (getattr(error, "code", None), getattr(error, "status_code", None), getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(codigo, int) and 100 <= codigo < 600:
+            return codigo
+    return None
+
+
+def es_transitorio(error: BaseException) -> bool:
+    """True si vale la pena reintentar: plazo, falla de transporte o HTTP 429/5xx (también en la causa encadenada)."""
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        vistos.add(id(error))
+        if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError, requests.ConnectionError, requests.Timeout)):
+            return True
+        codigo = _codigo_http(error)
+        if codigo is not None:
+            return codigo == 429 or codigo >= 500
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def siguiente_con_plazo(iterador, plazo: float, al_abandonar=None):
+    """`next(iterador, None)` esperando a lo más `plazo` segundos; si vence lanza `PlazoVencido`.
+
+    El intento abandonado sigue en el pool hasta que su cliente HTTP lo corta; entonces corre `al_abandonar`.
+    """
+    futuro = _POOL.submit(next, iterador, None)
+    try:
+        return futuro.result(timeout=max(0.0, plazo))
+    except FuturesTimeout:
+        if al_abandonar is not None:
+            futuro.add_done_callback(lambda _: al_abandonar())
+        raise PlazoVencido(f"Sin respuesta en {plazo:.1f}s") from None
+
+
+def llamar_con_plazo(funcion, plazo: float, cobertura: float = None, intentos: int = 2):
+    """Resultado del primer intento exitoso de `funcion` dentro de `plazo` segundos.
+
+    Si el intento en curso no responde en `cobertura` segundos, o falla con un error
+    transitorio, se lanza otro en paralelo (hasta `intentos` en total) y gana el primero
+    que responda. Un error permanente sube de inmediato. Lanza `PlazoVencido`, o el
+    último error si todos los intentos fallaron antes del plazo.
+    """
+    limite = time.monotonic() + plazo
+    pendientes = {_POOL.submit(funcion)}
+    lanzados, ultimo_error = 1, None
+    while pendientes:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        espera = min(restante, cobertura) if cobertura and lanzados < intentos else restante
+        listos, pendientes = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            try:
+                return futuro.result()
+            except Exception as e:
+                if not es_transitorio(e):
+                    # Repetirlo daría lo mismo; los intentos en curso se abandonan
+                    raise
+                ultimo_error = e
+        if lanzados < intentos and (listos or cobertura) and time.monotonic() < limite:
+            # Reintento tras un error, o cobertura porque el intento en curso va lento
+            METRICAS.contar("reintento_cubierto" if not listos else "reintento_tras_error")
+            pendientes.add(_POOL.submit(funcion))
+            lanzados += 1
+    if ultimo_error is not None and not pendientes:
+        raise ultimo_error
+    raise PlazoVencido(f"Sin respuesta en {plazo}s ({lanzados} intento(s))")
+
+
+class Interruptor:
+    """Interruptor de circuito compartido por todas las sesiones del proceso."""
+
+    def __init__(self, nombre: str, umbral_fallos: int = 5, enfriamiento: float = 30.0):
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+        self.estado = CERRADO
+        self._fallos_seguidos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+        self.exitos = self.fallos = self.rechazadas = 0
+
+    def _cambiar(self, estado: str):
+        if estado != self.estado:
+            logger.warning(f"Circuito '{self.nombre}': {self.estado} -> {estado}")
+            METRICAS.contar(f"circuito_{self.nombre}_{estado}")
+            self.estado = estado
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.estado == ABIERTO and time.monotonic() - self._abierto_desde >= self.enfriamiento:
+                self._cambiar(SEMIABIERTO)
+            if self.estado == CERRADO:
+                return True
+            if self.estado == SEMIABIERTO and not self._prueba_en_curso:
+                # Una sola llamada de prueba; las demás siguen con el respaldo
+                self._prueba_en_curso = True
+                return True
+            self.rechazadas += 1
+            return False
+
+    def exito(self):
+        with self._lock:
+            self.exitos += 1
+            self._fallos_seguidos = 0
+            self._prueba_en_curso = False
+            self._cambiar(CERRADO)
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            self._fallos_seguidos += 1
+            self._prueba_en_curso = False
+            if self.estado == SEMIABIERTO or self._fallos_seguidos >= self.umbral_fallos:
+                self._abierto_desde = time.monotonic()
+                self._cambiar(ABIERTO)
+
+    def liberar(self):
+        """La llamada terminó con un error permanente: el servicio respondió, así que no cuenta como
+        fallo ni como éxito; solo se suelta la llamada de prueba si lo era."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def registrar_error(self, error: BaseException):
+        if es_transitorio(error):
+            self.fallo()
+        else:
+            self.liberar()
+
+    def llamar(self, funcion, plazo: float, cobertura: float = None, intentos: int = 2):
+        """`llamar_con_plazo` detrás del interruptor. Lanza `CircuitoAbierto` sin llamar si está abierto."""
+        if not self.permitir():
+            raise CircuitoAbierto(f"Circuito '{self.nombre}' abierto")
+        try:
+            resultado = llamar_con_plazo(funcion, plazo, cobertura, intentos)
+        except Exception as e:
+            self.registrar_error(e)
+            raise
+        self.exito()
+        return resultado
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "estado": _CODIGO_ESTADO[self.estado], "fallos_seguidos": self._fallos_seguidos,
+                "exitos": self.exitos, "fallos": self.fallos, "rechazadas": self.rechazadas,
+            }
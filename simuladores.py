@@ -0,0 +1,329 @@
+"""Servidores locales que imitan las APIs externas del kiosco, para probar sin red.
+
+Cada simulador escucha en 127.0.0.1 (puerto libre por defecto), acepta una
+latencia inyectada en segundos y se usa apuntando el cliente real a `url`.
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from clasificador import normalizar
+from red_metro import RedMetro, nombre_linea
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def _atender(self, metodo):
+        partes = urllib.parse.urlparse(self.path)
+        largo = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(largo) if largo else b""
+        simulador = self.server.simulador
+        if simulador.latencia:
+            time.sleep(simulador.latencia)
+        with simulador._lock:
+            simulador.peticiones += 1
+        estado, tipo, datos = simulador.atender(metodo, partes.path, urllib.parse.parse_qs(partes.query), cuerpo, self.headers)
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        if isinstance(datos, bytes):
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+            return
+        # Respuesta en flujo (iterable de bytes): sin Content-Length, termina al cerrar la conexión
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for bloque in datos:
+                self.wfile.write(bloque)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente se desconectó a medio flujo
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorSimulado:
+    def __init__(self, latencia: float = 0.0, puerto: int = 0):
+        self.latencia = latencia
+        self.peticiones = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), _Manejador)
+        self._httpd.daemon_threads = True
+        self._httpd.simulador = self
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def iniciar(self):
+        threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def detener(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    @staticmethod
+    def _json(datos, estado: int = 200):
+        return estado, "application/json", json.dumps(datos, ensure_ascii=False).encode()
+
+    def atender(self, metodo, ruta, query, cuerpo, encabezados):
+        """(estado, content-type, cuerpo). El cuerpo puede ser un iterable de bytes para responder en flujo."""
+        return self._json({"error": "no encontrado"}, 404)
+
+
+# --- GOOGLE DIRECTIONS ---
+class DireccionesSimuladas(ServidorSimulado):
+    """`/maps/api/directions/json` con rutas reales calculadas por RedMetro.
+
+    Uso: `googlemaps.Client(key="AIzaSimulado", base_url=simulador.url)`.
+    """
+
+    def __init__(self, latencia: float = 0.0, puerto: int = 0, red: RedMetro = None):
+        super().__init__(latencia, puerto)
+        self.red = red or RedMetro()
+        self._nombres = sorted(((normalizar(e), e) for e in self.red.estaciones), key=lambda par: -len(par[0]))
+
+    def _estacion(self, texto: str):
+        """'Metro Zócalo, CDMX' o 'Restaurante Balcón del Zócalo, ...' -> 'Zócalo' (la coincidencia más larga)."""
+        normal = f" {normalizar(texto)} "
+        return next((nombre for clave, nombre in self._nombres if f" {clave} " in normal), None)
+
+    def atender(self, metodo, ruta, query, cuerpo, encabezados):
+        if ruta != "/maps/api/directions/json":
+            return super().atender(metodo, ruta, query, cuerpo, encabezados)
+        origen, destino = self._estacion(query["origin"][0]), self._estacion(query["destination"][0])
+        ruta_metro = self.red.ruta(origen, destino) if origen and destino else None
+        if ruta_metro is None:
+            return self._json({"status": "ZERO_RESULTS", "routes": []})
+
+        pasos = []
+        for tramo in ruta_metro["tramos"]:
+            minutos = tramo["paradas"] * (2.5 if tramo["linea"] == "TL" else 2.0)
+            pasos.append({
+                "travel_mode": "TRANSIT",
+                "html_instructions": f"Metro hacia {tramo['direccion']}",
+                "duration": {"value": int(minutos * 60), "text": f"{round(minutos)} min"},
+                "transit_details": {
+                    "line": {"short_name": nombre_linea(tramo["linea"]), "vehicle": {"name": "Metro", "type": "SUBWAY"}},
+                    "departure_stop": {"name": tramo["desde"]}, "arrival_stop": {"name": tramo["hasta"]},
+                    "num_stops": tramo["paradas"], "headsign": tramo["direccion"],
+                },
+            })
+        leg = {"duration": {"value": ruta_metro["minutos"] * 60}, "steps": pasos,
+               "start_address": origen, "end_address": destino}
+        return self._json({"status": "OK", "routes": [{"legs": [leg]}]})
+
+
+# --- GEMINI ---
+class GeminiSimulado(ServidorSimulado):
+    """`/v1beta/models/<modelo>:generateContent` con respuestas deterministas según el prompt.
+
+    Uso: `ChatGoogleGenerativeAI(..., base_url=simulador.url)`. Clasifica con el índice de
+    palabras clave local, "traduce" anteponiendo `[<idioma>]` y responde JSON cuando el
+    cliente pide salida estructurada. `:streamGenerateContent` manda una palabra por
+    evento SSE cada `latencia_token` segundos, después de la latencia inicial.
+    """
+
+    def __init__(self, latencia: float = 0.0, puerto: int = 0, latencia_token: float = 0.02):
+        super().__init__(latencia, puerto)
+        self.latencia_token = latencia_token
+        from clasificador import ClasificadorLocal
+        from traducciones import detectar_idioma
+        self._clasificador = ClasificadorLocal(umbral=0.0)
+        self._detectar_idioma = detectar_idioma
+
+    def _intencion(self, query: str) -> str:
+        intencion, _ = self._clasificador.clasificar(query)
+        return intencion or "otro"
+
+    def _responder_prompt(self, prompt: str, estructurado: bool) -> str:
+        citas = re.findall(r"'(.*?)'", prompt, flags=re.S)
+        query = citas[0] if citas else prompt
+        if estructurado:
+            idioma = self._detectar_idioma(query) or "es"
+            return json.dumps({"intencion": self._intencion(query), "idioma": idioma, "texto": f"[{idioma}] respuesta simulada"})
+        if prompt.startswith("Clasifica"):
+            return self._intencion(query)
+        if prompt.startswith("Traduce"):
+            return f"[traducido] {query}"
+        return "respuesta simulada"
+
+    def atender(self, metodo, ruta, query, cuerpo, encabezados):
+        if not ruta.endswith((":generateContent", ":streamGenerateContent")):
+            return super().atender(metodo, ruta, query, cuerpo, encabezados)
+        peticion = json.loads(cuerpo or b"{}")
+        prompt = peticion["contents"][-1]["parts"][0]["text"]
+        estructurado = peticion.get("generationConfig", {}).get("responseMimeType") == "application/json"
+        texto = self._responder_prompt(prompt, estructurado)
+        if ruta.endswith(":streamGenerateContent"):
+            return 200, "text/event-stream", self._eventos(re.findall(r"\S+\s*", texto) or [""])
+        return self._json({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": texto}]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt.split()), "candidatesTokenCount": len(texto.split()), "totalTokenCount": len(prompt.split()) + len(texto.split())},
+        })
+
+    def _eventos(self, fragmentos):
+        for i, fragmento in enumerate(fragmentos):
+            if i:
+                time.sleep(self.latencia_token)
+            candidato = {"content": {"role": "model", "parts": [{"text": fragmento}]}, "index": 0}
+            if i == len(fragmentos) - 1:
+                candidato["finishReason"] = "STOP"
+            yield f"data: {json.dumps({'candidates': [candidato]}, ensure_ascii=False)}\r\n\r\n".encode()
+
+
+# --- GOOGLE SPEECH (API v2 que usa recognize_google) ---
+class VozSimulada(ServidorSimulado):
+    """`/speech-api/v2/recognize`: regresa una de `frases` elegida por el hash del audio.
+
+    Uso: `recognizer.recognize_google(audio, endpoint=f"{simulador.url}/speech-api/v2/recognize")`.
+    """
+
+    FRASES = (
+        "¿Cómo llego al Estadio Azteca?", "¿Cuándo es el partido de México contra Sudáfrica?",
+        "Tengo hambre, ¿dónde puedo comer?", "Me robaron la cartera", "¿Dónde queda el baño?",
+    )
+
+    def __init__(self, latencia: float = 0.0, puerto: int = 0, frases=None):
+        super().__init__(latencia, puerto)
+        self.frases = tuple(frases or self.FRASES)
+
+    def atender(self, metodo, ruta, query, cuerpo, encabezados):
+        if ruta != "/speech-api/v2/recognize":
+            return super().atender(metodo, ruta, query, cuerpo, encabezados)
+        if not cuerpo:
+            return 200, "application/json", b'{"result":[]}\n'
+        frase = self.frases[int(hashlib.sha1(cuerpo).hexdigest(), 16) % len(self.frases)]
+        resultado = {"result": [{"alternative": [{"transcript": frase, "confidence": 0.92}], "final": True}], "result_index": 0}
+        return 200, "application/json", b'{"result":[]}\n' + json.dumps(resultado, ensure_ascii=False).encode() + b"\n"
+
+
+# --- D-ID ---
+class DIDSimulado(ServidorSimulado):
+    """`/images` y `/talks` de D-ID: cada clip queda listo `latencia_render` segundos después de crearse.
+
+    Uso: `ClienteDID(clave, url_api=simulador.url)`. Con `max_por_segundo` responde 429 a las
+    llamadas que excedan esa tasa, como la API real. El "mp4" resultante es un encabezado
+    ftyp seguido del texto y la voz, para poder verificar qué se renderizó.
+    """
+
+    def __init__(self, latencia: float = 0.0, puerto: int = 0, latencia_render: float = 0.5, max_por_segundo: float = None):
+        super().__init__(latencia, puerto)
+        self.latencia_render = latencia_render
+        self.max_por_segundo = max_por_segundo
+        self.clips = {}
+        self.creados = self.limitados = 0
+        self._llamadas = []
+
+    def _excede_tasa(self) -> bool:
+        if not self.max_por_segundo:
+            return False
+        with self._lock:
+            ahora = time.monotonic()
+            self._llamadas = [t for t in self._llamadas if ahora - t < 1.0]
+            if len(self._llamadas) >= self.max_por_segundo:
+                self.limitados += 1
+                return True
+            self._llamadas.append(ahora)
+            return False
+
+    def atender(self, metodo, ruta, query, cuerpo, encabezados):
+        if ruta.startswith("/resultados/"):
+            clip = self.clips.get(ruta[len("/resultados/"):-len(".mp4")])
+            if clip is None:
+                return super().atender(metodo, ruta, query, cuerpo, encabezados)
+            return 200, "video/mp4", b"\x00\x00\x00\x18ftypmp42" + f"{clip['voz']}|{clip['texto']}".encode()
+        if not (encabezados.get("Authorization") or "").startswith("Basic "):
+            return self._json({"kind": "AuthorizationError", "description": "Unauthorized"}, 401)
+        if self._excede_tasa():
+            return 429, "application/json", b'{"kind": "TooManyRequestsError"}'
+
+        if metodo == "POST" and ruta == "/images":
+            id_imagen = f"img_{hashlib.sha1(cuerpo).hexdigest()[:12]}"
+            return self._json({"id": id_imagen, "url": f"s3://d-id-images-simulado/{id_imagen}.png"}, 201)
+        if metodo == "POST" and ruta == "/talks":
+            peticion = json.loads(cuerpo or b"{}")
+            with self._lock:
+                self.creados += 1
+                id_clip = f"tlk_{self.creados:06d}"
+                self.clips[id_clip] = {
+                    "creado": time.monotonic(), "texto": peticion["script"]["input"],
+                    "voz": peticion["script"]["provider"]["voice_id"],
+                }
+            return self._json({"id": id_clip, "status": "created"}, 201)
+        if metodo == "GET" and ruta.startswith("/talks/"):
+            id_clip = ruta[len("/talks/"):]
+            clip = self.clips.get(id_clip)
+            if clip is None:
+                return self._json({"kind": "NotFoundError"}, 404)
+            if time.monotonic() - clip["creado"] < self.latencia_render:
+                return self._json({"id": id_clip, "status": "started"})
+            return self._json({"id": id_clip, "status": "done", "result_url": f"{self.url}/resultados/{id_clip}.mp4"})
+        return super().atender(metodo, ruta, query, cuerpo, encabezados)
+
+
+# --- AFLUENCIA ---
+class AfluenciaSimulada(ServidorSimulado):
+    """`/afluencia`: flujo de líneas JSON con la ocupación de cada estación cada `cada` segundos.
+
+    Uso: `FuenteFlujo(f"{simulador.url}/afluencia")`. La ocupación sigue las horas pico
+    (8:00 y 19:00) con ruido; las estaciones en `saturadas` se mantienen arriba del 85%.
+    """
+
+    def __init__(self, latencia: float = 0.0, puerto: int = 0, estaciones=None, cada: float = 1.0, saturadas=(), semilla: int = 0):
+        super().__init__(latencia, puerto)
+        from afluencia import AlmacenAfluencia
+        self.estaciones = list(estaciones or AlmacenAfluencia().estaciones)
+        self.cada = cada
+        self.saturadas = set(saturadas)
+        self._azar = random.Random(semilla)
+        self._base = {e: self._azar.uniform(-15, 15) for e in self.estaciones}
+        self._detenido = threading.Event()
+
+    def lecturas(self, ahora: float = None):
+        """Una línea JSON (bytes) por estación con la ocupación simulada en `ahora`."""
+        ahora = time.time() if ahora is None else ahora
+        hora = time.localtime(ahora).tm_hour + time.localtime(ahora).tm_min / 60
+        pico = 70 * max(0.0, 1 - abs(hora - 8) / 2.5) + 60 * max(0.0, 1 - abs(hora - 19) / 3)
+        for estacion in self.estaciones:
+            with self._lock:
+                ruido = self._azar.gauss(0, 5)
+            if estacion in self.saturadas:
+                ocupacion = 85 + abs(ruido)
+            else:
+                ocupacion = 20 + pico + self._base[estacion] + ruido
+            yield (json.dumps({"estacion": estacion, "ocupacion": round(min(max(ocupacion, 0), 100), 1), "ts": ahora}, ensure_ascii=False) + "\n").encode()
+
+    def _flujo(self):
+        while not self._detenido.is_set():
+            yield b"".join(self.lecturas())
+            self._detenido.wait(self.cada)
+
+    def atender(self, metodo, ruta, query, cuerpo, encabezados):
+        if ruta != "/afluencia":
+            return super().atender(metodo, ruta, query, cuerpo, encabezados)
+        return 200, "application/x-ndjson", self._flujo()
+
+    def detener(self):
+        self._detenido.set()
+        super().detener()
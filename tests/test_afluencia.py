@@ -0,0 +1,119 @@
+"""Anillos de AlmacenAfluencia, FuenteArchivo y el monitor contra AfluenciaSimulada."""
+import sys
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from afluencia import ALTA, AGIL, MEDIA, SIN_DATOS, AlmacenAfluencia, FuenteArchivo, FuenteFlujo, MonitorAfluencia
+from simuladores import AfluenciaSimulada
+
+AHORA = 1_000_000.0
+
+
+@pytest.fixture
+def almacen():
+    return AlmacenAfluencia(estaciones=["Zócalo", "Pino Suárez", "Tasqueña"], capacidad=4, ventana=60)
+
+
+def test_lote_mas_grande_que_el_anillo_conserva_las_ultimas(almacen):
+    almacen.registrar([("Zócalo", float(v), AHORA + v) for v in range(10)])
+    almacen.recalcular(AHORA + 10)
+    zocalo = almacen.consultar("Zócalo")
+    # Solo quedan 6, 7, 8 y 9
+    assert zocalo["ocupacion"] == 7.5
+    assert zocalo["maximo"] == 9.0
+    assert zocalo["ultima"] == 9.0
+    assert zocalo["lecturas"] == 4
+
+
+def test_el_anillo_da_la_vuelta_entre_lotes(almacen):
+    almacen.registrar([("Zócalo", v, AHORA) for v in (10.0, 20.0, 30.0)])
+    almacen.registrar([("Zócalo", v, AHORA) for v in (40.0, 50.0, 60.0)])
+    almacen.recalcular(AHORA)
+    zocalo = almacen.consultar("Zócalo")
+    assert zocalo["ocupacion"] == 45.0  # 30, 40, 50, 60
+    assert zocalo["ultima"] == 60.0
+    almacen.registrar([("Zócalo", 90.0, AHORA)])
+    almacen.recalcular(AHORA)
+    assert almacen.consultar("Zócalo")["ocupacion"] == 60.0  # 40, 50, 60, 90
+
+
+def test_lote_intercalado_respeta_el_orden_por_estacion(almacen):
+    almacen.registrar([
+        ("Zócalo", 10.0, AHORA), ("Tasqueña", 80.0, AHORA), ("Zócalo", 20.0, AHORA),
+        ("Tasqueña", 90.0, AHORA), ("Zocalo", 30.0, AHORA),
+    ])
+    almacen.recalcular(AHORA)
+    assert almacen.consultar("zócalo")["ultima"] == 30.0
+    assert almacen.consultar("Tasqueña")["ultima"] == 90.0
+    assert almacen.consultar("Tasqueña")["nivel"] == ALTA
+    assert almacen.consultar("Zócalo")["nivel"] == AGIL
+    assert almacen.consultar("Pino Suárez")["nivel"] == SIN_DATOS
+
+
+def test_estaciones_desconocidas_se_descartan(almacen):
+    almacen.registrar([("Atlantis", 50.0, AHORA), ("Zócalo", 50.0, AHORA)])
+    almacen.registrar([("Narnia", 50.0, AHORA)])
+    almacen.recalcular(AHORA)
+    assert almacen.consultar("Atlantis") is None
+    estadisticas = almacen.estadisticas()
+    assert estadisticas["lecturas"] == 1
+    assert estadisticas["descartadas"] == 2
+    assert estadisticas["estaciones_con_datos"] == 1
+
+
+def test_lecturas_fuera_de_la_ventana_no_cuentan(almacen):
+    almacen.registrar([("Zócalo", 95.0, AHORA - 120), ("Zócalo", 50.0, AHORA)])
+    almacen.recalcular(AHORA)
+    zocalo = almacen.consultar("Zócalo")
+    assert zocalo["ocupacion"] == 50.0 and zocalo["nivel"] == MEDIA
+    almacen.recalcular(AHORA + 120)
+    assert almacen.consultar("Zócalo")["nivel"] == SIN_DATOS
+
+
+def test_fuente_archivo_sigue_el_archivo(tmp_path, almacen):
+    ruta = tmp_path / "afluencia.jsonl"
+    fuente = FuenteArchivo(str(ruta))
+    assert fuente.leer() == []
+    linea = json.dumps({"estacion": "Zócalo", "ocupacion": 82.5, "ts": AHORA})
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(linea + "\n" + linea[:10])
+    assert fuente.leer() == [("Zócalo", 82.5, AHORA)]
+    # La línea a medias se completa en la siguiente lectura; las mal formadas se ignoran
+    with open(ruta, "a", encoding="utf-8") as archivo:
+        archivo.write(linea[10:] + "\nno es json\n")
+    assert fuente.leer() == [("Zócalo", 82.5, AHORA)]
+    # Archivo truncado (rotación): se empieza de nuevo
+    ruta.write_text(json.dumps({"estacion": "Tasqueña", "ocupacion": 10}) + "\n", encoding="utf-8")
+    assert [l[:2] for l in fuente.leer()] == [("Tasqueña", 10.0)]
+
+    monitor = MonitorAfluencia(almacen, fuente)
+    with open(ruta, "a", encoding="utf-8") as archivo:
+        archivo.write(json.dumps({"estacion": "Pino Suárez", "ocupacion": 45, "ts": time.time()}) + "\n")
+    monitor.actualizar()
+    assert monitor.consultar("Pino Suárez")["nivel"] == MEDIA
+
+
+def test_monitor_con_el_flujo_simulado():
+    simulador = AfluenciaSimulada(estaciones=["Zócalo", "Pino Suárez", "Tasqueña"], cada=0.05, saturadas=["Zócalo"]).iniciar()
+    almacen = AlmacenAfluencia(estaciones=["Zócalo", "Pino Suárez"], capacidad=8)
+    monitor = MonitorAfluencia(almacen, FuenteFlujo(f"{simulador.url}/afluencia"), intervalo=0.05).iniciar()
+    try:
+        limite = time.monotonic() + 5
+        while almacen.estadisticas()["lecturas"] < 20:
+            assert time.monotonic() < limite, "el monitor no recibió lecturas"
+            time.sleep(0.05)
+        monitor.actualizar()
+        zocalo = monitor.consultar("Zócalo")
+        assert zocalo["nivel"] == ALTA and zocalo["ocupacion"] >= 85
+        assert zocalo["lecturas"] == 8
+        # Tasqueña no está en el almacén: sus lecturas se cuentan como descartadas
+        assert almacen.estadisticas()["descartadas"] > 0
+        assert almacen.estadisticas()["estaciones_alta"] == 1
+    finally:
+        monitor.detener()
+        simulador.detener()
@@ -0,0 +1,52 @@
+"""Clasificador local: consultas obvias resueltas sin LLM y ambiguas derivadas al LLM."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clasificador import ClasificadorLocal, normalizar
+
+
+@pytest.fixture
+def clasificador():
+    return ClasificadorLocal(umbral=0.7)
+
+
+def test_normalizar():
+    assert normalizar("¿Cómo llego al Estadio?") == "como llego al estadio"
+
+
+@pytest.mark.parametrize("query, intencion", [
+    ("¿Cómo llego al Estadio Azteca?", "azteca"),
+    ("Quiero ir al estadio Banorte", "azteca"),
+    ("Tengo hambre, ¿dónde comer?", "restaurante"),
+    ("Me robaron la cartera", "perdido"),
+    ("¿Cuándo es el partido inaugural contra Sudáfrica?", "sudafrica"),
+])
+def test_consultas_obvias_se_resuelven_local(clasificador, query, intencion):
+    assert clasificador.clasificar(query)[0] == intencion
+
+
+@pytest.mark.parametrize("query", [
+    "Quiero ir a Ciudad Azteca",
+    "¿Cómo llego a la estación Ciudad Azteca de la Línea B?",
+    "¿Qué hora es?",
+])
+def test_consultas_ambiguas_van_al_llm(clasificador, query):
+    intencion, confianza = clasificador.clasificar(query)
+    assert intencion is None
+    assert confianza < clasificador.umbral
+
+
+def test_ciudad_azteca_no_cae_en_el_estadio_sin_llm(clasificador):
+    # El respaldo local (Gemini caído) toma la mejor intención aunque no llegue al umbral
+    puntajes = clasificador.puntuar("Quiero ir a Ciudad Azteca")
+    assert max(puntajes, key=puntajes.get) == "otro"
+
+
+def test_estadisticas(clasificador):
+    clasificador.clasificar("Tengo hambre")
+    clasificador.clasificar("¿Qué hora es?")
+    assert clasificador.estadisticas() == {"resueltas_local": 1, "derivadas_llm": 1, "tasa_local": 0.5}
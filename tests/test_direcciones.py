@@ -0,0 +1,88 @@
+"""CacheDirecciones contra el simulador local de Google Directions (sin red ni clave real)."""
+import sys
+import time
+from pathlib import Path
+
+import googlemaps
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agente import DemoAgent
+from direcciones import CacheDirecciones, texto_indicaciones
+from red_metro import RedMetro
+from simuladores import DireccionesSimuladas
+
+ORIGEN = "Metro Zócalo, CDMX"
+
+
+@pytest.fixture(scope="module")
+def simulador():
+    simulador = DireccionesSimuladas().iniciar()
+    yield simulador
+    simulador.detener()
+
+
+@pytest.fixture
+def direcciones(simulador, tmp_path):
+    gmaps = googlemaps.Client(key="AIzaSimulado", base_url=simulador.url)
+    return CacheDirecciones(gmaps, ruta_db=str(tmp_path / "kiosco.sqlite3"))
+
+
+def esperar(condicion, plazo=5.0):
+    limite = time.monotonic() + plazo
+    while not condicion():
+        assert time.monotonic() < limite, "plazo vencido"
+        time.sleep(0.01)
+
+
+def test_consultar_guarda_y_no_repite_la_llamada(direcciones):
+    resumen = direcciones.consultar(ORIGEN, "Estadio Azteca")
+    assert resumen["pasos"][0]["desde"] == "Zócalo"
+    assert "Estadio Azteca" in texto_indicaciones(resumen)
+    assert direcciones.consultar(ORIGEN, "Estadio Azteca") == resumen
+    assert direcciones.consultas_api == 1
+
+
+def test_obtener_solo_lee_cache_y_agenda_la_consulta(direcciones):
+    assert direcciones.obtener(ORIGEN, "Estadio Azteca") is None
+    esperar(lambda: direcciones.obtener(ORIGEN, "Estadio Azteca") is not None)
+    assert direcciones.consultas_api == 1
+    assert direcciones.estadisticas()["fallos"] >= 1
+
+
+def test_franjas_distintas_son_claves_distintas(direcciones):
+    ahora = time.time()
+    direcciones.consultar(ORIGEN, "Estadio Azteca", ahora)
+    assert direcciones.obtener(ORIGEN, "Estadio Azteca", ahora) is not None
+    direcciones.precalentar(ORIGEN, ["Estadio Azteca"], ahora + direcciones.minutos_franja * 60)
+    esperar(lambda: direcciones.consultas_api == 2)
+
+
+def test_purgar_borra_las_rutas_vencidas(simulador, tmp_path):
+    gmaps = googlemaps.Client(key="AIzaSimulado", base_url=simulador.url)
+    direcciones = CacheDirecciones(gmaps, ruta_db=str(tmp_path / "kiosco.sqlite3"), ttl=0.05)
+    direcciones.consultar(ORIGEN, "Estadio Azteca")
+    time.sleep(0.1)
+    assert direcciones._almacen.purgar() == 1
+    assert direcciones._almacen.purgar() == 0
+
+
+def test_mantener_caliente_llena_la_franja_actual(direcciones):
+    direcciones.mantener_caliente(ORIGEN, ["Estadio Azteca", "Estadio Azteca"], intervalo=3600)
+    esperar(lambda: direcciones.obtener(ORIGEN, "Estadio Azteca") is not None)
+
+
+def test_texto_a_traducir_no_depende_de_google(direcciones):
+    """La fuente de las traducciones es la misma con o sin la ruta de Google en caché."""
+    sin_google = DemoAgent("AIzaSimulado", red=RedMetro()).respuesta("azteca")
+    agente = DemoAgent("AIzaSimulado", red=RedMetro(), direcciones=direcciones)
+    direcciones.consultar(agente.origen_mapas, "Estadio Azteca")
+    resp = agente.respuesta("azteca")
+    assert resp["texto"] == sin_google["texto"]
+    assert resp["texto_vivo"] != resp["texto"]
+    assert texto_indicaciones(resp["direcciones"]) in resp["texto_vivo"]
+    assert DemoAgent.texto_con_prefijo(resp, "¡Ojo! ") == "¡Ojo! " + resp["texto"]
+    assert DemoAgent.texto_con_prefijo(resp, "¡Ojo! ", vivo=True) == "¡Ojo! " + resp["texto_vivo"]
+    assert "texto_vivo" not in sin_google
+    assert DemoAgent.texto_con_prefijo(sin_google, "", vivo=True) == sin_google["texto"]
@@ -0,0 +1,86 @@
+"""Manifiesto de renderizar_clips.py contra DIDSimulado: clips retomados y contenido repetido sin volver a pagar."""
+import sys
+import os
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from did import ClienteDID, ErrorDID
+from renderizar_clips import EN_PROCESO, LISTO, Manifiesto, hash_contenido, renderizar
+from simuladores import DIDSimulado
+
+IMAGEN = "s3://d-id-images-simulado/img_prueba.png"
+
+
+class ClienteConPlazo(ClienteDID):
+    """ClienteDID que espera cada clip a lo más `plazo` segundos (renderizar usa el plazo por defecto)."""
+
+    def __init__(self, *args, plazo: float, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.plazo = plazo
+
+    def esperar_clip(self, id_clip: str, cada: float = 0.02, plazo: float = None) -> str:
+        return super().esperar_clip(id_clip, cada, self.plazo)
+
+
+def trabajo(clave: str, texto: str = "Hola, bienvenido al Metro", voz: str = "es-MX-JorgeNeural") -> dict:
+    return {"clave": clave, "idioma": clave.split("/")[0], "texto": texto, "voz": voz, "hash": hash_contenido(texto, voz, "imagen")}
+
+
+@pytest.fixture
+def simulador():
+    simulador = DIDSimulado(latencia_render=0.3).iniciar()
+    yield simulador
+    simulador.detener()
+
+
+def cliente(simulador, plazo: float) -> ClienteConPlazo:
+    return ClienteConPlazo("simulado", url_api=simulador.url, por_segundo=100, plazo=plazo)
+
+
+def test_clip_con_plazo_vencido_se_retoma_sin_crear_otro(simulador, tmp_path):
+    ruta = str(tmp_path / "manifiesto.json")
+    grupo = [trabajo("es/resp.mp4")]
+    with pytest.raises(ErrorDID):
+        renderizar(cliente(simulador, plazo=0.05), Manifiesto(ruta), str(tmp_path), grupo, IMAGEN)
+    entrada = Manifiesto(ruta).clip("es/resp.mp4")
+    assert entrada["estado"] == EN_PROCESO and entrada["id"] == "tlk_000001"
+    assert simulador.creados == 1
+
+    # Otra corrida (proceso nuevo): retoma el mismo id con el manifiesto leído del disco
+    assert renderizar(cliente(simulador, plazo=5.0), Manifiesto(ruta), str(tmp_path), grupo, IMAGEN) == "renderizado"
+    assert simulador.creados == 1
+    assert Manifiesto(ruta).clip("es/resp.mp4")["estado"] == LISTO
+    assert (tmp_path / "es" / "resp.mp4").read_bytes().endswith("es-MX-JorgeNeural|Hola, bienvenido al Metro".encode())
+
+
+def test_clip_que_d_id_ya_no_conoce_se_crea_de_nuevo(simulador, tmp_path):
+    ruta = str(tmp_path / "manifiesto.json")
+    grupo = [trabajo("es/resp.mp4")]
+    Manifiesto(ruta).actualizar("es/resp.mp4", hash=grupo[0]["hash"], estado=EN_PROCESO, id="tlk_perdido")
+    assert renderizar(cliente(simulador, plazo=5.0), Manifiesto(ruta), str(tmp_path), grupo, IMAGEN) == "renderizado"
+    assert simulador.creados == 1
+    assert Manifiesto(ruta).clip("es/resp.mp4")["id"] == "tlk_000001"
+
+
+def test_mismo_contenido_no_se_vuelve_a_pagar(simulador, tmp_path):
+    ruta = str(tmp_path / "manifiesto.json")
+    # Dos claves con el mismo texto, voz e imagen: un solo render y una copia
+    grupo = [trabajo("es/resp.mp4"), trabajo("es/resp_copia.mp4")]
+    assert renderizar(cliente(simulador, plazo=5.0), Manifiesto(ruta), str(tmp_path), grupo, IMAGEN) == "renderizado"
+    assert simulador.creados == 1
+    assert (tmp_path / "es" / "resp_copia.mp4").read_bytes() == (tmp_path / "es" / "resp.mp4").read_bytes()
+
+    # Volver a correr con el mismo hash no hace ninguna petición de render
+    assert renderizar(cliente(simulador, plazo=5.0), Manifiesto(ruta), str(tmp_path), grupo, IMAGEN) == "omitido"
+    # Una clave nueva con un hash ya renderizado se copia del clip existente
+    assert renderizar(cliente(simulador, plazo=5.0), Manifiesto(ruta), str(tmp_path), [trabajo("es/otra.mp4")], IMAGEN) == "copiado"
+    assert simulador.creados == 1
+
+    # Si el contenido cambia, sí se renderiza de nuevo
+    cambiado = [trabajo("es/resp.mp4", texto="Hola de nuevo")]
+    assert renderizar(cliente(simulador, plazo=5.0), Manifiesto(ruta), str(tmp_path), cambiado, IMAGEN) == "renderizado"
+    assert simulador.creados == 2
+    assert os.path.exists(tmp_path / "es" / "resp.mp4")
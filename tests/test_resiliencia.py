@@ -0,0 +1,201 @@
+"""Plazos, cobertura, reintentos e interruptor de circuito con funciones lentas o que fallan."""
+import sys
+import time
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agente import DemoAgent
+from resiliencia import ABIERTO, CERRADO, SEMIABIERTO, CircuitoAbierto, Interruptor, PlazoVencido, es_transitorio, llamar_con_plazo
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, codigo):
+        super().__init__(f"HTTP {codigo}")
+        self.code = codigo
+
+
+class Guion:
+    """Función que en la llamada k hace `pasos[k]`: un número duerme y regresa k, una excepción se lanza."""
+
+    def __init__(self, *pasos):
+        self.pasos = pasos
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            k = self.llamadas
+            self.llamadas += 1
+        paso = self.pasos[min(k, len(self.pasos) - 1)]
+        if isinstance(paso, BaseException):
+            raise paso
+        time.sleep(paso)
+        return k
+
+
+def cronometrar(funcion, *args, **kwargs):
+    inicio = time.monotonic()
+    try:
+        return funcion(*args, **kwargs), time.monotonic() - inicio
+    except Exception as e:
+        return e, time.monotonic() - inicio
+
+
+def test_errores_transitorios_y_permanentes():
+    assert es_transitorio(PlazoVencido()) and es_transitorio(ConnectionRefusedError())
+    assert es_transitorio(ErrorHTTP(429)) and es_transitorio(ErrorHTTP(503))
+    assert not es_transitorio(ErrorHTTP(400)) and not es_transitorio(ValueError("json"))
+    try:
+        try:
+            raise ConnectionResetError()
+        except ConnectionResetError as e:
+            raise RuntimeError("envoltura") from e
+    except RuntimeError as envuelto:
+        assert es_transitorio(envuelto)
+
+
+def test_plazo_vencido_sin_esperar_al_intento_lento():
+    lenta = Guion(2.0)
+    error, segundos = cronometrar(llamar_con_plazo, lenta, plazo=0.2, cobertura=None)
+    assert isinstance(error, PlazoVencido)
+    assert segundos < 0.5
+    assert lenta.llamadas == 1
+
+
+def test_cobertura_gana_el_segundo_intento():
+    funcion = Guion(2.0, 0.0)
+    resultado, segundos = cronometrar(llamar_con_plazo, funcion, plazo=1.0, cobertura=0.1)
+    assert resultado == 1
+    assert 0.1 <= segundos < 0.5
+    assert funcion.llamadas == 2
+
+
+def test_reintento_tras_error_transitorio():
+    funcion = Guion(ErrorHTTP(503), 0.0)
+    assert llamar_con_plazo(funcion, plazo=1.0, cobertura=None) == 1
+    assert funcion.llamadas == 2
+
+
+def test_error_permanente_no_se_reintenta():
+    funcion = Guion(ErrorHTTP(400), 0.0)
+    error, segundos = cronometrar(llamar_con_plazo, funcion, plazo=1.0, cobertura=0.1)
+    assert isinstance(error, ErrorHTTP) and error.code == 400
+    assert funcion.llamadas == 1
+
+
+def test_todos_los_intentos_fallan_antes_del_plazo():
+    error, segundos = cronometrar(llamar_con_plazo, Guion(ConnectionResetError()), plazo=1.0)
+    assert isinstance(error, ConnectionResetError)
+    assert segundos < 0.5
+
+
+def test_interruptor_cerrado_abierto_semiabierto():
+    circuito = Interruptor("prueba", umbral_fallos=3, enfriamiento=0.2)
+    falla = Guion(ConnectionResetError())
+    for _ in range(3):
+        with pytest.raises(ConnectionResetError):
+            circuito.llamar(falla, plazo=1.0, intentos=1)
+    assert circuito.estado == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        circuito.llamar(falla, plazo=1.0)
+    assert falla.llamadas == 3
+
+    # Pasado el enfriamiento solo entra una llamada de prueba; si falla se vuelve a abrir
+    time.sleep(0.25)
+    assert circuito.permitir() and circuito.estado == SEMIABIERTO
+    assert not circuito.permitir()
+    circuito.fallo()
+    assert circuito.estado == ABIERTO
+
+    time.sleep(0.25)
+    assert circuito.llamar(Guion(0.0), plazo=1.0) == 0
+    assert circuito.estado == CERRADO
+    assert circuito.estadisticas()["rechazadas"] == 2
+
+
+def test_errores_permanentes_no_abren_el_circuito():
+    circuito = Interruptor("prueba", umbral_fallos=2, enfriamiento=0.2)
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            circuito.llamar(Guion(ValueError("mal formado")), plazo=1.0)
+    assert circuito.estado == CERRADO
+    assert circuito.estadisticas()["fallos"] == 0
+
+
+def test_prueba_con_error_permanente_suelta_el_semiabierto():
+    circuito = Interruptor("prueba", umbral_fallos=1, enfriamiento=0.1)
+    with pytest.raises(ConnectionResetError):
+        circuito.llamar(Guion(ConnectionResetError()), plazo=1.0, intentos=1)
+    time.sleep(0.15)
+    with pytest.raises(ErrorHTTP):
+        circuito.llamar(Guion(ErrorHTTP(401)), plazo=1.0)
+    assert circuito.estado == SEMIABIERTO
+    assert circuito.llamar(Guion(0.0), plazo=1.0) == 0
+    assert circuito.estado == CERRADO
+
+
+# --- DemoAgent: cupo del LLM y plazo al primer fragmento ---
+class CadenaLenta:
+    """Imita una cadena de LangChain: `invoke` y `stream` tardan `espera` segundos en responder."""
+
+    def __init__(self, espera: float, fragmentos=("hola ", "mundo")):
+        self.espera = espera
+        self.fragmentos = fragmentos
+        self.llamadas = 0
+
+    def invoke(self, entrada):
+        self.llamadas += 1
+        time.sleep(self.espera)
+        return SimpleNamespace(content="".join(self.fragmentos))
+
+    def stream(self, entrada):
+        self.llamadas += 1
+        time.sleep(self.espera)
+        for fragmento in self.fragmentos:
+            yield SimpleNamespace(content=fragmento)
+
+
+@pytest.fixture
+def agente():
+    return DemoAgent("AIzaSimulado", max_concurrencia=1, plazo_llm=0.3, cobertura_llm=0.1, circuito=Interruptor("llm", umbral_fallos=5))
+
+
+def test_cobertura_sin_cupo_no_espera_lugar(agente):
+    cadena = CadenaLenta(0.2)
+    resultado, segundos = cronometrar(agente._invocar, cadena, {})
+    assert resultado.content == "hola mundo"
+    # La cobertura no encontró cupo y no llamó: solo el primer intento llegó al LLM
+    assert cadena.llamadas == 1
+    assert segundos < 0.3
+
+
+def test_sin_cupo_vence_el_plazo(agente):
+    agente._cupo_llm.acquire()
+    try:
+        error, segundos = cronometrar(agente._invocar, CadenaLenta(0.0), {})
+    finally:
+        agente._cupo_llm.release()
+    assert isinstance(error, PlazoVencido)
+    assert segundos < 0.6
+
+
+def test_flujo_atascado_vence_al_primer_fragmento(agente):
+    error, segundos = cronometrar(lambda: list(agente._invocar_flujo(CadenaLenta(1.0), {}, "prueba")))
+    assert isinstance(error, PlazoVencido)
+    assert segundos < 0.6
+    assert agente.circuito.estadisticas()["fallos"] == 1
+    # El intento abandonado conserva el cupo hasta terminar y luego lo suelta
+    assert not agente._cupo_llm.acquire(timeout=0.1)
+    assert agente._cupo_llm.acquire(timeout=2.0)
+    agente._cupo_llm.release()
+
+
+def test_flujo_a_tiempo(agente):
+    assert "".join(agente._invocar_flujo(CadenaLenta(0.05), {}, "prueba")) == "hola mundo"
+    assert agente.circuito.estadisticas()["exitos"] == 1
+    assert agente._cupo_llm.acquire(timeout=0.1)
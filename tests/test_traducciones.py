@@ -0,0 +1,53 @@
+"""CacheTraducciones: LRU en memoria y tabla SQLite con vencimiento y tope de filas."""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from almacen import AlmacenSQLite
+from traducciones import CacheTraducciones, detectar_idioma
+
+
+def test_detectar_idioma():
+    assert detectar_idioma("How do I get to the stadium?") == "en"
+    assert detectar_idioma("¿Dónde puedo comer?") == "es"
+    assert detectar_idioma("Onde fica o estádio?") == "pt"
+    assert detectar_idioma("スタジアムはどこですか") == "ja"
+    assert detectar_idioma("ok") is None
+
+
+def test_memoria_y_disco(tmp_path):
+    ruta = str(tmp_path / "kiosco.sqlite3")
+    cache = CacheTraducciones(ruta_db=ruta)
+    assert cache.obtener("Hola", "en") is None
+    cache.guardar("Hola", "en", "Hello")
+    assert cache.obtener("Hola", "en") == "Hello"
+    # Otro worker solo lo encuentra en disco
+    otro = CacheTraducciones(ruta_db=ruta)
+    assert otro.obtener("Hola", "en") == "Hello"
+    assert otro.estadisticas()["aciertos_disco"] == 1
+
+
+def test_traducciones_vencidas_se_purgan(tmp_path):
+    ruta = str(tmp_path / "kiosco.sqlite3")
+    cache = CacheTraducciones(ruta_db=ruta, ttl=0.05)
+    cache.guardar("Hola", "en", "Hello")
+    time.sleep(0.1)
+    reabierta = CacheTraducciones(ruta_db=ruta, ttl=0.05)
+    assert reabierta.obtener("Hola", "en") is None
+    assert reabierta.estadisticas()["purgadas"] == 1
+    assert len(AlmacenSQLite(ruta, "traducciones")) == 0
+
+
+def test_tope_de_filas_conserva_las_mas_nuevas(tmp_path):
+    ruta = str(tmp_path / "kiosco.sqlite3")
+    cache = CacheTraducciones(ruta_db=ruta, max_entradas=0, max_disco=3, purgar_cada=5)
+    for i in range(5):
+        cache.guardar(f"texto {i}", "en", f"text {i}")
+        time.sleep(0.002)
+    # La quinta traducción nueva dispara la purga
+    assert len(AlmacenSQLite(ruta, "traducciones")) == 3
+    assert cache.obtener("texto 0", "en") is None and cache.obtener("texto 1", "en") is None
+    assert cache.obtener("texto 4", "en") == "text 4"
+    assert cache.estadisticas()["purgadas"] == 2
@@ -0,0 +1,131 @@
+"""Detección local de idioma y caché de traducciones (memoria LRU + SQLite compartido)."""
+import threading
+from collections import OrderedDict
+
+from almacen import AlmacenSQLite
+from clasificador import normalizar
+
+# Nombre con el que se le pide cada idioma al LLM
+IDIOMAS = {
+    "es": "español", "en": "inglés", "pt": "portugués", "fr": "francés", "de": "alemán", "it": "italiano",
+    "nl": "neerlandés", "ja": "japonés", "ko": "coreano", "zh": "chino simplificado", "ar": "árabe",
+    "ru": "ruso", "el": "griego", "he": "hebreo", "hi": "hindi", "th": "tailandés",
+}
+
+# Rangos Unicode que identifican el idioma por sí solos (el orden importa: kana antes que CJK)
+_ESCRITURAS = (
+    ("ko", 0xAC00, 0xD7AF), ("ja", 0x3040, 0x30FF), ("zh", 0x4E00, 0x9FFF), ("ar", 0x0600, 0x06FF),
+    ("ru", 0x0400, 0x04FF), ("el", 0x0370, 0x03FF), ("he", 0x0590, 0x05FF), ("hi", 0x0900, 0x097F),
+    ("th", 0x0E00, 0x0E7F),
+)
+
+# Palabras frecuentes (normalizadas) por idioma con alfabeto latino
+_PALABRAS = {
+    "es": "el la los las de del que y en un una por para como donde cuando llego llegar quiero esta estoy hay me mi con al es partido estadio comer tengo puedo necesito",
+    "en": "the a an of and to in is are how where when what i my me can get go do you for stadium from there lost eat find match want",
+    "pt": "o os as de do da dos das que e em um uma para como onde quando eu estou chegar voce nao estadio comer perdi jogo quero",
+    "fr": "le la les de du des que et en un une pour comment ou quand je suis est aller stade manger perdu match veux trouver",
+    "de": "der die das den dem und ist wie wo wann ich bin zum zur nach ein eine stadion essen verloren spiel mochte finde",
+    "it": "il lo la gli le di del che e in un una per come dove quando sono andare stadio mangiare perso partita voglio trovo",
+    "nl": "de het een van en is hoe waar wanneer ik ben naar stadion eten verloren wedstrijd wil vinden",
+}
+_INDICE_PALABRAS = {}
+for _idioma, _lista in _PALABRAS.items():
+    for _palabra in _lista.split():
+        _INDICE_PALABRAS.setdefault(_palabra, []).append(_idioma)
+
+# Caracteres que desempatan entre idiomas latinos
+_LETRAS = {"es": "ñ¿¡", "pt": "ãõç", "fr": "èêëçœ", "de": "äöüß", "it": "ìò"}
+
+
+def detectar_idioma(texto: str):
+    """Código ISO 639-1 del idioma de `texto`, o None si no hay suficiente evidencia."""
+    for caracter in texto:
+        punto = ord(caracter)
+        for idioma, inicio, fin in _ESCRITURAS:
+            if inicio <= punto <= fin:
+                return idioma
+
+    puntajes = {}
+    for palabra in normalizar(texto).split():
+        for idioma in _INDICE_PALABRAS.get(palabra, ()):
+            puntajes[idioma] = puntajes.get(idioma, 0) + 1
+    minusculas = texto.lower()
+    for idioma, letras in _LETRAS.items():
+        if any(letra in minusculas for letra in letras):
+            puntajes[idioma] = puntajes.get(idioma, 0) + 2
+    if not puntajes:
+        return None
+    orden = sorted(puntajes.items(), key=lambda par: par[1], reverse=True)
+    if len(orden) > 1 and orden[0][1] == orden[1][1]:
+        return None
+    return orden[0][0]
+
+
+class CacheTraducciones:
+    """Clave (texto fuente, idioma destino). Consulta primero la LRU del proceso y luego el disco.
+
+    En disco cada traducción dura `ttl` segundos y la tabla no pasa de `max_disco` filas:
+    las de textos que ya no existen (respuestas editadas) se van solas. Se purga al abrir
+    la caché y cada `purgar_cada` traducciones nuevas, que es lo único que la hace crecer.
+    """
+
+    def __init__(self, ruta_db: str = ".cache/kiosco.sqlite3", max_entradas: int = 512, ttl: float = 30 * 86400, max_disco: int = 5000, purgar_cada: int = 100):
+        self.max_entradas = max_entradas
+        self._memoria = OrderedDict()
+        self._disco = AlmacenSQLite(ruta_db, "traducciones", ttl=ttl, max_filas=max_disco)
+        self._lock = threading.Lock()
+        self.aciertos_memoria = self.aciertos_disco = self.fallos = 0
+        self.purgar_cada = purgar_cada
+        self._guardadas = 0
+        self.purgadas = self._disco.purgar()
+
+    @staticmethod
+    def _clave(texto: str, idioma: str) -> str:
+        return f"{idioma}\x1f{texto}"
+
+    def obtener(self, texto: str, idioma: str):
+        clave = self._clave(texto, idioma)
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return self._memoria[clave]
+        traduccion = self._disco.obtener(clave)
+        with self._lock:
+            if traduccion is None:
+                self.fallos += 1
+                return None
+            self.aciertos_disco += 1
+            self._recordar(clave, traduccion)
+        return traduccion
+
+    def guardar(self, texto: str, idioma: str, traduccion: str):
+        clave = self._clave(texto, idioma)
+        self._disco.guardar(clave, traduccion)
+        with self._lock:
+            self._recordar(clave, traduccion)
+            self._guardadas += 1
+            purgar = self._guardadas % self.purgar_cada == 0
+        if purgar:
+            borradas = self._disco.purgar()
+            with self._lock:
+                self.purgadas += borradas
+
+    def _recordar(self, clave, traduccion):
+        self._memoria[clave] = traduccion
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas:
+            self._memoria.popitem(last=False)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+            return {
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_aciertos": (self.aciertos_memoria + self.aciertos_disco) / consultas if consultas else 0.0,
+                "entradas_memoria": len(self._memoria),
+                "purgadas": self.purgadas,
+            }